@@ -0,0 +1,262 @@
+import gzip
+import json
+import mmap
+import os
+import re
+from collections import Counter
+from datetime import datetime
+
+CAMPOS_AGRUPACION = ('usuario', 'dia', 'hora', 'tipo', 'host', 'estado')
+
+_USUARIO = re.compile(r'Usuario: (\S+)')
+_HOST = re.compile(r'@([^:\s]+):')
+
+
+def fecha_de_linea(linea):
+    """Devuelve la fecha de una linea de log (bytes) o None si no empieza por una.
+
+    Acepta el formato actual '[AAAA-MM-DD HH:MM:SS] ...' y el antiguo
+    'AAAA-MM-DD HH:MM:SS - ...' de usuario_horarios_log.
+    """
+    inicio = 1 if linea[:1] == b'[' else 0
+    t = linea[inicio:inicio + 19]
+    if len(t) < 19 or t[4:5] != b'-' or t[10:11] != b' ' or t[13:14] != b':':
+        return None
+    try:
+        return datetime(int(t[0:4]), int(t[5:7]), int(t[8:10]), int(t[11:13]), int(t[14:16]), int(t[17:19]))
+    except ValueError:
+        return None
+
+
+def _clave_hora(fecha):
+    return fecha.strftime("%Y-%m-%d %H")
+
+
+class Registro:
+    """Una linea de log con sus campos extraidos bajo demanda."""
+
+    __slots__ = ('fecha', 'texto')
+
+    def __init__(self, fecha, texto):
+        self.fecha = fecha
+        self.texto = texto
+
+    def mensaje(self):
+        """Texto sin la marca de tiempo."""
+        # La marca puede llevar microsegundos ('[... 18:41:29.200774] SCP: ...'): no tiene ancho fijo
+        if self.texto.startswith('['):
+            return self.texto.split('] ', 1)[-1]
+        return self.texto.split(' - ', 1)[-1] if self.fecha else self.texto
+
+    def tipo(self):
+        mensaje = self.mensaje()
+        if self.texto.startswith('['):
+            return mensaje.split(':', 1)[0]
+        return 'SESION' if 'Usuario:' in mensaje else ''
+
+    def usuario(self):
+        m = _USUARIO.search(self.texto)
+        return m.group(1) if m else ''
+
+    def host(self):
+        m = _HOST.search(self.texto)
+        return m.group(1) if m else ''
+
+    def estado(self):
+        if 'Fuera de rango' in self.texto:
+            return 'Fuera de rango'
+        if 'Resultado: Error' in self.texto or '] ERROR:' in self.texto:
+            return 'Error'
+        if 'Resultado: Éxito' in self.texto:
+            return 'Éxito'
+        return ''
+
+    def campo(self, nombre):
+        if nombre == 'dia':
+            return self.fecha.strftime("%Y-%m-%d") if self.fecha else '?'
+        if nombre == 'hora':
+            return self.fecha.strftime("%Y-%m-%d %H:00") if self.fecha else '?'
+        return getattr(self, nombre)() or '-'
+
+
+class ArchivoLog:
+    """Log ordenado por fecha, consultado con mmap y un indice de offsets por hora.
+
+    El indice se guarda junto al log (ruta + '.idx') y al abrirlo solo se
+    indexan los bytes añadidos desde la ultima vez; si el archivo cambio de
+    inodo o se acorto (rotado), se reconstruye.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.ruta_indice = ruta + '.idx'
+        self.horas = {}  # 'AAAA-MM-DD HH' -> offset de la primera linea de esa hora
+        self.tamano_indexado = 0
+
+    def actualizar_indice(self):
+        """Indexa lo añadido al log desde la ultima actualizacion."""
+        st = os.stat(self.ruta)
+        indice = self._leer_indice()
+        if indice and indice['inodo'] == st.st_ino and indice['tamano'] <= st.st_size:
+            self.horas = indice['horas']
+            self.tamano_indexado = indice['tamano']
+        else:
+            self.horas = {}
+            self.tamano_indexado = 0
+        if self.tamano_indexado == st.st_size:
+            return
+
+        with open(self.ruta, 'rb') as f:
+            f.seek(self.tamano_indexado)
+            offset = self.tamano_indexado
+            prefijo_anterior = None
+            for linea in f:
+                # Solo se analiza la fecha cuando cambian los caracteres de la hora
+                prefijo = linea[:14]
+                if prefijo != prefijo_anterior:
+                    fecha = fecha_de_linea(linea)
+                    if fecha is not None:
+                        prefijo_anterior = prefijo
+                        self.horas.setdefault(_clave_hora(fecha), offset)
+                offset += len(linea)
+                if linea.endswith(b'\n'):
+                    self.tamano_indexado = offset  # Una linea a medio escribir se indexa la proxima vez
+        self._guardar_indice(st.st_ino)
+
+    def _leer_indice(self):
+        try:
+            with open(self.ruta_indice, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _guardar_indice(self, inodo):
+        temporal = self.ruta_indice + '.tmp'
+        try:
+            with open(temporal, 'w') as f:
+                json.dump({'inodo': inodo, 'tamano': self.tamano_indexado, 'horas': self.horas}, f)
+            os.replace(temporal, self.ruta_indice)
+        except OSError:
+            pass  # Sin permisos de escritura se consulta sin guardar el indice
+
+    def _rango_indice(self, desde, hasta, tamano):
+        """Acota con el indice la zona del archivo donde puede empezar el rango."""
+        if desde is None:
+            return 0, 0
+        claves = sorted(self.horas)
+        hora = _clave_hora(desde)
+        anteriores = [c for c in claves if c <= hora]
+        posteriores = [c for c in claves if c > hora]
+        lo = self.horas[anteriores[-1]] if anteriores else 0
+        hi = self.horas[posteriores[0]] if posteriores else tamano
+        return lo, hi
+
+    def consultar(self, desde=None, hasta=None):
+        """Generador de Registro con desde <= fecha < hasta, en orden del archivo."""
+        if os.path.getsize(self.ruta) == 0:
+            return
+        self.actualizar_indice()
+        with open(self.ruta, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            lo, hi = self._rango_indice(desde, hasta, len(mm))
+            posicion = self._buscar_inicio(mm, desde, lo, hi) if desde else 0
+            fecha_actual = None
+            while posicion < len(mm):
+                fin = mm.find(b'\n', posicion)
+                if fin == -1:
+                    fin = len(mm)
+                linea = mm[posicion:fin]
+                posicion = fin + 1
+                fecha = fecha_de_linea(linea)
+                if fecha is not None:
+                    fecha_actual = fecha
+                    if hasta is not None and fecha >= hasta:
+                        return  # El archivo esta ordenado: no hay mas lineas en el rango
+                if desde is not None and (fecha_actual is None or fecha_actual < desde):
+                    continue
+                yield Registro(fecha_actual, linea.decode(errors='replace'))
+
+    @staticmethod
+    def _buscar_inicio(mm, desde, lo, hi):
+        """Busqueda binaria del offset de la primera linea con fecha >= desde."""
+        while lo < hi:
+            medio = (lo + hi) // 2
+            posicion, fecha = _siguiente_fecha(mm, medio, hi)
+            if fecha is None or fecha >= desde:
+                hi = medio
+            else:
+                lo = posicion + 1
+        return _siguiente_fecha(mm, lo, len(mm))[0]
+
+
+def _siguiente_fecha(mm, posicion, limite):
+    """Devuelve (offset, fecha) de la primera linea con fecha que empieza en posicion o despues."""
+    if posicion > 0 and mm[posicion - 1:posicion] != b'\n':
+        salto = mm.find(b'\n', posicion)
+        if salto == -1:
+            return len(mm), None
+        posicion = salto + 1
+    while posicion < limite:
+        fin = mm.find(b'\n', posicion)
+        fin = len(mm) if fin == -1 else fin
+        fecha = fecha_de_linea(mm[posicion:fin])
+        if fecha is not None:
+            return posicion, fecha
+        posicion = fin + 1
+    return posicion, None
+
+
+def registros_de_log(ruta, desde=None, hasta=None):
+    """Registros del log con desde <= fecha < hasta, incluidos los segmentos rotados.
+
+    Los segmentos comprimidos cuyo rango de fechas (segun el manifiesto) queda
+    fuera de la ventana se saltan sin descomprimirlos.
+    """
+    from RotacionLogs import leer_manifiesto
+    directorio = os.path.dirname(ruta)
+    for segmento in leer_manifiesto(ruta):
+        if desde is not None and segmento['hasta'] is not None and segmento['hasta'] < desde:
+            continue
+        if hasta is not None and segmento['desde'] is not None and segmento['desde'] >= hasta:
+            continue
+        try:
+            yield from _consultar_comprimido(os.path.join(directorio, segmento['archivo']), desde, hasta)
+        except FileNotFoundError:
+            pass  # Borrado por la retencion mientras se consultaba
+    if os.path.exists(ruta):
+        yield from ArchivoLog(ruta).consultar(desde, hasta)
+
+
+def _consultar_comprimido(ruta, desde, hasta):
+    with gzip.open(ruta, 'rb') as f:
+        fecha_actual = None
+        for linea in f:
+            linea = linea.rstrip(b'\n')
+            fecha = fecha_de_linea(linea)
+            if fecha is not None:
+                fecha_actual = fecha
+                if hasta is not None and fecha >= hasta:
+                    return
+            if desde is not None and (fecha_actual is None or fecha_actual < desde):
+                continue
+            yield Registro(fecha_actual, linea.decode(errors='replace'))
+
+
+def filtrar(registros, usuario=None, tipo=None, estado=None, host=None, texto=None):
+    """Aplica los filtros a un generador de registros sin materializarlo."""
+    for r in registros:
+        if usuario and r.usuario() != usuario:
+            continue
+        if tipo and r.tipo().lower() != tipo.lower():
+            continue
+        if estado and estado.lower() not in r.estado().lower():
+            continue
+        if host and r.host() != host:
+            continue
+        if texto and texto not in r.texto:
+            continue
+        yield r
+
+
+def agrupar(registros, campos):
+    """Cuenta los registros por los campos dados recorriendolos una sola vez."""
+    return Counter(tuple(r.campo(c) for c in campos) for r in registros)
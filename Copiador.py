@@ -0,0 +1,222 @@
+import errno
+import os
+import shutil
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+BLOQUE = 8 * 1024 * 1024           # Tamaño maximo por llamada al kernel
+UMBRAL_GRANDE = 8 * 1024 * 1024    # A partir de aqui se usa copia en el kernel
+INTERVALO_PROGRESO = 0.5           # Segundos entre actualizaciones de progreso
+
+# Errores que indican que la llamada no esta soportada para ese par de archivos
+_NO_SOPORTADO = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+
+def formatear_bytes(n):
+    """Devuelve un tamaño legible (B, KB, MB, GB, TB)."""
+    for unidad in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024:
+            return f"{n:.1f} {unidad}" if unidad != 'B' else f"{n:.0f} B"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+class ResultadoCopia:
+    """Totales de una copia y errores recogidos por archivo."""
+
+    def __init__(self):
+        self.archivos = 0
+        self.directorios = 0
+        self.bytes = 0
+        self.segundos = 0.0
+        self.errores = []  # Lista de (ruta, mensaje)
+
+    def resumen(self):
+        velocidad = self.bytes / self.segundos if self.segundos > 0 else 0
+        return (f"Copiados {self.archivos} archivos y {self.directorios} directorios, "
+                f"{formatear_bytes(self.bytes)} en {self.segundos:.2f} s "
+                f"({formatear_bytes(velocidad)}/s).")
+
+
+class Copiador:
+    """Copia archivos y arboles de directorios con un pool de hilos."""
+
+    def __init__(self, hilos=4, preservar=False, umbral_grande=UMBRAL_GRANDE, progreso=None):
+        self.hilos = max(1, hilos)
+        self.preservar = preservar
+        self.umbral_grande = umbral_grande
+        self.progreso = progreso  # callable(bytes, archivos, segundos) o None
+        self._lock = threading.Lock()
+        self._resultado = None
+
+    def copiar(self, origen, destino, recursivo=False):
+        """Copia origen en destino y devuelve un ResultadoCopia.
+
+        Igual que cp: si destino es un directorio existente se copia dentro de el.
+        """
+        self._resultado = resultado = ResultadoCopia()
+        inicio = time.monotonic()
+
+        if os.path.isdir(destino):
+            destino = os.path.join(destino, os.path.basename(os.path.normpath(origen)))
+
+        if os.path.isdir(origen) and not os.path.islink(origen):
+            if not recursivo:
+                raise IsADirectoryError(f"{origen} es un directorio (usa -r para copiarlo)")
+            if os.path.abspath(destino).startswith(os.path.abspath(origen) + os.sep):
+                raise ValueError("No se puede copiar un directorio dentro de si mismo")
+            tareas, directorios = self._planificar(origen, destino)
+        elif os.path.lexists(origen):
+            tareas, directorios = [(origen, destino, os.lstat(origen))], []
+        else:
+            raise FileNotFoundError(origen)
+
+        self._ejecutar(tareas, inicio)
+
+        # Los metadatos de los directorios se aplican al final para que no los altere la copia
+        if self.preservar:
+            for o, d in reversed(directorios):
+                try:
+                    shutil.copystat(o, d)
+                except OSError as e:
+                    resultado.errores.append((o, str(e)))
+
+        resultado.segundos = time.monotonic() - inicio
+        return resultado
+
+    def copiar_archivos(self, tareas):
+        """Copia una lista de (origen, destino, stat) cuyos directorios destino ya existen."""
+        self._resultado = resultado = ResultadoCopia()
+        inicio = time.monotonic()
+        self._ejecutar(tareas, inicio)
+        resultado.segundos = time.monotonic() - inicio
+        return resultado
+
+    def _ejecutar(self, tareas, inicio):
+        """Reparte las copias entre el pool y anota los errores de cada archivo."""
+        resultado = self._resultado
+        with ThreadPoolExecutor(max_workers=self.hilos) as pool:
+            pendientes = {pool.submit(self._copiar_archivo, o, d, st): o for o, d, st in tareas}
+            while pendientes:
+                hechos, _ = wait(pendientes, timeout=INTERVALO_PROGRESO, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    ruta = pendientes.pop(futuro)
+                    error = futuro.exception()
+                    if error is not None:
+                        resultado.errores.append((ruta, str(error)))
+                if self.progreso:
+                    self.progreso(resultado.bytes, resultado.archivos, time.monotonic() - inicio)
+
+    def _planificar(self, origen, destino):
+        """Crea el arbol de directorios destino y devuelve los archivos a copiar."""
+        tareas = []
+        directorios = []
+        pila = [(origen, destino)]
+        while pila:
+            dir_origen, dir_destino = pila.pop()
+            try:
+                os.makedirs(dir_destino, exist_ok=True)
+                directorios.append((dir_origen, dir_destino))
+                self._resultado.directorios += 1
+                with os.scandir(dir_origen) as it:
+                    for entrada in it:
+                        ruta_destino = os.path.join(dir_destino, entrada.name)
+                        if entrada.is_dir(follow_symlinks=False):
+                            pila.append((entrada.path, ruta_destino))
+                        else:
+                            tareas.append((entrada.path, ruta_destino, entrada.stat(follow_symlinks=False)))
+            except OSError as e:
+                self._resultado.errores.append((dir_origen, str(e)))
+        return tareas, directorios
+
+    def _sumar(self, n):
+        with self._lock:
+            self._resultado.bytes += n
+
+    def _copiar_archivo(self, origen, destino, st):
+        if _mismo_archivo(origen, destino, st):
+            # Abrir el destino con 'wb' vaciaria el origen
+            raise shutil.SameFileError(f"{origen} y {destino} son el mismo archivo")
+        if stat.S_ISLNK(st.st_mode):
+            # Los enlaces simbolicos se recrean, no se sigue su destino
+            if os.path.lexists(destino):
+                os.unlink(destino)
+            os.symlink(os.readlink(origen), destino)
+        elif st.st_size >= self.umbral_grande:
+            self._copiar_grande(origen, destino, st.st_size)
+        else:
+            shutil.copyfile(origen, destino)
+            self._sumar(st.st_size)
+
+        if self.preservar:
+            shutil.copystat(origen, destino, follow_symlinks=False)
+        elif not stat.S_ISLNK(st.st_mode):
+            shutil.copymode(origen, destino)
+        with self._lock:
+            self._resultado.archivos += 1
+
+    def _copiar_grande(self, origen, destino, tamano):
+        """Copia en el kernel con copy_file_range o sendfile; si no se puede, en espacio de usuario."""
+        with open(origen, 'rb') as fsrc, open(destino, 'wb') as fdst:
+            src, dst = fsrc.fileno(), fdst.fileno()
+            for metodo in (self._copy_file_range, self._sendfile):
+                try:
+                    metodo(src, dst, tamano)
+                    return
+                except _NoSoportado:
+                    continue
+            shutil.copyfileobj(_LectorContado(fsrc, self._sumar), fdst, BLOQUE)
+
+    def _copy_file_range(self, src, dst, tamano):
+        if not hasattr(os, 'copy_file_range'):
+            raise _NoSoportado()
+        self._bucle_kernel(lambda n, offset: os.copy_file_range(src, dst, n), tamano)
+
+    def _sendfile(self, src, dst, tamano):
+        if not hasattr(os, 'sendfile'):
+            raise _NoSoportado()
+        self._bucle_kernel(lambda n, offset: os.sendfile(dst, src, offset, n), tamano)
+
+    def _bucle_kernel(self, llamada, tamano):
+        copiados = 0
+        while copiados < tamano:
+            try:
+                n = llamada(min(BLOQUE, tamano - copiados), copiados)
+            except OSError as e:
+                # Solo se cambia de metodo si aun no se ha escrito nada
+                if copiados == 0 and e.errno in _NO_SOPORTADO:
+                    raise _NoSoportado() from e
+                raise
+            if n == 0:
+                break
+            copiados += n
+            self._sumar(n)
+
+
+def _mismo_archivo(origen, destino, st):
+    """Como shutil.copyfile: sigue los enlaces del destino salvo si el origen es un enlace."""
+    try:
+        if stat.S_ISLNK(st.st_mode):
+            return os.path.samestat(st, os.lstat(destino))
+        return os.path.samefile(origen, destino)
+    except OSError:
+        return False  # El destino no existe todavia
+
+
+class _NoSoportado(Exception):
+    """La copia en el kernel no esta disponible para estos archivos."""
+
+
+class _LectorContado:
+    """Envuelve un archivo para contar los bytes leidos por copyfileobj."""
+
+    def __init__(self, archivo, sumar):
+        self.archivo = archivo
+        self.sumar = sumar
+
+    def read(self, n=-1):
+        datos = self.archivo.read(n)
+        self.sumar(len(datos))
+        return datos
@@ -1,61 +1,226 @@
+import heapq
+import json
+import os
 import threading
 import time
+from collections import deque
+
+from Supervisor import LINEAS_LOG, DemonioProceso, Supervisor, formatear_log
+
+INTERVALO_POR_DEFECTO = 5  # Segundos entre ejecuciones de un demonio
+
 
 class Demonio:
-    def __init__(self, name):
+    def __init__(self, name, intervalo=INTERVALO_POR_DEFECTO, tarea=None):
         self.name = name
+        self.intervalo = intervalo
+        self.tarea = tarea or self.run  # Callable que se ejecuta en cada tick
         self.running = False
-        self.thread = None
-
-    def start(self):
-        if not self.running:
-            self.running = True
-            self.thread = threading.Thread(target=self.run, daemon=True)
-            self.thread.start()
-        return f"Demonio '{self.name}' iniciado."
-
-    def stop(self):
-        if self.running:
-            self.running = False
-            if self.thread:
-                self.thread.join()
-        return f"Demonio '{self.name}' detenido."
-
-    def restart(self):
-        self.stop()
-        return self.start()
+        self.generacion = 0  # Invalida las entradas antiguas del planificador al parar
+        self.ticks = 0
+        self.ultima_latencia = 0.0  # Duracion de la ultima ejecucion de la tarea
+        self.ultimo_retraso = 0.0   # Retraso de la ultima ejecucion respecto a lo planificado
+        self.retraso_max = 0.0
+        self.errores = 0
+        self.ultimo_error = None
+        self.logs = deque(maxlen=LINEAS_LOG)  # (instante, flujo, texto), como en DemonioProceso
+
+    def registrar(self, flujo, texto):
+        self.logs.append((time.time(), flujo, texto))
 
     def run(self):
         """Simula el trabajo del demonio."""
-        while self.running:
-            print(f"Demonio '{self.name}' está ejecutándose...")
-            time.sleep(5)  # Simula actividad del demonio
+        self.registrar('out', f"Demonio '{self.name}' está ejecutándose...")  # No en la terminal, con el prompt
 
 
-class DemonioManager:
+class Planificador:
+    """Ejecuta todos los demonios desde un unico hilo con un monticulo de tiempos.
+
+    Cada demonio activo tiene una entrada (proxima_ejecucion, generacion, nombre)
+    en el monticulo. Parar un demonio solo incrementa su generacion, asi que es
+    inmediato: su entrada pendiente se descarta al salir del monticulo.
+    """
+
     def __init__(self):
+        self.monticulo = []
+        self.condicion = threading.Condition()
+        self.hilo = None
+
+    def planificar(self, demonio, cuando):
+        with self.condicion:
+            heapq.heappush(self.monticulo, (cuando, demonio.generacion, demonio.name, demonio))
+            if self.hilo is None:
+                self.hilo = threading.Thread(target=self._run, name='planificador-demonios', daemon=True)
+                self.hilo.start()
+            # Despierta al hilo por si el nuevo demonio va antes que el siguiente
+            self.condicion.notify()
+
+    def _run(self):
+        while True:
+            with self.condicion:
+                while True:
+                    if not self.monticulo:
+                        self.condicion.wait()
+                        continue
+                    cuando, generacion, _, demonio = self.monticulo[0]
+                    if not demonio.running or generacion != demonio.generacion:
+                        heapq.heappop(self.monticulo)  # Entrada de un demonio ya parado
+                        continue
+                    espera = cuando - time.monotonic()
+                    if espera <= 0:
+                        heapq.heappop(self.monticulo)
+                        break
+                    self.condicion.wait(espera)
+
+            self._ejecutar(demonio, cuando)
+
+            with self.condicion:
+                if demonio.running and generacion == demonio.generacion:
+                    # Se planifica respecto a lo previsto, no a cuando termino, para no acumular deriva
+                    siguiente = cuando + demonio.intervalo
+                    ahora = time.monotonic()
+                    if siguiente < ahora:
+                        siguiente = ahora  # Si vamos tarde no se recuperan los ticks perdidos
+                    heapq.heappush(self.monticulo, (siguiente, generacion, demonio.name, demonio))
+
+    def _ejecutar(self, demonio, cuando):
+        inicio = time.monotonic()
+        demonio.ultimo_retraso = inicio - cuando
+        demonio.retraso_max = max(demonio.retraso_max, demonio.ultimo_retraso)
+        try:
+            demonio.tarea()
+        except Exception as e:
+            demonio.errores += 1
+            demonio.ultimo_error = str(e)
+            demonio.registrar('err', str(e))
+        demonio.ultima_latencia = time.monotonic() - inicio
+        demonio.ticks += 1
+
+
+class DemonioManager:
+    """Demonios periodicos (una tarea en el hilo del Planificador) y demonios con comando.
+
+    Los demonios con comando son procesos hijos vigilados por el Supervisor; sus
+    definiciones se guardan en ruta_definiciones para la proxima vez que se abra la shell.
+    """
+
+    def __init__(self, ruta_definiciones=None):
         self.demonios = {}
+        self.planificador = Planificador()
+        self.supervisor = Supervisor()
+        self.ruta_definiciones = ruta_definiciones
+        for definicion in self._leer_definiciones():
+            self.demonios[definicion['nombre']] = DemonioProceso(definicion['nombre'], definicion['comando'],
+                                                                 definicion.get('directorio'))
 
-    def add_demonio(self, name):
+    def add_demonio(self, name, intervalo=INTERVALO_POR_DEFECTO, tarea=None, comando=None, directorio=None):
         if name in self.demonios:
             return f"El demonio '{name}' ya existe."
-        self.demonios[name] = Demonio(name)
+        if comando:
+            self.demonios[name] = DemonioProceso(name, comando, directorio)
+            self._guardar_definiciones()
+        else:
+            self.demonios[name] = Demonio(name, intervalo, tarea)
         return f"Demonio '{name}' agregado."
 
+    def remove_demonio(self, name):
+        if name not in self.demonios:
+            return f"El demonio '{name}' no existe."
+        self.stop_demonio(name)
+        demonio = self.demonios.pop(name)
+        if isinstance(demonio, DemonioProceso):
+            self._guardar_definiciones()
+        return f"Demonio '{name}' eliminado."
+
     def start_demonio(self, name):
-        if name in self.demonios:
-            return self.demonios[name].start()
-        return f"El demonio '{name}' no existe."
+        demonio = self.demonios.get(name)
+        if demonio is None:
+            return f"El demonio '{name}' no existe."
+        if isinstance(demonio, DemonioProceso):
+            error = self.supervisor.arrancar(demonio)
+            return f"No se pudo iniciar el demonio '{name}': {error}" if error else f"Demonio '{name}' iniciado."
+        with self.planificador.condicion:
+            if not demonio.running:
+                demonio.running = True
+                self.planificador.planificar(demonio, time.monotonic())
+        return f"Demonio '{name}' iniciado."
 
     def stop_demonio(self, name):
-        if name in self.demonios:
-            return self.demonios[name].stop()
-        return f"El demonio '{name}' no existe."
+        demonio = self.demonios.get(name)
+        if demonio is None:
+            return f"El demonio '{name}' no existe."
+        if isinstance(demonio, DemonioProceso):
+            self.supervisor.detener(demonio)
+            return f"Demonio '{name}' detenido."
+        with self.planificador.condicion:
+            demonio.running = False
+            demonio.generacion += 1
+        return f"Demonio '{name}' detenido."
 
     def restart_demonio(self, name):
         if name in self.demonios:
-            return self.demonios[name].restart()
+            self.stop_demonio(name)
+            return self.start_demonio(name)
         return f"El demonio '{name}' no existe."
 
     def list_demonios(self):
         return [name for name in self.demonios]
+
+    def logs_demonio(self, name, lineas=None):
+        """Ultimas lineas de salida de un demonio, o None si no existe."""
+        demonio = self.demonios.get(name)
+        if demonio is None:
+            return None
+        registros = list(demonio.logs)
+        return [formatear_log(*r) for r in registros[-lineas if lineas else 0:]]
+
+    def top_demonios(self):
+        """Estado y consumo (segun /proc) de los demonios con comando."""
+        top = []
+        for d in self.demonios.values():
+            if not isinstance(d, DemonioProceso):
+                continue
+            if d.proceso is not None:
+                estado = 'activo'
+            elif d.running:
+                estado = 'espera'  # Esperando el rearranque
+            else:
+                estado = 'parado'
+            top.append({'nombre': d.name, 'estado': estado, 'comando': d.comando, 'reinicios': d.reinicios,
+                        'codigo': d.ultimo_codigo, 'muestra': self.supervisor.muestrear(d)})
+        return top
+
+    def close(self):
+        """Para los procesos de los demonios con comando."""
+        self.supervisor.close()
+
+    def _leer_definiciones(self):
+        if not self.ruta_definiciones:
+            return []
+        try:
+            with open(self.ruta_definiciones, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _guardar_definiciones(self):
+        if not self.ruta_definiciones:
+            return
+        definiciones = [{'nombre': d.name, 'comando': d.comando, 'directorio': d.directorio}
+                        for d in self.demonios.values() if isinstance(d, DemonioProceso)]
+        with open(self.ruta_definiciones + '.tmp', 'w') as f:
+            json.dump(definiciones, f, indent=4)
+        os.replace(self.ruta_definiciones + '.tmp', self.ruta_definiciones)
+
+    def stats_demonios(self):
+        """Devuelve las estadisticas de ejecucion de cada demonio periodico."""
+        return [{
+            'nombre': d.name,
+            'activo': d.running,
+            'intervalo': d.intervalo,
+            'ticks': d.ticks,
+            'latencia': d.ultima_latencia,
+            'retraso': d.ultimo_retraso,
+            'retraso_max': d.retraso_max,
+            'errores': d.errores,
+        } for d in self.demonios.values() if isinstance(d, Demonio)]
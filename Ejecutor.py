@@ -0,0 +1,166 @@
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+TAMANO_LECTURA = 64 * 1024  # Maximo de bytes por linea leida (las lineas mas largas se trocean)
+LINEAS_TRABAJO = 1000       # Lineas de salida que se guardan por trabajo en segundo plano
+
+
+class ResultadoEjecucion:
+    """Codigo de salida y duracion de un comando."""
+
+    def __init__(self, comando):
+        self.comando = comando
+        self.codigo = None
+        self.segundos = 0.0
+        self.expirado = False
+        self.error = None  # Mensaje si el comando no pudo lanzarse
+
+    def estado(self):
+        if self.error:
+            return f"error: {self.error}"
+        if self.expirado:
+            return "tiempo agotado"
+        return f"código {self.codigo}"
+
+
+def _leer(pipe, callback):
+    with pipe:
+        for bloque in iter(lambda: pipe.readline(TAMANO_LECTURA), b''):
+            callback(bloque.decode(errors='replace').rstrip('\n'))
+
+
+def matar_grupo(proceso):
+    """Mata el proceso y los que haya lanzado, que comparten su grupo (ver start_new_session)."""
+    try:
+        os.killpg(proceso.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def ejecutar(argv, al_stdout, al_stderr, timeout=None, cwd=None, al_iniciar=None):
+    """Ejecuta argv y entrega su salida linea a linea a medida que se produce.
+
+    al_stdout y al_stderr se llaman desde hilos lectores; si se supera timeout
+    (hasta que el comando termina y hasta que se cierran sus tuberias) se mata
+    el grupo de procesos entero: un nieto vivo mantendria abiertas las tuberias
+    y los lectores no terminarian. Devuelve un ResultadoEjecucion.
+    """
+    resultado = ResultadoEjecucion(shlex.join(argv))
+    inicio = time.monotonic()
+    try:
+        proceso = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   stdin=subprocess.DEVNULL, cwd=cwd, start_new_session=True)
+    except OSError as e:
+        resultado.error = e.strerror or str(e)
+        return resultado
+    if al_iniciar:
+        al_iniciar(proceso)
+
+    lectores = [threading.Thread(target=_leer, args=(proceso.stdout, al_stdout), daemon=True),
+                threading.Thread(target=_leer, args=(proceso.stderr, al_stderr), daemon=True)]
+    for lector in lectores:
+        lector.start()
+    try:
+        proceso.wait(timeout)
+    except subprocess.TimeoutExpired:
+        matar_grupo(proceso)
+        proceso.wait()
+        resultado.expirado = True
+    except KeyboardInterrupt:
+        # En su propia sesion el Ctrl-C no le llega al comando: se mata aqui
+        matar_grupo(proceso)
+        proceso.wait()
+        raise
+    # Un nieto que heredo las tuberias puede seguir vivo tras salir el padre: el plazo cubre tambien su salida
+    limite = inicio + timeout if timeout is not None else None
+    try:
+        for lector in lectores:
+            lector.join(None if limite is None else max(0.0, limite - time.monotonic()))
+    except KeyboardInterrupt:
+        matar_grupo(proceso)
+        raise
+    if any(lector.is_alive() for lector in lectores):
+        matar_grupo(proceso)
+        resultado.expirado = True
+        for lector in lectores:
+            lector.join()
+    resultado.codigo = proceso.returncode
+    resultado.segundos = time.monotonic() - inicio
+    return resultado
+
+
+def ejecutar_paralelo(comandos, hilos, al_linea, timeout=None, cwd=None):
+    """Ejecuta varias lineas de comando con como maximo `hilos` a la vez.
+
+    al_linea(indice, es_error, linea) recibe cada linea completa; devuelve la
+    lista de ResultadoEjecucion en el orden de los comandos.
+    """
+    def uno(indice, comando):
+        try:
+            argv = shlex.split(comando)
+        except ValueError as e:
+            resultado = ResultadoEjecucion(comando)
+            resultado.error = str(e)
+            return resultado
+        return ejecutar(argv,
+                        lambda linea: al_linea(indice, False, linea),
+                        lambda linea: al_linea(indice, True, linea),
+                        timeout, cwd)
+
+    with ThreadPoolExecutor(max_workers=max(1, hilos)) as pool:
+        futuros = [pool.submit(uno, i, c) for i, c in enumerate(comandos)]
+        resultados = [f.result() for f in futuros]
+    for resultado, comando in zip(resultados, comandos):
+        resultado.comando = comando
+    return resultados
+
+
+class Trabajo:
+    """Comando lanzado en segundo plano con su salida guardada en memoria."""
+
+    def __init__(self, id, argv, timeout=None, cwd=None):
+        self.id = id
+        self.comando = shlex.join(argv)
+        self.salida = deque(maxlen=LINEAS_TRABAJO)
+        self.proceso = None
+        self.resultado = None
+        self._lock = threading.Lock()  # Protege salida y proceso frente a los hilos lectores
+        self._matar = False  # Se pidio matarlo antes de que llegara a lanzarse
+        self.hilo = threading.Thread(target=self._run, args=(argv, timeout, cwd), daemon=True)
+        self.hilo.start()
+
+    def _run(self, argv, timeout, cwd):
+        self.resultado = ejecutar(argv, self._agregar, lambda linea: self._agregar(f"[stderr] {linea}"),
+                                  timeout, cwd, al_iniciar=self._iniciado)
+
+    def _agregar(self, linea):
+        with self._lock:
+            self.salida.append(linea)
+
+    def lineas(self):
+        """Copia de la salida guardada (los lectores siguen escribiendo en ella)."""
+        with self._lock:
+            return list(self.salida)
+
+    def _iniciado(self, proceso):
+        with self._lock:
+            self.proceso = proceso
+            if self._matar:
+                matar_grupo(proceso)
+
+    def estado(self):
+        if self.resultado is None:
+            return "en ejecución"
+        return f"terminado ({self.resultado.estado()}, {self.resultado.segundos:.2f} s)"
+
+    def matar(self):
+        with self._lock:
+            self._matar = True
+            if self.resultado is None and self.proceso is not None:
+                matar_grupo(self.proceso)
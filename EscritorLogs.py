@@ -0,0 +1,185 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+
+# Politicas de flush disponibles
+POLITICA_SIEMPRE = 'siempre'      # flush tras cada registro
+POLITICA_REGISTROS = 'registros'  # flush cada N registros
+POLITICA_INTERVALO = 'intervalo'  # flush cada T milisegundos
+POLITICAS = (POLITICA_SIEMPRE, POLITICA_REGISTROS, POLITICA_INTERVALO)
+
+_FLUSH = object()   # Marca para pedir un flush inmediato
+_CERRAR = object()  # Marca para terminar el hilo escritor
+
+
+def formatear_registro(fecha, tipo, mensaje):
+    """Devuelve la linea de log con el formato comun a todos los archivos."""
+    return f"[{fecha.strftime(FORMATO_FECHA)}] {tipo}: {mensaje}\n"
+
+
+class EscritorLogs:
+    """Escribe los logs de la shell en segundo plano.
+
+    Los registros se encolan en una cola acotada y un unico hilo los vuelca por
+    lotes sobre los archivos, que se mantienen abiertos mientras dure la shell.
+    Con un Rotador (RotacionLogs), tras cada volcado se comprueba si el archivo
+    debe rotarse, y cada volcado se hace con el bloqueo compartido del log para
+    que otra shell no lo rote a mitad de la escritura.
+    """
+
+    def __init__(self, politica=POLITICA_REGISTROS, cada_registros=100, cada_ms=200,
+                 fsync=False, max_cola=10000, rotador=None):
+        if politica not in POLITICAS:
+            raise ValueError(f"Politica de flush desconocida: {politica}")
+        self.politica = politica
+        self.cada_registros = max(1, cada_registros)
+        self.cada_ms = max(1, cada_ms)
+        self.fsync = fsync
+        self.cola = queue.Queue(maxsize=max_cola)
+        self.archivos = {}
+        self.rotador = rotador
+        self.inicios = {}  # archivo -> fecha del primer registro del segmento activo
+        self.cerrado = False
+        self.hilo = threading.Thread(target=self._run, name='escritor-logs', daemon=True)
+        self.hilo.start()
+        atexit.register(self.close)
+
+    def escribir(self, archivo, tipo, mensaje, fecha=None):
+        """Encola un registro; la marca de tiempo se toma en el momento de la llamada."""
+        if self.cerrado:
+            # Tras cerrar se escribe de forma directa para no perder registros
+            with open(archivo, 'a') as log:
+                log.write(formatear_registro(fecha or datetime.now(), tipo, mensaje))
+            return
+        # Si la cola esta llena, put bloquea hasta que el hilo escritor libere espacio
+        self.cola.put((archivo, fecha or datetime.now(), tipo, mensaje))
+
+    def flush(self, timeout=None):
+        """Espera a que todo lo encolado hasta ahora este escrito en disco."""
+        if self.cerrado:
+            return
+        hecho = threading.Event()
+        self.cola.put((_FLUSH, hecho))
+        hecho.wait(timeout)
+
+    def close(self):
+        """Vacia la cola, cierra los archivos y detiene el hilo escritor."""
+        if self.cerrado:
+            return
+        self.cerrado = True
+        self.cola.put((_CERRAR, None))
+        self.hilo.join()
+        if self.rotador is not None:
+            self.rotador.close()
+
+    def _abrir(self, archivo):
+        log = self.archivos.get(archivo)
+        if log is None:
+            if self.rotador is not None and archivo not in self.inicios:
+                from RotacionLogs import primera_fecha
+                self.rotador.recuperar(archivo)
+                self.inicios[archivo] = primera_fecha(archivo)
+            log = open(archivo, 'a', buffering=1024 * 64)
+            self.archivos[archivo] = log
+        return log
+
+    def _rotar_si_toca(self, archivo, log):
+        """Rota antes de escribir, para que los registros nuevos vayan al segmento nuevo."""
+        if self.inicios.get(archivo) is None:
+            self.inicios[archivo] = datetime.now()
+        if not self.rotador.debe_rotar(log.tell(), self.inicios[archivo]):
+            return log
+        self.rotador.rotar(archivo, log)  # Si otra shell ya lo roto, solo hay que reabrirlo
+        return self._reabrir(archivo, log)
+
+    def _seguir_rotacion(self, archivo, log):
+        """Reabre el archivo si otra shell lo ha rotado; se llama con el bloqueo del log."""
+        try:
+            if os.path.samestat(os.stat(archivo), os.fstat(log.fileno())):
+                return log
+        except FileNotFoundError:
+            pass
+        return self._reabrir(archivo, log)
+
+    def _reabrir(self, archivo, log):
+        log.close()
+        del self.archivos[archivo]
+        self.inicios[archivo] = datetime.now()
+        return self._abrir(archivo)
+
+    def _volcar(self, pendientes):
+        """Escribe el lote pendiente agrupado por archivo y hace flush (y fsync)."""
+        for archivo, lineas in pendientes.items():
+            try:
+                log = self._abrir(archivo)
+                if self.rotador is not None:
+                    log = self._rotar_si_toca(archivo, log)
+                    from RotacionLogs import bloqueo
+                    candado = bloqueo(archivo, exclusivo=False)
+                else:
+                    candado = nullcontext()
+                with candado:
+                    if self.rotador is not None:
+                        log = self._seguir_rotacion(archivo, log)
+                    log.write(''.join(lineas))
+                    log.flush()
+                    if self.fsync:
+                        os.fsync(log.fileno())
+            except OSError:
+                # Un archivo inaccesible no debe detener al resto de logs
+                self.archivos.pop(archivo, None)
+        pendientes.clear()
+
+    def _run(self):
+        pendientes = {}
+        contador = 0
+        espera = self.cada_ms / 1000
+        ultimo_flush = time.monotonic()
+        while True:
+            try:
+                elemento = self.cola.get(timeout=espera)
+            except queue.Empty:
+                elemento = None
+
+            terminar = False
+            eventos = []
+            # Saca todo lo que ya este en la cola para escribirlo en un solo lote
+            while elemento is not None:
+                if elemento[0] is _FLUSH:
+                    eventos.append(elemento[1])
+                elif elemento[0] is _CERRAR:
+                    terminar = True
+                else:
+                    archivo, fecha, tipo, mensaje = elemento
+                    pendientes.setdefault(archivo, []).append(formatear_registro(fecha, tipo, mensaje))
+                    contador += 1
+                try:
+                    elemento = self.cola.get_nowait()
+                except queue.Empty:
+                    elemento = None
+
+            ahora = time.monotonic()
+            if self.politica == POLITICA_SIEMPRE:
+                toca = contador > 0
+            elif self.politica == POLITICA_REGISTROS:
+                toca = contador >= self.cada_registros or ahora - ultimo_flush >= espera
+            else:
+                toca = ahora - ultimo_flush >= espera
+            if pendientes and (toca or eventos or terminar):
+                self._volcar(pendientes)
+                contador = 0
+                ultimo_flush = ahora
+            for hecho in eventos:
+                hecho.set()
+
+            if terminar:
+                for log in self.archivos.values():
+                    log.close()
+                self.archivos.clear()
+                return
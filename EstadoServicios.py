@@ -0,0 +1,133 @@
+import fnmatch
+import subprocess
+import threading
+import time
+
+TTL_POR_DEFECTO = 5.0  # Segundos que se reutiliza el estado de un servicio
+PROPIEDADES = ('Id', 'Names', 'ActiveState', 'SubState', 'MainPID', 'LoadState')
+
+
+class EstadoServicio:
+    """Estado de un servicio segun systemctl show."""
+
+    __slots__ = ('nombre', 'activo', 'subestado', 'pid', 'cargado')
+
+    def __init__(self, nombre, activo, subestado, pid, cargado):
+        self.nombre = nombre
+        self.activo = activo
+        self.subestado = subestado
+        self.pid = pid
+        self.cargado = cargado
+
+    def en_ejecucion(self):
+        return self.activo == 'active' and self.subestado == 'running'
+
+    def existe(self):
+        return self.cargado != 'not-found'
+
+    def clave(self):
+        return (self.activo, self.subestado, self.pid)
+
+    def __str__(self):
+        if not self.existe():
+            return f"{self.nombre}: no encontrado"
+        return f"{self.nombre}: {self.activo} ({self.subestado}) PID {self.pid}"
+
+
+class SystemctlBackend:
+    """Consulta systemctl. El ejecutable es configurable para poder sustituirlo en pruebas."""
+
+    def __init__(self, ejecutable='systemctl'):
+        self.ejecutable = ejecutable
+
+    def mostrar(self, servicios):
+        """Consulta todos los servicios con una unica invocacion de 'systemctl show'."""
+        resultado = subprocess.run([self.ejecutable, 'show', '--no-pager', '-p', ','.join(PROPIEDADES)] + list(servicios),
+                                   text=True, capture_output=True)
+        if resultado.returncode != 0 and not resultado.stdout:
+            raise RuntimeError(resultado.stderr.strip() or f"systemctl terminó con código {resultado.returncode}")
+        return parsear_show(resultado.stdout, servicios)
+
+    def unidades(self, patrones):
+        """Expande patrones glob a nombres de servicio con 'systemctl list-units'."""
+        resultado = subprocess.run([self.ejecutable, 'list-units', '--all', '--plain', '--no-legend',
+                                    '--type=service'] + list(patrones), text=True, capture_output=True)
+        return [linea.split()[0] for linea in resultado.stdout.splitlines() if linea.strip()]
+
+
+def parsear_show(salida, servicios):
+    """Convierte la salida de 'systemctl show' (bloques Clave=Valor separados por lineas en blanco)."""
+    bloques = []
+    actual = {}
+    for linea in salida.splitlines():
+        if not linea.strip():
+            if actual:
+                bloques.append(actual)
+                actual = {}
+            continue
+        clave, _, valor = linea.partition('=')
+        actual[clave] = valor
+    if actual:
+        bloques.append(actual)
+
+    # Se emparejan por nombre y no por posicion: systemctl no garantiza un bloque por
+    # servicio pedido ni el orden, y el nombre pedido puede ser un alias (Names=) o no
+    # llevar el sufijo .service
+    por_nombre = {}
+    for bloque in bloques:
+        for nombre in [bloque.get('Id', '')] + bloque.get('Names', '').split():
+            if nombre:
+                por_nombre.setdefault(nombre, bloque)
+
+    estados = {}
+    for nombre in servicios:
+        bloque = por_nombre.get(nombre) or por_nombre.get(nombre + '.service')
+        if bloque is None:
+            estados[nombre] = EstadoServicio(nombre, 'unknown', 'unknown', 0, 'not-found')
+            continue
+        estados[nombre] = EstadoServicio(nombre, bloque.get('ActiveState', 'unknown'), bloque.get('SubState', 'unknown'),
+                                         int(bloque.get('MainPID') or 0), bloque.get('LoadState', ''))
+    return estados
+
+
+class EstadoServicios:
+    """Cache con TTL del estado de los servicios sobre un backend intercambiable."""
+
+    def __init__(self, backend=None, ttl=TTL_POR_DEFECTO):
+        self.backend = backend or SystemctlBackend()
+        self.ttl = ttl
+        self._cache = {}  # nombre -> (instante, EstadoServicio)
+        self._lock = threading.Lock()
+
+    def expandir(self, nombres):
+        """Sustituye los patrones glob por los servicios que coinciden."""
+        patrones = [n for n in nombres if any(c in n for c in '*?[')]
+        expandidos = self.backend.unidades(patrones) if patrones else []
+        resultado = []
+        for nombre in nombres:
+            if nombre in patrones:
+                resultado.extend(u for u in expandidos if fnmatch.fnmatch(u, nombre) or
+                                 fnmatch.fnmatch(u, nombre + '.service'))
+            else:
+                resultado.append(nombre)
+        return list(dict.fromkeys(resultado))  # Sin duplicados, conservando el orden
+
+    def consultar(self, servicios, forzar=False):
+        """Devuelve {servicio: EstadoServicio}, consultando solo los que no estan en cache."""
+        ahora = time.monotonic()
+        estados = {}
+        pendientes = []
+        with self._lock:
+            for servicio in servicios:
+                guardado = self._cache.get(servicio)
+                if not forzar and guardado and ahora - guardado[0] < self.ttl:
+                    estados[servicio] = guardado[1]
+                else:
+                    pendientes.append(servicio)
+        if pendientes:
+            nuevos = self.backend.mostrar(pendientes)
+            with self._lock:
+                for servicio, estado in nuevos.items():
+                    self._cache[servicio] = (ahora, estado)
+            estados.update(nuevos)
+        return {s: estados[s] for s in servicios if s in estados}
@@ -0,0 +1,256 @@
+import os
+import re
+import sqlite3
+import stat
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+
+from Copiador import formatear_bytes
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS raices (
+    ruta TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    id    INTEGER PRIMARY KEY,
+    ruta  TEXT NOT NULL UNIQUE,
+    padre INTEGER,
+    mtime INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archivos (
+    dir    INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    tipo   TEXT NOT NULL,
+    tamano INTEGER NOT NULL,
+    mtime  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS archivos_dir ON archivos (dir);
+"""
+
+TIPOS = {'f': 'archivo', 'd': 'directorio', 'l': 'enlace', 'o': 'otro'}
+
+
+def _tipo(modo):
+    if stat.S_ISREG(modo):
+        return 'f'
+    if stat.S_ISDIR(modo):
+        return 'd'
+    if stat.S_ISLNK(modo):
+        return 'l'
+    return 'o'
+
+
+@lru_cache(maxsize=64)
+def _compilar(patron):
+    return re.compile(patron)
+
+
+def _regexp(patron, texto):
+    return _compilar(patron).search(texto) is not None
+
+
+def _rango_prefijo(ruta):
+    """Limites para 'ruta LIKE prefijo/%' que aprovechan el indice UNIQUE de dirs.ruta."""
+    return ruta.rstrip(os.sep) + os.sep, ruta.rstrip(os.sep) + chr(ord(os.sep) + 1)
+
+
+class ResultadoIndexado:
+    """Contadores de una pasada de indexado."""
+
+    def __init__(self):
+        self.leidos = 0      # Directorios cuyo listado se reescribio en el indice
+        self.saltados = 0    # Directorios con el mismo mtime: solo se actualizan tamaños y fechas
+        self.entradas = 0
+        self.borrados = 0    # Directorios que ya no existen
+        self.segundos = 0.0
+        self.errores = []  # Lista de (ruta, mensaje)
+
+    def resumen(self):
+        return (f"{self.leidos} directorios leídos, {self.saltados} con el mismo listado, {self.entradas} entradas "
+                f"actualizadas, {self.borrados} directorios eliminados del índice, "
+                f"{len(self.errores)} errores en {self.segundos:.2f} s.")
+
+
+class IndiceArchivos:
+    """Indice persistente (SQLite) de rutas, tamaños, fechas y tipos.
+
+    Al reindexar se vuelve a leer cada directorio con scandir (un archivo que
+    crece no cambia el mtime de su directorio), pero si el mtime del directorio
+    coincide con el guardado su listado no ha cambiado y solo se actualizan las
+    filas cuyo tamaño o fecha difieren, en lugar de reescribirlas todas. Los
+    directorios se leen en paralelo en un pool de hilos y las escrituras se
+    hacen desde el hilo que llama, en una unica transaccion.
+    """
+
+    def __init__(self, ruta_db):
+        self._lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(_ESQUEMA)
+        self.conexion.create_function('REGEXP', 2, _regexp, deterministic=True)
+
+    def raices(self):
+        return [r for (r,) in self.conexion.execute("SELECT ruta FROM raices ORDER BY ruta")]
+
+    def raiz_de(self, ruta):
+        """Raiz indexada que contiene ruta, o None si ruta no esta en el indice."""
+        ruta = os.path.abspath(ruta)
+        for raiz in self.raices():
+            if ruta == raiz or ruta.startswith(raiz.rstrip(os.sep) + os.sep):
+                return raiz
+        return None
+
+    def indexar(self, raiz, hilos=8):
+        """Indexa (o refresca) el arbol bajo raiz y devuelve un ResultadoIndexado."""
+        resultado = ResultadoIndexado()
+        inicio = time.monotonic()
+        raiz = os.path.abspath(raiz)
+        desde, hasta = _rango_prefijo(raiz)
+        with self._lock, self.conexion:
+            self.conexion.execute("INSERT OR IGNORE INTO raices (ruta) VALUES (?)", (raiz,))
+            conocidos = {}  # ruta -> (id, mtime)
+            hijos = defaultdict(list)  # id del padre -> rutas de sus subdirectorios
+            for id_, ruta, padre, mtime in self.conexion.execute(
+                    "SELECT id, ruta, padre, mtime FROM dirs WHERE ruta = ? OR (ruta >= ? AND ruta < ?)",
+                    (raiz, desde, hasta)):
+                conocidos[ruta] = (id_, mtime)
+                hijos[padre].append(ruta)
+
+            def leer(ruta):
+                conocido = conocidos.get(ruta)
+                try:
+                    mtime = os.stat(ruta).st_mtime_ns
+                    mismo_listado = conocido is not None and conocido[1] == mtime
+                    entradas = []
+                    subdirectorios = []
+                    with os.scandir(ruta) as it:
+                        for entrada in it:
+                            try:
+                                st = entrada.stat(follow_symlinks=False)
+                            except OSError:
+                                continue  # Borrado mientras se leia el directorio
+                            tipo = _tipo(st.st_mode)
+                            entradas.append((entrada.name, tipo, st.st_size if tipo != 'd' else 0,
+                                             int(st.st_mtime)))
+                            if tipo == 'd':
+                                subdirectorios.append(entrada.path)
+                    return ruta, mtime, entradas, subdirectorios, mismo_listado, None
+                except OSError as e:
+                    # Se conserva lo que hubiera en el indice para este directorio
+                    return ruta, None, None, hijos[conocido[0]] if conocido else [], False, e
+
+            vistos = set()
+            ids = {ruta: id_ for ruta, (id_, _) in conocidos.items()}
+            with ThreadPoolExecutor(max_workers=max(1, hilos)) as pool:
+                pendientes = {pool.submit(leer, raiz)}
+                while pendientes:
+                    hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                    for futuro in hechos:
+                        ruta, mtime, entradas, subdirectorios, mismo_listado, error = futuro.result()
+                        if error is not None:
+                            if ruta == raiz:
+                                raise error
+                            resultado.errores.append((ruta, str(error)))
+                            if ruta not in conocidos:
+                                continue
+                        vistos.add(ruta)
+                        if mismo_listado:
+                            resultado.saltados += 1
+                            resultado.entradas += self._refrescar_directorio(ids[ruta], entradas)
+                        elif entradas is not None:
+                            self._guardar_directorio(ruta, mtime, entradas, ids, conocidos)
+                            resultado.leidos += 1
+                            resultado.entradas += len(entradas)
+                        for sub in subdirectorios:
+                            pendientes.add(pool.submit(leer, sub))
+
+            desaparecidos = [(id_,) for ruta, (id_, _) in conocidos.items() if ruta not in vistos]
+            self.conexion.executemany("DELETE FROM archivos WHERE dir = ?", desaparecidos)
+            self.conexion.executemany("DELETE FROM dirs WHERE id = ?", desaparecidos)
+            resultado.borrados = len(desaparecidos)
+        resultado.segundos = time.monotonic() - inicio
+        return resultado
+
+    def _refrescar_directorio(self, id_, entradas):
+        """Actualiza tamaño y fecha de las entradas que cambiaron; devuelve cuantas eran."""
+        guardadas = {nombre: (tamano, mtime) for nombre, tamano, mtime in self.conexion.execute(
+            "SELECT nombre, tamano, mtime FROM archivos WHERE dir = ?", (id_,))}
+        cambiadas = [(tamano, mtime, id_, nombre) for nombre, _, tamano, mtime in entradas
+                     if guardadas.get(nombre) != (tamano, mtime)]
+        self.conexion.executemany("UPDATE archivos SET tamano = ?, mtime = ? WHERE dir = ? AND nombre = ?", cambiadas)
+        return len(cambiadas)
+
+    def _guardar_directorio(self, ruta, mtime, entradas, ids, conocidos):
+        padre = ids.get(os.path.dirname(ruta))
+        if ruta in conocidos:
+            # El padre puede haber cambiado si antes se indexo este directorio como raiz
+            id_ = ids[ruta]
+            self.conexion.execute("UPDATE dirs SET mtime = ?, padre = ? WHERE id = ?", (mtime, padre, id_))
+            self.conexion.execute("DELETE FROM archivos WHERE dir = ?", (id_,))
+        else:
+            id_ = self.conexion.execute("INSERT OR REPLACE INTO dirs (ruta, padre, mtime) VALUES (?, ?, ?)",
+                                        (ruta, padre, mtime)).lastrowid
+            ids[ruta] = id_
+        self.conexion.executemany("INSERT INTO archivos (dir, nombre, tipo, tamano, mtime) VALUES (?, ?, ?, ?, ?)",
+                                  [(id_, *entrada) for entrada in entradas])
+
+    def buscar(self, ruta, patron=None, regex=None, tipo=None, mayor=None, menor=None,
+               modificado_desde=None, modificado_hasta=None, limite=0):
+        """Genera (ruta, tipo, tamaño, mtime) de las entradas bajo ruta que cumplen los filtros.
+
+        patron es un glob sobre el nombre; regex, una expresion regular sobre la ruta completa.
+        """
+        if regex is not None:
+            try:
+                _compilar(regex)
+            except re.error as e:
+                raise ValueError(f"expresión regular no válida: {e}")
+        ruta = os.path.abspath(ruta)
+        desde, hasta = _rango_prefijo(ruta)
+        consulta = ["SELECT d.ruta, a.nombre, a.tipo, a.tamano, a.mtime FROM archivos a JOIN dirs d ON a.dir = d.id "
+                    "WHERE (d.ruta = ? OR (d.ruta >= ? AND d.ruta < ?))"]
+        parametros = [ruta, desde, hasta]
+        for condicion, valor in (("a.nombre GLOB ?", patron), ("d.ruta || '/' || a.nombre REGEXP ?", regex),
+                                 ("a.tipo = ?", tipo), ("a.tamano > ?", mayor), ("a.tamano < ?", menor),
+                                 ("a.mtime >= ?", modificado_desde), ("a.mtime < ?", modificado_hasta)):
+            if valor is not None:
+                consulta.append(condicion)
+                parametros.append(valor)
+        sql = ' AND '.join(consulta) + " ORDER BY d.ruta, a.nombre"
+        if limite:
+            sql += f" LIMIT {int(limite)}"
+        with self._lock:
+            filas = self.conexion.execute(sql, parametros).fetchall()
+        for directorio, nombre, tipo_, tamano, mtime in filas:
+            yield os.path.join(directorio, nombre), tipo_, tamano, mtime
+
+    def uso(self, ruta, profundidad=1):
+        """Devuelve [(subarbol, bytes, archivos)] bajo ruta agrupando hasta la profundidad dada."""
+        ruta = os.path.abspath(ruta)
+        desde, hasta = _rango_prefijo(ruta)
+        with self._lock:
+            filas = self.conexion.execute(
+                "SELECT d.ruta, SUM(a.tamano), SUM(a.tipo != 'd') FROM archivos a JOIN dirs d ON a.dir = d.id "
+                "WHERE d.ruta = ? OR (d.ruta >= ? AND d.ruta < ?) GROUP BY d.ruta", (ruta, desde, hasta)).fetchall()
+        totales = defaultdict(lambda: [0, 0])
+        base = len(ruta.rstrip(os.sep).split(os.sep))
+        for directorio, tamano, archivos in filas:
+            partes = directorio.rstrip(os.sep).split(os.sep)
+            clave = os.sep.join(partes[:base + profundidad]) if len(partes) > base else ruta
+            totales[clave][0] += tamano or 0
+            totales[clave][1] += archivos or 0
+        # La fila de ruta solo tiene sentido si contiene archivos sueltos
+        return sorted(((r, t, n) for r, (t, n) in totales.items() if r != ruta or n),
+                      key=lambda x: x[1], reverse=True)
+
+    def close(self):
+        self.conexion.close()
+
+
+def formatear_entrada(ruta, tipo, tamano, mtime):
+    """Linea de 'buscar -l': tipo, tamaño, fecha y ruta."""
+    return f"{tipo} {formatear_bytes(tamano):>10} {time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime))} {ruta}"
@@ -0,0 +1,174 @@
+import fnmatch
+import os
+import stat
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from Copiador import formatear_bytes
+
+MAX_DIRECTORIOS_CACHE = 64  # Directorios guardados en la cache de metadatos
+
+ORDENES = ('nombre', 'tamano', 'fecha', 'tipo')
+
+
+class Entrada:
+    """Una entrada de directorio.
+
+    El tipo sale de scandir (d_type) sin llamar a stat; el stat solo se hace si
+    se pide el tamaño, la fecha o los permisos (listar -l u ordenar por ellos).
+    """
+
+    __slots__ = ('nombre', 'ruta', 'tipo', '_st')
+
+    def __init__(self, nombre, ruta, tipo):
+        self.nombre = nombre
+        self.ruta = ruta
+        self.tipo = tipo
+        self._st = None
+
+    def _stat(self):
+        if self._st is None:
+            try:
+                self._st = os.lstat(self.ruta)
+            except OSError:
+                self._st = _SIN_STAT  # Borrada despues de listar el directorio
+        return self._st
+
+    @property
+    def tamano(self):
+        return self._stat().st_size
+
+    @property
+    def mtime(self):
+        return self._stat().st_mtime
+
+    @property
+    def modo(self):
+        return self._stat().st_mode
+
+    def es_directorio(self):
+        return self.tipo == 'd'
+
+    def formato_largo(self):
+        fecha = datetime.fromtimestamp(self.mtime).strftime("%Y-%m-%d %H:%M")
+        return f"{stat.filemode(self.modo)} {formatear_bytes(self.tamano):>10} {fecha} {self.nombre}"
+
+
+_SIN_STAT = os.stat_result((0,) * 10)
+
+
+def _datos_de_scandir(entrada):
+    """(nombre, ruta, tipo) de una entrada de scandir sin hacer stat (salvo si el sistema no da d_type)."""
+    try:
+        if entrada.is_symlink():
+            tipo = 'l'
+        elif entrada.is_dir(follow_symlinks=False):
+            tipo = 'd'
+        else:
+            tipo = '-'
+    except OSError:
+        tipo = '-'
+    return entrada.name, entrada.path, tipo
+
+
+def _en_orden_de_lectura(it):
+    with it:
+        for entrada in it:
+            yield Entrada(*_datos_de_scandir(entrada))
+
+
+class Listador:
+    """Lista directorios con os.scandir y una cache LRU por directorio.
+
+    La cache guarda solo los nombres y tipos, y se valida con el inodo, el
+    dispositivo y el mtime del directorio, que cambian cuando se crea, borra o
+    renombra una entrada. Tamaños y fechas no se guardan: un archivo que crece no
+    cambia el mtime del directorio, asi que se leen de nuevo en cada listado.
+    """
+
+    def __init__(self, max_directorios=MAX_DIRECTORIOS_CACHE):
+        self.max_directorios = max_directorios
+        self._cache = OrderedDict()  # ruta -> (clave, [(nombre, ruta, tipo)])
+        self._nombres = OrderedDict()  # ruta -> (clave, [(nombre, es_directorio)]), para completar rutas
+        self._lock = threading.Lock()
+
+    def entradas(self, directorio):
+        """Devuelve las entradas del directorio; el listado sale de la cache si no ha cambiado."""
+        return [Entrada(*datos) for datos in self._cacheado(self._cache, directorio, _datos_de_scandir)]
+
+    def nombres(self, directorio):
+        """Devuelve [(nombre, es_directorio)] del directorio, desde la cache si no ha cambiado.
+
+        Solo usa el tipo que da scandir, sin un stat por entrada (salvo en los
+        enlaces simbolicos), que es lo que hace lento leer directorios por NFS.
+        """
+        return self._cacheado(self._nombres, directorio, lambda e: (e.name, e.is_dir()))
+
+    def _cacheado(self, cache, directorio, convertir):
+        st = os.stat(directorio)
+        clave = (st.st_dev, st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            guardado = cache.get(directorio)
+            if guardado is not None and guardado[0] == clave:
+                cache.move_to_end(directorio)
+                return guardado[1]
+
+        with os.scandir(directorio) as it:
+            entradas = [convertir(e) for e in it]
+
+        with self._lock:
+            cache[directorio] = (clave, entradas)
+            cache.move_to_end(directorio)
+            while len(cache) > self.max_directorios:
+                cache.popitem(last=False)
+        return entradas
+
+    def invalidar(self, directorio=None):
+        """Olvida un directorio de la cache (o toda la cache)."""
+        with self._lock:
+            for cache in (self._cache, self._nombres):
+                if directorio is None:
+                    cache.clear()
+                else:
+                    cache.pop(directorio, None)
+
+    def listar(self, directorio, patron=None, orden='nombre', inverso=False,
+               recursivo=False, profundidad=None, ocultos=True):
+        """Generador de (directorio, Entrada) que se consume a medida que se imprime.
+
+        Sin orden (orden=None) se recorre scandir directamente, sin la cache, y
+        cada entrada sale en cuanto se lee; con orden se ordena solo cada directorio.
+        """
+        pila = [(directorio, 0)]
+        while pila:
+            actual, nivel = pila.pop()
+            try:
+                if orden is None:
+                    entradas = _en_orden_de_lectura(os.scandir(actual))
+                else:
+                    entradas = sorted(self.entradas(actual), key=_CLAVES_ORDEN[orden], reverse=inverso)
+            except OSError as e:
+                yield actual, e
+                continue
+
+            subdirectorios = []
+            for entrada in entradas:
+                if not ocultos and entrada.nombre.startswith('.'):
+                    continue
+                if patron is None or fnmatch.fnmatch(entrada.nombre, patron):
+                    yield actual, entrada
+                if recursivo and entrada.es_directorio() and (profundidad is None or nivel < profundidad):
+                    subdirectorios.append(entrada.ruta)
+
+            # Se apilan al reves para recorrerlos en el mismo orden en que se listaron
+            for sub in reversed(subdirectorios):
+                pila.append((sub, nivel + 1))
+
+
+_CLAVES_ORDEN = {
+    'nombre': lambda e: e.nombre,
+    'tamano': lambda e: e.tamano,
+    'fecha': lambda e: e.mtime,
+    'tipo': lambda e: (e.tipo != 'd', e.nombre),
+}
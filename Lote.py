@@ -0,0 +1,281 @@
+import contextlib
+import glob
+import io
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+BARRERA = 'barrera'  # Linea que obliga a terminar todo lo anterior antes de seguir
+
+# Comandos que pueden ejecutarse en paralelo: (atributos de args con rutas, si se resuelven
+# desde current_directory; si no, desde el directorio del proceso, como hace el comando).
+# Cualquier otro comando se ejecuta solo, como si tuviera una barrera antes y otra despues.
+# mover no esta: todos los movimientos comparten el diario MOVER_DIARIO (y --reanudar y
+# --deshacer no declaran rutas), asi que dos mover a la vez se pisarian el diario.
+RUTAS_POR_COMANDO = {
+    'creardir': (('dirname',), False),
+    'creararchivo': (('filename',), False),
+    'renombrar': (('source', 'new_name'), False),
+    'copiar': (('source', 'destination'), True),
+    'permisos': (('files',), True),
+    'propietario': (('files',), True),
+    'sincronizar': (('origen', 'destino'), True),
+}
+
+
+class Orden:
+    """Una linea del lote ya analizada."""
+
+    __slots__ = ('numero', 'linea', 'statement', 'args', 'salida', 'ok', 'segundos')
+
+    def __init__(self, numero, linea, statement, args):
+        self.numero = numero
+        self.linea = linea
+        self.statement = statement
+        self.args = args  # None si el comando no se puede ejecutar en paralelo
+        self.salida = ''
+        self.ok = False
+        self.segundos = 0.0
+
+    def paralelizable(self):
+        return self.args is not None
+
+    def rutas(self, directorio_actual):
+        atributos, relativa_a_actual = RUTAS_POR_COMANDO[self.statement.command]
+        base = directorio_actual if relativa_a_actual else os.getcwd()
+        rutas = []
+        for atributo in atributos:
+            valor = getattr(self.args, atributo)
+            for ruta in (valor if isinstance(valor, list) else [valor]):
+                # Un glob puede tocar cualquier cosa bajo su primer componente con comodines
+                partes = os.path.join(base, ruta).split(os.sep)
+                fijas = itertools.takewhile(lambda parte: not glob.has_magic(parte), partes)
+                rutas.append(os.path.realpath(os.sep.join(fijas) or os.sep))
+        return rutas
+
+
+def leer_lote(archivo):
+    """Lee las lineas del lote desde un archivo o desde stdin si archivo es '-'."""
+    if archivo == '-':
+        return sys.stdin.read().splitlines()
+    with open(archivo, 'r') as f:
+        return f.read().splitlines()
+
+
+def parsear_lote(app, lineas):
+    """Analiza todo el lote antes de ejecutar nada.
+
+    Devuelve (ordenes, errores): ordenes es una lista de Orden y BARRERA;
+    errores, una lista de (numero de linea, linea, mensaje).
+    """
+    ordenes = []
+    errores = []
+    for numero, linea in enumerate(lineas, 1):
+        texto = linea.strip()
+        if not texto or texto.startswith('#'):
+            continue
+        if texto == BARRERA:
+            ordenes.append(BARRERA)
+            continue
+        try:
+            statement = app.statement_parser.parse(texto)
+        except Exception as e:
+            errores.append((numero, texto, str(e)))
+            continue
+        comando = statement.command
+        func = app.cmd_func(comando)
+        if func is None:
+            if comando not in app.aliases and comando not in app.macros:
+                errores.append((numero, texto, f"comando desconocido: {comando}"))
+            else:
+                ordenes.append(Orden(numero, texto, statement, None))
+            continue
+
+        args = None
+        parser = app._command_parsers.get(func)
+        if parser is not None:
+            mensajes = io.StringIO()
+            try:
+                with contextlib.redirect_stderr(mensajes), contextlib.redirect_stdout(mensajes):
+                    args = parser.parse_args(statement.argv[1:])
+            except SystemExit:
+                mensaje = mensajes.getvalue().strip().splitlines()
+                errores.append((numero, texto, mensaje[-1] if mensaje else 'error de sintaxis'))
+                continue
+        # Las redirecciones y tuberias las resuelve cmd2: esas lineas se ejecutan solas
+        if comando not in RUTAS_POR_COMANDO or statement.output or statement.pipe_to:
+            args = None
+        ordenes.append(Orden(numero, texto, statement, args))
+    return ordenes, errores
+
+
+def fases(ordenes):
+    """Agrupa las ordenes en fases que se ejecutan una tras otra.
+
+    Una fase es una lista de ordenes paralelizables o una unica orden que no lo es.
+    """
+    actual = []
+    for orden in ordenes:
+        if orden is BARRERA or not orden.paralelizable():
+            if actual:
+                yield actual
+                actual = []
+            if orden is not BARRERA:
+                yield [orden]
+            continue
+        actual.append(orden)
+    if actual:
+        yield actual
+
+
+def _solapan(rutas_a, rutas_b):
+    for a in rutas_a:
+        for b in rutas_b:
+            if a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep):
+                return True
+    return False
+
+
+class _SalidaPorHilo:
+    """Flujo que redirige lo escrito por cada hilo a su propio bufer, si lo tiene."""
+
+    def __init__(self, original):
+        self.original = original
+        self.local = threading.local()
+
+    def capturar(self):
+        self.local.bufer = io.StringIO()
+
+    def soltar(self):
+        bufer = getattr(self.local, 'bufer', None)
+        self.local.bufer = None
+        return bufer.getvalue() if bufer is not None else ''
+
+    def write(self, texto):
+        bufer = getattr(self.local, 'bufer', None)
+        if bufer is not None:
+            return bufer.write(texto)
+        return self.original.write(texto)
+
+    def flush(self):
+        self.original.flush()
+
+    def isatty(self):
+        return False  # Sin barras de progreso dentro de un lote
+
+    def __getattr__(self, nombre):
+        return getattr(self.original, nombre)
+
+
+class EjecutorLote:
+    """Ejecuta un lote analizado: en paralelo las ordenes cuyas rutas no se solapan.
+
+    Dentro de una fase, cada orden espera a las anteriores que tocan alguna de sus
+    rutas (o un directorio que las contiene), asi que el resultado es el mismo que
+    ejecutandolas en orden. La salida de cada orden se acumula y se escribe en el
+    orden del lote. Una orden falla si lanza una excepcion o escribe en stderr.
+    """
+
+    def __init__(self, app, hilos, al_terminar=None):
+        self.app = app
+        self.hilos = hilos
+        self.al_terminar = al_terminar  # Se llama con cada Orden ejecutada en paralelo
+        self.ordenes = []
+        self.detenido = False
+
+    def ejecutar(self, ordenes):
+        """Ejecuta todas las fases y devuelve la lista de Orden ejecutadas."""
+        salida = _SalidaPorHilo(self.app.stdout)
+        errores = _SalidaPorHilo(sys.stderr)
+        self.app.stdout, sys.stderr = salida, errores
+        try:
+            with ThreadPoolExecutor(max_workers=self.hilos) as pool:
+                for fase in fases(ordenes):
+                    if len(fase) == 1 and not fase[0].paralelizable():
+                        self._ejecutar_sola(fase[0], salida, errores)
+                    else:
+                        self._ejecutar_fase(pool, fase, salida, errores)
+                    if self.detenido:
+                        break
+        finally:
+            self.app.stdout, sys.stderr = salida.original, errores.original
+        return self.ordenes
+
+    def _ejecutar_sola(self, orden, salida, errores):
+        """Ordenes con estado compartido (ir, usuario, ejecutar...): pasan por cmd2 con sus hooks."""
+        salida.capturar()
+        errores.capturar()
+        inicio = time.perf_counter()
+        try:
+            self.detenido = self.app.onecmd_plus_hooks(orden.linea)
+        finally:
+            orden.segundos = time.perf_counter() - inicio
+            orden.salida = salida.soltar()
+            error = errores.soltar()
+        orden.ok = not error
+        self._emitir([(orden, error)], salida, errores)
+        self.ordenes.append(orden)
+
+    def _ejecutar_fase(self, pool, fase, salida, errores):
+        directorio = self.app.current_directory
+        rutas = [orden.rutas(directorio) for orden in fase]
+        dependencias = [{j for j in range(i) if _solapan(rutas[i], rutas[j])} for i in range(len(fase))]
+        pendientes = set(range(len(fase)))
+        terminadas = {}  # indice -> texto de stderr
+        en_curso = {}
+        siguiente = 0  # Primera orden cuya salida aun no se ha escrito
+
+        while pendientes or en_curso:
+            for i in sorted(pendientes):
+                if dependencias[i].issubset(terminadas):
+                    pendientes.discard(i)
+                    en_curso[pool.submit(self._ejecutar_orden, fase[i], salida, errores)] = i
+            hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                terminadas[en_curso.pop(futuro)] = futuro.result()
+            listas = []
+            while siguiente in terminadas:
+                listas.append((fase[siguiente], terminadas[siguiente]))
+                self.ordenes.append(fase[siguiente])
+                siguiente += 1
+            self._emitir(listas, salida, errores)
+
+    def _ejecutar_orden(self, orden, salida, errores):
+        salida.capturar()
+        errores.capturar()
+        inicio = time.perf_counter()
+        try:
+            self.app.cmd_func(orden.statement.command)(orden.statement)
+        except Exception as e:
+            sys.stderr.write(f"{e}\n")
+        finally:
+            orden.segundos = time.perf_counter() - inicio
+            orden.salida = salida.soltar()
+            error = errores.soltar()
+        orden.ok = not error
+        if self.al_terminar:
+            self.al_terminar(orden)
+        return error
+
+    @staticmethod
+    def _emitir(terminadas, salida, errores):
+        """Escribe de una vez la salida de las ordenes terminadas; los errores, con su linea."""
+        texto = ''.join(orden.salida for orden, _ in terminadas)
+        if texto:
+            salida.original.write(texto)
+        for orden, error in terminadas:
+            if error:
+                errores.original.write(f"línea {orden.numero}: {error}")
+
+
+def resumen(ordenes, segundos, hilos):
+    """Texto final con correctas, fallidas y tiempo total."""
+    fallidas = [o for o in ordenes if not o.ok]
+    lineas = [f"Lote: {len(ordenes)} comandos, {len(ordenes) - len(fallidas)} correctos, "
+              f"{len(fallidas)} fallidos en {segundos:.2f} s ({hilos} hilos)"]
+    for orden in fallidas:
+        lineas.append(f"  Falló la línea {orden.numero}: {orden.linea}")
+    return '\n'.join(lineas)
@@ -0,0 +1,209 @@
+import bisect
+import os
+import sys
+import threading
+import time
+
+# Limites superiores de los buckets del histograma en segundos: crecen un 19% (2^(1/4))
+# desde 1 microsegundo hasta ~1 hora, asi que el error de un percentil es como mucho de un bucket.
+LIMITES = [1e-6 * 2 ** (i / 4) for i in range(130)]
+
+# Buckets (en segundos) que se exportan en formato Prometheus
+LIMITES_PROMETHEUS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_procesos_lanzados = 0
+_hilo_medido = None  # threading.get_ident() del hilo que ejecuta el comando medido
+_contador_instalado = False
+
+
+def _auditar(evento, args):
+    global _procesos_lanzados
+    if (evento == 'subprocess.Popen' or evento == 'os.system') and threading.get_ident() == _hilo_medido:
+        _procesos_lanzados += 1
+
+
+def instalar_contador_procesos():
+    """Cuenta los procesos que lanza el comando en curso con un audit hook (no se puede desinstalar).
+
+    Solo cuentan los lanzados desde el hilo del comando: los de los demonios, el
+    supervisor o los trabajos en segundo plano no se le atribuyen (tampoco los de
+    los hilos auxiliares de ejecutar -p). El hook se llama en cada evento auditado
+    del interprete y ese coste no entra en Metricas.sobrecoste.
+    """
+    global _contador_instalado
+    if _contador_instalado:
+        return
+    _contador_instalado = True
+    sys.addaudithook(_auditar)
+
+
+class Histograma:
+    """Histograma de buckets fijos: registrar un valor es una busqueda binaria y una suma."""
+
+    __slots__ = ('cuentas', 'total', 'suma')
+
+    def __init__(self):
+        self.cuentas = [0] * (len(LIMITES) + 1)
+        self.total = 0
+        self.suma = 0.0
+
+    def registrar(self, valor):
+        self.cuentas[bisect.bisect_left(LIMITES, valor)] += 1
+        self.total += 1
+        self.suma += valor
+
+    def percentil(self, p):
+        """Limite superior del bucket donde cae el percentil p."""
+        if not self.total:
+            return 0.0
+        objetivo = p / 100 * self.total
+        acumulado = 0
+        for indice, cuenta in enumerate(self.cuentas):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return LIMITES[indice] if indice < len(LIMITES) else float('inf')
+        return float('inf')
+
+    def acumulado_hasta(self, limite):
+        """Numero de valores en buckets cuyo limite superior es <= limite."""
+        return sum(self.cuentas[:bisect.bisect_right(LIMITES, limite)])
+
+
+class MetricaComando:
+    """Metricas acumuladas de un comando."""
+
+    __slots__ = ('tiempo', 'cpu', 'bytes_leidos', 'bytes_escritos', 'procesos')
+
+    def __init__(self):
+        self.tiempo = Histograma()
+        self.cpu = 0.0
+        self.bytes_leidos = 0
+        self.bytes_escritos = 0
+        self.procesos = 0
+
+
+class Metricas:
+    """Metricas por comando tomadas en los hooks previo y posterior de cmd2."""
+
+    def __init__(self):
+        instalar_contador_procesos()
+        self.comandos = {}  # nombre -> MetricaComando
+        self.sobrecoste = 0.0  # Tiempo total gastado dentro de los propios hooks (sin el audit hook)
+        self.mediciones = 0
+        self._inicio = None
+        self._lock = threading.Lock()
+        self._exportador = None
+        try:
+            self._fd_io = os.open('/proc/self/io', os.O_RDONLY)
+        except OSError:
+            self._fd_io = None  # Sin /proc no se miden bytes
+
+    def _io(self):
+        """(bytes leidos, bytes escritos) del proceso segun /proc/self/io (rchar, wchar)."""
+        if self._fd_io is None:
+            return 0, 0
+        datos = os.pread(self._fd_io, 512, 0).split()
+        return int(datos[1]), int(datos[3])
+
+    def inicio(self):
+        global _hilo_medido
+        t = time.perf_counter()
+        _hilo_medido = threading.get_ident()
+        leidos, escritos = self._io()
+        self._inicio = (time.perf_counter(), time.process_time(), leidos, escritos, _procesos_lanzados)
+        self.sobrecoste += time.perf_counter() - t
+
+    def fin(self, comando):
+        global _hilo_medido
+        fin = time.perf_counter()
+        if self._inicio is None:
+            return
+        _hilo_medido = None
+        cpu = time.process_time()
+        leidos, escritos = self._io()
+        inicio, cpu_inicio, leidos_inicio, escritos_inicio, procesos_inicio = self._inicio
+        self._inicio = None
+        with self._lock:
+            metrica = self.comandos.get(comando)
+            if metrica is None:
+                metrica = self.comandos[comando] = MetricaComando()
+            metrica.tiempo.registrar(fin - inicio)
+            metrica.cpu += cpu - cpu_inicio
+            metrica.bytes_leidos += leidos - leidos_inicio
+            metrica.bytes_escritos += escritos - escritos_inicio
+            metrica.procesos += _procesos_lanzados - procesos_inicio
+        self.mediciones += 1
+        self.sobrecoste += time.perf_counter() - fin
+
+    def sobrecoste_medio(self):
+        """Segundos medios que añaden los hooks de metricas a cada comando."""
+        return self.sobrecoste / self.mediciones if self.mediciones else 0.0
+
+    def reiniciar(self):
+        with self._lock:
+            self.comandos.clear()
+        self.sobrecoste = 0.0
+        self.mediciones = 0
+
+    def prometheus(self):
+        """Devuelve las metricas en el formato de texto de Prometheus."""
+        lineas = [
+            '# HELP shell_comando_segundos Duracion de los comandos de la shell.',
+            '# TYPE shell_comando_segundos histogram',
+        ]
+        with self._lock:
+            comandos = sorted(self.comandos.items())
+        for nombre, m in comandos:
+            etiqueta = f'comando="{_escapar(nombre)}"'
+            for limite in LIMITES_PROMETHEUS:
+                lineas.append(f'shell_comando_segundos_bucket{{{etiqueta},le="{limite}"}} {m.tiempo.acumulado_hasta(limite)}')
+            lineas.append(f'shell_comando_segundos_bucket{{{etiqueta},le="+Inf"}} {m.tiempo.total}')
+            lineas.append(f'shell_comando_segundos_sum{{{etiqueta}}} {m.tiempo.suma}')
+            lineas.append(f'shell_comando_segundos_count{{{etiqueta}}} {m.tiempo.total}')
+        for metrica, ayuda, atributo in (
+                ('shell_comando_cpu_segundos_total', 'Tiempo de CPU consumido por los comandos.', 'cpu'),
+                ('shell_comando_bytes_leidos_total', 'Bytes leidos durante los comandos.', 'bytes_leidos'),
+                ('shell_comando_bytes_escritos_total', 'Bytes escritos durante los comandos.', 'bytes_escritos'),
+                ('shell_comando_procesos_total', 'Procesos lanzados por los comandos.', 'procesos')):
+            lineas.append(f'# HELP {metrica} {ayuda}')
+            lineas.append(f'# TYPE {metrica} counter')
+            for nombre, m in comandos:
+                lineas.append(f'{metrica}{{comando="{_escapar(nombre)}"}} {getattr(m, atributo)}')
+        return '\n'.join(lineas) + '\n'
+
+    def exportar(self, ruta):
+        """Escribe el archivo de forma atomica para que node_exporter nunca lea uno a medias."""
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(temporal, ruta)
+
+    def iniciar_exportacion(self, ruta, intervalo):
+        """Exporta periodicamente las metricas a ruta desde un hilo en segundo plano."""
+        self.detener_exportacion()
+        parar = threading.Event()
+
+        def bucle():
+            while not parar.is_set():
+                try:
+                    self.exportar(ruta)
+                except OSError:
+                    pass
+                parar.wait(intervalo)
+
+        hilo = threading.Thread(target=bucle, name='exportador-metricas', daemon=True)
+        self._exportador = (parar, hilo, ruta)
+        hilo.start()
+
+    def detener_exportacion(self):
+        if self._exportador is not None:
+            parar, hilo, ruta = self._exportador
+            parar.set()
+            hilo.join()
+            self._exportador = None
+            return ruta
+        return None
+
+
+def _escapar(texto):
+    return texto.replace('\\', '\\\\').replace('"', '\\"')
@@ -0,0 +1,260 @@
+import errno
+import glob
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Copiador import Copiador, formatear_bytes
+from Sincronizador import calcular_hash, escanear
+
+# Estados de una entrada del diario
+COPIANDO = 'copiando'  # El origen sigue intacto; el destino puede estar a medias
+BORRANDO = 'borrando'  # La copia esta verificada; el origen puede estar a medio borrar
+
+
+def expandir(patrones, base):
+    """Expande globs relativos a base; devuelve (rutas absolutas, patrones sin coincidencias)."""
+    rutas = []
+    sin_coincidencias = []
+    for patron in patrones:
+        completo = os.path.join(base, patron)
+        if glob.has_magic(patron):
+            encontradas = sorted(glob.glob(completo))
+            if not encontradas:
+                sin_coincidencias.append(patron)
+            rutas.extend(encontradas)
+        elif os.path.lexists(completo):
+            rutas.append(completo)
+        else:
+            sin_coincidencias.append(patron)
+    return [os.path.abspath(r) for r in dict.fromkeys(rutas)], sin_coincidencias
+
+
+def _borrar(ruta):
+    if os.path.isdir(ruta) and not os.path.islink(ruta):
+        shutil.rmtree(ruta)
+    elif os.path.lexists(ruta):
+        os.unlink(ruta)
+
+
+class ResultadoMovimiento:
+    """Totales de un movimiento: renombrados en el mismo dispositivo y copiados entre dispositivos."""
+
+    def __init__(self):
+        self.renombrados = 0
+        self.copiados = 0
+        self.bytes = 0
+        self.segundos = 0.0
+        self.errores = []  # Lista de (ruta, mensaje)
+
+    def resumen(self):
+        texto = f"Movidos {self.renombrados + self.copiados} elementos ({self.renombrados} renombrados"
+        if self.copiados:
+            velocidad = self.bytes / self.segundos if self.segundos > 0 else 0
+            texto += (f", {self.copiados} copiados entre dispositivos: {formatear_bytes(self.bytes)}, "
+                      f"{formatear_bytes(velocidad)}/s")
+        return texto + f") en {self.segundos:.2f} s."
+
+
+class Movedor:
+    """Mueve varias rutas a un destino.
+
+    En el mismo dispositivo cada ruta se mueve con un unico os.rename. Entre
+    dispositivos se copia en paralelo con Copiador, se verifica la copia y solo
+    entonces se borra el origen. Cada paso se anota en un diario para poder
+    reanudar o deshacer un movimiento interrumpido.
+    """
+
+    def __init__(self, diario, hilos=4, hash=False, progreso=None):
+        self.diario = diario
+        self.hilos = max(1, hilos)
+        self.hash = hash  # Verifica tambien el contenido, no solo tamaños y nombres
+        self.progreso = progreso
+        self._resultado = None
+
+    def mover(self, origenes, destino):
+        """Mueve origenes (rutas absolutas) a destino y devuelve un ResultadoMovimiento."""
+        if self.pendientes():
+            raise RuntimeError(f"Hay un movimiento interrumpido en {self.diario}: reanúdalo o deshazlo antes")
+        self._resultado = resultado = ResultadoMovimiento()
+        inicio = time.monotonic()
+        es_directorio = os.path.isdir(destino)
+        if len(origenes) > 1 and not es_directorio:
+            raise NotADirectoryError(f"{destino} no es un directorio (hay varios orígenes)")
+        directorio_destino = destino if es_directorio else os.path.dirname(destino) or '.'
+        dispositivo = os.stat(directorio_destino).st_dev
+
+        entre_dispositivos = []
+        for origen in origenes:
+            final = os.path.join(destino, os.path.basename(origen.rstrip(os.sep))) if es_directorio else destino
+            try:
+                if final == origen or final.startswith(origen + os.sep):
+                    raise ValueError("No se puede mover un directorio dentro de sí mismo")
+                if os.lstat(origen).st_dev != dispositivo:
+                    entre_dispositivos.append((origen, final))
+                    continue
+                try:
+                    os.rename(origen, final)
+                    resultado.renombrados += 1
+                except OSError as e:
+                    if e.errno != errno.EXDEV:  # Un punto de montaje dentro del mismo st_dev
+                        raise
+                    entre_dispositivos.append((origen, final))
+            except (OSError, ValueError) as e:
+                resultado.errores.append((origen, str(e)))
+
+        if entre_dispositivos:
+            self._entre_dispositivos(entre_dispositivos)
+        resultado.segundos = time.monotonic() - inicio
+        return resultado
+
+    def pendientes(self):
+        """Entradas del diario de un movimiento interrumpido."""
+        try:
+            with open(self.diario, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def reanudar(self):
+        """Termina los movimientos del diario: recopia lo que estaba a medias y borra los origenes."""
+        self._resultado = resultado = ResultadoMovimiento()
+        inicio = time.monotonic()
+        entradas = self.pendientes()
+        copiar = [(e['origen'], e['destino']) for e in entradas if e['estado'] == COPIANDO]
+        for origen, final in copiar:
+            try:
+                _borrar(final)  # La copia a medias se rehace desde cero
+            except OSError as e:
+                resultado.errores.append((final, str(e)))
+        borrar = [(e['origen'], e['destino']) for e in entradas if e['estado'] == BORRANDO]
+        self._entre_dispositivos(copiar, ya_copiados=borrar)
+        resultado.segundos = time.monotonic() - inicio
+        return resultado
+
+    def deshacer(self):
+        """Deja los origenes como estaban y borra las copias de los movimientos del diario."""
+        self._resultado = resultado = ResultadoMovimiento()
+        inicio = time.monotonic()
+        fallidas = []
+        for entrada in self.pendientes():
+            origen, final = entrada['origen'], entrada['destino']
+            try:
+                if entrada['estado'] == BORRANDO:
+                    self._restaurar(final, origen)
+                _borrar(final)
+                resultado.renombrados += 1
+            except OSError as e:
+                resultado.errores.append((origen, str(e)))
+                fallidas.append(entrada)
+        self._guardar_diario(fallidas)
+        resultado.segundos = time.monotonic() - inicio
+        return resultado
+
+    def _entre_dispositivos(self, pares, ya_copiados=()):
+        """Copia, verifica y borra el origen de cada par, anotando cada paso en el diario."""
+        resultado = self._resultado
+        estados = {origen: [origen, final, COPIANDO] for origen, final in pares}
+        for origen, final in ya_copiados:
+            estados[origen] = [origen, final, BORRANDO]
+        self._anotar(estados)
+
+        # Los archivos sueltos se copian todos juntos; los directorios, uno a uno con su arbol
+        copiador = Copiador(self.hilos, preservar=True, progreso=self.progreso)
+        archivos = []
+        for origen, final in pares:
+            if os.path.isdir(origen) and not os.path.islink(origen):
+                if os.path.isdir(final):
+                    resultado.errores.append((origen, f"{final} ya existe"))
+                    del estados[origen]
+                    continue
+                self._sumar_copia(copiador.copiar(origen, final, recursivo=True))
+            else:
+                archivos.append((origen, final, os.lstat(origen)))
+        if archivos:
+            self._sumar_copia(copiador.copiar_archivos(archivos))
+
+        for origen, final in pares:
+            if origen not in estados:
+                continue
+            diferencias = self._verificar(origen, final)
+            if diferencias:
+                # Queda en el diario como COPIANDO: se puede reanudar o deshacer
+                resultado.errores.append((origen, f"la copia no coincide ({len(diferencias)} diferencias, "
+                                                  f"p. ej. {diferencias[0]}); el origen se conserva"))
+            else:
+                estados[origen][2] = BORRANDO
+        self._anotar(estados)
+
+        for origen, (_, _, estado) in list(estados.items()):
+            if estado != BORRANDO:
+                continue
+            try:
+                _borrar(origen)
+                resultado.copiados += 1
+                del estados[origen]
+            except OSError as e:
+                resultado.errores.append((origen, str(e)))
+        self._anotar(estados)
+
+    def _sumar_copia(self, copia):
+        # Lo que no se haya podido copiar lo detecta despues la verificacion
+        self._resultado.bytes += copia.bytes
+        self._resultado.errores.extend(copia.errores)
+
+    def _verificar(self, origen, final):
+        """Lista de rutas que difieren entre el origen y la copia (vacia si coinciden).
+
+        Compara nombres y tamaños; con hash, tambien el contenido de cada archivo.
+        """
+        try:
+            if os.path.isdir(origen) and not os.path.islink(origen):
+                archivos_origen, dirs_origen = escanear(origen, self.hilos)
+                archivos_final, dirs_final = escanear(final, self.hilos)
+                pares = [(os.path.join(origen, r), os.path.join(final, r)) for r in archivos_origen]
+            else:
+                archivos_origen, dirs_origen = {'': (os.lstat(origen).st_size,)}, set()
+                archivos_final, dirs_final = {'': (os.lstat(final).st_size,)}, set()
+                pares = [(origen, final)]
+        except OSError as e:
+            return [str(e)]
+        diferencias = sorted(set(archivos_origen) ^ set(archivos_final)) + sorted(dirs_origen ^ dirs_final)
+        diferencias += [r or final for r in archivos_origen
+                        if r in archivos_final and archivos_origen[r][0] != archivos_final[r][0]]
+        if not diferencias and self.hash:
+            with ThreadPoolExecutor(max_workers=self.hilos) as pool:
+                distintos = pool.map(lambda par: calcular_hash(par[0]) != calcular_hash(par[1]), pares)
+                diferencias = [par[1] for par, distinto in zip(pares, distintos) if distinto]
+        return diferencias
+
+    def _restaurar(self, final, origen):
+        """Vuelve a copiar al origen lo que ya se habia borrado de el."""
+        if not (os.path.isdir(final) and not os.path.islink(final)):
+            if not os.path.lexists(origen):
+                Copiador(1, preservar=True).copiar_archivos([(final, origen, os.lstat(final))])
+            return
+        archivos, directorios = escanear(final, self.hilos)
+        for relativa in sorted(directorios):
+            os.makedirs(os.path.join(origen, relativa), exist_ok=True)
+        os.makedirs(origen, exist_ok=True)
+        faltan = [(os.path.join(final, r), os.path.join(origen, r), os.lstat(os.path.join(final, r)))
+                  for r in archivos if not os.path.lexists(os.path.join(origen, r))]
+        copia = Copiador(self.hilos, preservar=True).copiar_archivos(faltan)
+        if copia.errores:
+            raise OSError(f"no se pudo restaurar {copia.errores[0][0]}: {copia.errores[0][1]}")
+
+    def _anotar(self, estados):
+        self._guardar_diario([{'origen': o, 'destino': d, 'estado': e} for o, d, e in estados.values()])
+
+    def _guardar_diario(self, entradas):
+        if not entradas:
+            if os.path.exists(self.diario):
+                os.remove(self.diario)
+            return
+        with open(self.diario + '.tmp', 'w') as f:
+            json.dump(entradas, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())  # El diario tiene que sobrevivir a la interrupcion que protege
+        os.replace(self.diario + '.tmp', self.diario)
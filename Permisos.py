@@ -0,0 +1,197 @@
+import grp
+import os
+import pwd
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+_FLAGS_DIRECTORIO = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW
+
+
+@lru_cache(maxsize=1024)
+def resolver_uid(owner):
+    """Devuelve el UID de un nombre de usuario o UID numerico (KeyError si no existe)."""
+    return int(owner) if owner.isdigit() else pwd.getpwnam(owner).pw_uid
+
+
+@lru_cache(maxsize=1024)
+def resolver_gid(group):
+    """Devuelve el GID de un nombre de grupo o GID numerico (KeyError si no existe)."""
+    return int(group) if group.isdigit() else grp.getgrnam(group).gr_gid
+
+
+class ResultadoPermisos:
+    """Contadores de un cambio masivo de permisos o propietario."""
+
+    def __init__(self):
+        self.cambiados = 0
+        self.sin_cambios = 0
+        self.segundos = 0.0
+        self.errores = []  # Lista de (ruta, mensaje)
+
+    def resumen(self):
+        return (f"{self.cambiados} cambiados, {self.sin_cambios} ya correctos, "
+                f"{len(self.errores)} errores en {self.segundos:.2f} s.")
+
+
+class _DirectorioAbierto:
+    """Descriptor de un directorio que comparten sus subdirectorios pendientes de abrir.
+
+    Se cierra cuando se ha abierto el ultimo de ellos. Como cada trabajador
+    recorre su subarbol en profundidad, solo siguen abiertos los antecesores del
+    directorio en curso que aun tienen hermanos por abrir.
+    """
+
+    __slots__ = ('fd', 'pendientes')
+
+    def __init__(self, fd, pendientes):
+        self.fd = fd
+        self.pendientes = pendientes
+
+
+class AplicadorRecursivo:
+    """Aplica chmod/chown a un arbol completo usando descriptores de directorio.
+
+    Cada directorio se abre una vez (sin seguir enlaces) relativo al descriptor
+    de su padre, y todas sus entradas se tratan relativas al suyo: no se
+    resuelven rutas completas ni se puede cambiar un componente por un enlace a
+    mitad del recorrido. Las entradas que ya tienen el modo o el
+    propietario pedidos no se tocan.
+
+    Cada trabajador recorre su subarbol en profundidad. Con hilos > 1 cede
+    subdirectorios (ya abiertos) al pool mientras haya menos de 2 * hilos
+    esperando, asi que los descriptores abiertos estan acotados por
+    hilos * profundidad + 2 * hilos y no por el tamaño del arbol.
+    """
+
+    def __init__(self, mode=None, uid=-1, gid=-1, hilos=1):
+        self.mode = mode
+        self.uid = uid
+        self.gid = gid
+        self.hilos = max(1, hilos)
+        self._lock = threading.Lock()
+        self._resultado = None
+        self._pool = None
+        self._futuros = []
+        self._en_cola = 0  # Subdirectorios cedidos al pool que aun no ha empezado ningun trabajador
+
+    def aplicar(self, rutas):
+        """Recorre cada ruta y devuelve un ResultadoPermisos."""
+        self._resultado = resultado = ResultadoPermisos()
+        inicio = time.monotonic()
+        directorios = []
+        for ruta in rutas:
+            try:
+                st = os.lstat(ruta)
+                self._aplicar(ruta, st, None)
+                if stat.S_ISDIR(st.st_mode):
+                    directorios.append(ruta)
+            except OSError as e:
+                resultado.errores.append((ruta, e.strerror or str(e)))
+
+        if self.hilos == 1:
+            for ruta in directorios:
+                self._recorrer(None, ruta)
+        else:
+            with ThreadPoolExecutor(max_workers=self.hilos) as pool:
+                self._pool = pool
+                try:
+                    # Las raices se abren dentro de su tarea: esperando en la cola no ocupan descriptores
+                    self._futuros = [pool.submit(self._recorrer, None, ruta) for ruta in directorios]
+                    while True:
+                        with self._lock:
+                            futuros, self._futuros = self._futuros, []
+                        if not futuros:
+                            break
+                        for futuro in futuros:
+                            futuro.result()
+                finally:
+                    self._pool = None
+
+        resultado.segundos = time.monotonic() - inicio
+        return resultado
+
+    def _recorrer(self, fd, ruta, cedido=False):
+        """Recorre en profundidad el subarbol de un directorio y cierra su descriptor.
+
+        Con fd None el directorio (una raiz) se abre por su ruta.
+        """
+        if cedido:
+            with self._lock:
+                self._en_cola -= 1
+        if fd is None:
+            try:
+                fd = os.open(ruta, _FLAGS_DIRECTORIO)
+            except OSError as e:
+                self._error(ruta, e)
+                return
+        pila = []  # (directorio padre abierto, nombre, ruta para los mensajes)
+        self._procesar_directorio(fd, ruta, pila)
+        while pila:
+            padre, nombre, ruta = pila.pop()
+            try:
+                fd = os.open(nombre, _FLAGS_DIRECTORIO, dir_fd=padre.fd)
+            except OSError as e:
+                self._error(ruta, e)
+                continue
+            finally:
+                self._soltar(padre)
+            if not self._ceder(fd, ruta):
+                self._procesar_directorio(fd, ruta, pila)
+
+    def _ceder(self, fd, ruta):
+        """Pasa un directorio abierto al pool si hay sitio en la cola; devuelve si lo hizo."""
+        with self._lock:
+            if self._pool is None or self._en_cola >= 2 * self.hilos:
+                return False
+            self._en_cola += 1
+            self._futuros.append(self._pool.submit(self._recorrer, fd, ruta, True))
+        return True
+
+    def _procesar_directorio(self, fd, ruta, pila):
+        """Trata las entradas de un directorio abierto y apila sus subdirectorios."""
+        subdirectorios = []
+        try:
+            with os.scandir(fd) as it:
+                for entrada in it:
+                    try:
+                        st = entrada.stat(follow_symlinks=False)
+                        self._aplicar(entrada.name, st, fd)
+                        if stat.S_ISDIR(st.st_mode):
+                            subdirectorios.append(entrada.name)
+                    except OSError as e:
+                        self._error(os.path.join(ruta, entrada.name), e)
+        except OSError as e:
+            self._error(ruta, e)
+        if not subdirectorios:
+            os.close(fd)
+            return
+        abierto = _DirectorioAbierto(fd, len(subdirectorios))
+        pila.extend((abierto, sub, os.path.join(ruta, sub)) for sub in reversed(subdirectorios))
+
+    def _soltar(self, directorio):
+        directorio.pendientes -= 1  # Solo lo toca el trabajador que lo abrio
+        if directorio.pendientes == 0:
+            os.close(directorio.fd)
+
+    def _aplicar(self, nombre, st, dir_fd):
+        cambiado = False
+        if self.mode is not None and not stat.S_ISLNK(st.st_mode) and stat.S_IMODE(st.st_mode) != self.mode:
+            # En Linux los enlaces simbolicos no tienen permisos propios: se omiten
+            os.chmod(nombre, self.mode, dir_fd=dir_fd)
+            cambiado = True
+        if ((self.uid != -1 and st.st_uid != self.uid) or
+                (self.gid != -1 and st.st_gid != self.gid)):
+            os.chown(nombre, self.uid, self.gid, dir_fd=dir_fd, follow_symlinks=False)
+            cambiado = True
+        with self._lock:
+            if cambiado:
+                self._resultado.cambiados += 1
+            else:
+                self._resultado.sin_cambios += 1
+
+    def _error(self, ruta, e):
+        with self._lock:
+            self._resultado.errores.append((ruta, e.strerror or str(e)))
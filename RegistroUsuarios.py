@@ -0,0 +1,154 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    username TEXT PRIMARY KEY,
+    nombre   TEXT NOT NULL,
+    horario  TEXT NOT NULL,
+    lugares  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lugares (
+    lugar    TEXT NOT NULL,
+    username TEXT NOT NULL REFERENCES usuarios(username) ON DELETE CASCADE,
+    PRIMARY KEY (lugar, username)
+);
+"""
+_VERSION_MIGRADA = 1  # PRAGMA user_version tras importar el antiguo usuarios.json
+
+
+class RegistroUsuarios:
+    """Registro de usuarios en SQLite con un indice en memoria.
+
+    Al abrirse carga todos los usuarios una sola vez en dos diccionarios (por
+    nombre de usuario y por lugar de conexion); las consultas se sirven desde
+    ahi y cada alta o importacion se escribe en una unica transaccion.
+    """
+
+    def __init__(self, ruta_db, ruta_json=None):
+        self.ruta_db = ruta_db
+        self._lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute("PRAGMA foreign_keys=ON")
+        self.conexion.executescript(_ESQUEMA)
+
+        self.por_usuario = {}  # username -> dict con los datos del usuario
+        self.por_lugar = {}    # lugar -> set de usernames
+        if ruta_json and os.path.exists(ruta_json) and self._migracion_pendiente():
+            try:
+                self._migrar(ruta_json)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError, sqlite3.Error) as e:
+                self.conexion.close()
+                raise RuntimeError(f"No se pudo migrar {ruta_json} a {ruta_db} ({type(e).__name__}: {e}); "
+                                   f"se reintentará la próxima vez.") from e
+        else:
+            self._cargar()
+
+    def _migracion_pendiente(self):
+        """La base no tiene usuarios ni se ha marcado como migrada."""
+        version = self.conexion.execute("PRAGMA user_version").fetchone()[0]
+        return version < _VERSION_MIGRADA and self.conexion.execute("SELECT 1 FROM usuarios LIMIT 1").fetchone() is None
+
+    def _migrar(self, ruta_json):
+        """Importa el antiguo usuarios.json y marca la base como migrada en la misma transaccion.
+
+        Si algo falla no queda nada escrito y la marca sigue sin ponerse.
+        """
+        usuarios = leer_usuarios(ruta_json)
+        with self._lock:
+            with self.conexion:
+                self._escribir(usuarios)
+                self.conexion.execute(f"PRAGMA user_version = {_VERSION_MIGRADA}")
+            for usuario in usuarios:
+                self._indexar(usuario)
+
+    def _cargar(self):
+        for username, nombre, horario, lugares in self.conexion.execute(
+                "SELECT username, nombre, horario, lugares FROM usuarios"):
+            self._indexar({'username': username, 'nombre': nombre,
+                           'horario': horario, 'lugares': json.loads(lugares)})
+
+    def _indexar(self, usuario):
+        anterior = self.por_usuario.get(usuario['username'])
+        if anterior is not None:
+            for lugar in anterior['lugares']:
+                self.por_lugar.get(lugar, set()).discard(usuario['username'])
+        self.por_usuario[usuario['username']] = usuario
+        for lugar in usuario['lugares']:
+            self.por_lugar.setdefault(lugar, set()).add(usuario['username'])
+
+    def guardar(self, usuarios):
+        """Inserta o actualiza una lista de usuarios en una sola transaccion atomica."""
+        usuarios = list(usuarios)
+        with self._lock:
+            with self.conexion:  # COMMIT al terminar, ROLLBACK si algo falla
+                self._escribir(usuarios)
+            for usuario in usuarios:
+                self._indexar(usuario)
+        return len(usuarios)
+
+    def _escribir(self, usuarios):
+        self.conexion.executemany(
+            "INSERT OR REPLACE INTO usuarios (username, nombre, horario, lugares) VALUES (?, ?, ?, ?)",
+            [(u['username'], u['nombre'], u['horario'], json.dumps(u['lugares'])) for u in usuarios])
+        self.conexion.executemany(
+            "DELETE FROM lugares WHERE username = ?", [(u['username'],) for u in usuarios])
+        self.conexion.executemany(
+            "INSERT OR IGNORE INTO lugares (lugar, username) VALUES (?, ?)",
+            [(lugar, u['username']) for u in usuarios for lugar in u['lugares']])
+
+    def obtener(self, username):
+        """Devuelve los datos de un usuario o None."""
+        return self.por_usuario.get(username)
+
+    def por_lugar_de_conexion(self, lugar):
+        """Devuelve los usuarios que pueden conectarse desde un lugar, ordenados."""
+        return [self.por_usuario[u] for u in sorted(self.por_lugar.get(lugar, ()))]
+
+    def buscar_nombre(self, texto):
+        """Devuelve los usuarios cuyo nombre completo contiene el texto (sin distinguir mayusculas)."""
+        texto = texto.lower()
+        return [u for u in self.listar() if texto in u['nombre'].lower()]
+
+    def listar(self):
+        """Itera los usuarios ordenados por nombre de usuario."""
+        for username in sorted(self.por_usuario):
+            yield self.por_usuario[username]
+
+    def __len__(self):
+        return len(self.por_usuario)
+
+    def close(self):
+        self.conexion.close()
+
+
+def nuevo_usuario(username, nombre, horario, lugares):
+    """Construye el diccionario de datos de un usuario."""
+    return {'username': username, 'nombre': nombre, 'horario': horario, 'lugares': list(lugares)}
+
+
+def leer_usuarios(ruta):
+    """Lee usuarios de un archivo JSON (objeto o lista) o CSV con cabecera.
+
+    En CSV la columna lugares separa los valores con ';' y por defecto es localhost.
+    """
+    if ruta.lower().endswith('.json'):
+        with open(ruta, 'r') as f:
+            datos = json.load(f)
+        if isinstance(datos, dict):
+            datos = [dict(v, username=v.get('username', k)) for k, v in datos.items()]
+        return [nuevo_usuario(d['username'], d['nombre'], d['horario'], d.get('lugares') or ['localhost'])
+                for d in datos]
+
+    usuarios = []
+    with open(ruta, 'r', newline='') as f:
+        for fila in csv.DictReader(f):
+            lugares = [l.strip() for l in (fila.get('lugares') or '').split(';') if l.strip()]
+            usuarios.append(nuevo_usuario(fila['username'].strip(), fila['nombre'].strip(),
+                                          fila['horario'].strip(), lugares or ['localhost']))
+    return usuarios
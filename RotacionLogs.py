@@ -0,0 +1,225 @@
+import fcntl
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from EscritorLogs import FORMATO_FECHA
+
+FORMATO_SEGMENTO = "%Y%m%d-%H%M%S-%f"
+
+
+def ruta_manifiesto(ruta_log):
+    return ruta_log + '.segmentos.json'
+
+
+@contextmanager
+def bloqueo(ruta_log, exclusivo=True):
+    """flock sobre ruta_log + '.lock', compartido entre todas las shells que escriben el log.
+
+    Los escritores lo toman compartido para escribir; la rotacion y la
+    actualizacion del manifiesto, exclusivo. Cada uso abre su propio descriptor:
+    flock no excluye a dos hilos que compartan uno.
+    """
+    fd = os.open(ruta_log + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)  # Libera el flock
+
+
+def leer_manifiesto(ruta_log):
+    """Segmentos rotados de un log, del mas antiguo al mas reciente.
+
+    Cada segmento es un dict con archivo, desde, hasta (datetime o None) y bytes.
+    """
+    try:
+        with open(ruta_manifiesto(ruta_log), 'r') as f:
+            segmentos = json.load(f)
+    except (OSError, ValueError):
+        return []
+    for segmento in segmentos:
+        for campo in ('desde', 'hasta'):
+            if segmento.get(campo):
+                segmento[campo] = datetime.strptime(segmento[campo], FORMATO_FECHA)
+    return segmentos
+
+
+def _guardar_manifiesto(ruta_log, segmentos):
+    datos = [dict(s, desde=s['desde'].strftime(FORMATO_FECHA) if s['desde'] else None,
+                  hasta=s['hasta'].strftime(FORMATO_FECHA) if s['hasta'] else None) for s in segmentos]
+    temporal = ruta_manifiesto(ruta_log) + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(datos, f, indent=1)
+    os.replace(temporal, ruta_manifiesto(ruta_log))
+
+
+def primera_fecha(ruta):
+    """Fecha de la primera linea con fecha del archivo, o None."""
+    from ConsultaLogs import fecha_de_linea
+    try:
+        with open(ruta, 'rb') as f:
+            for linea in f:
+                fecha = fecha_de_linea(linea)
+                if fecha is not None:
+                    return fecha
+    except OSError:
+        pass
+    return None
+
+
+def ultima_fecha(ruta, bloque=64 * 1024):
+    """Fecha de la ultima linea con fecha, leyendo el archivo desde el final."""
+    from ConsultaLogs import fecha_de_linea
+    with open(ruta, 'rb') as f:
+        fin = f.seek(0, os.SEEK_END)
+        while fin > 0:
+            inicio = max(0, fin - bloque)
+            f.seek(inicio)
+            lineas = f.read(fin - inicio).split(b'\n')
+            if inicio > 0:
+                lineas = lineas[1:]  # La primera puede estar cortada
+            for linea in reversed(lineas):
+                fecha = fecha_de_linea(linea)
+                if fecha is not None:
+                    return fecha
+            fin = inicio
+    return None
+
+
+class Rotador:
+    """Rota los logs por tamaño o antigüedad y comprime los segmentos en segundo plano.
+
+    El escritor de logs solo renombra el archivo (una operacion instantanea); la
+    compresion con gzip, el manifiesto de segmentos y la retencion se hacen en un
+    hilo aparte para no retrasar la escritura de registros.
+
+    Varias shells pueden compartir los mismos logs: el renombrado y la
+    actualizacion del manifiesto se hacen con el bloqueo exclusivo del log, y la
+    compresion fuera de el, en un temporal propio de cada proceso.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_edad=timedelta(days=1), retener_segmentos=30,
+                 retener_dias=90, nivel=6):
+        self.max_bytes = max_bytes  # 0 desactiva la rotacion por tamaño
+        self.max_edad = max_edad  # None desactiva la rotacion por antigüedad
+        self.retener_segmentos = retener_segmentos  # 0: sin limite de segmentos
+        self.retener_dias = retener_dias  # 0: sin limite de antigüedad
+        self.nivel = nivel
+        self.cola = queue.Queue()
+        self.hilo = threading.Thread(target=self._run, name='compresor-logs', daemon=True)
+        self.hilo.start()
+
+    def debe_rotar(self, tamano, inicio):
+        """inicio es la fecha del primer registro del segmento activo."""
+        if self.max_bytes and tamano >= self.max_bytes:
+            return True
+        return bool(self.max_edad and inicio and datetime.now() - inicio >= self.max_edad)
+
+    def rotar(self, ruta_log, log=None):
+        """Aparta el log activo con un nombre con fecha y encola su compresion.
+
+        log es el archivo que tiene abierto el escritor: si ruta_log ya no es ese
+        archivo, otro proceso lo acaba de rotar y no se hace nada. Devuelve si se roto.
+        """
+        with bloqueo(ruta_log):
+            try:
+                st = os.stat(ruta_log)
+            except FileNotFoundError:
+                return False
+            if log is not None and not os.path.samestat(st, os.fstat(log.fileno())):
+                return False
+            base = f"{ruta_log}.{datetime.now().strftime(FORMATO_SEGMENTO)}"
+            segmento = base
+            n = 1
+            while os.path.exists(segmento) or os.path.exists(segmento + '.gz'):
+                segmento = f"{base}-{n}"
+                n += 1
+            os.rename(ruta_log, segmento)
+        self.cola.put((ruta_log, segmento))
+        return True
+
+    def recuperar(self, ruta_log):
+        """Encola los segmentos que quedaron sin comprimir (la shell se cerro a medias)."""
+        directorio = os.path.dirname(ruta_log) or '.'
+        prefijo = os.path.basename(ruta_log) + '.'
+        try:
+            nombres = os.listdir(directorio)
+        except OSError:
+            return
+        for nombre in sorted(nombres):
+            sufijo = nombre[len(prefijo):]
+            if nombre.startswith(prefijo) and sufijo[:15].replace('-', '').isdigit() and len(sufijo) >= 15 \
+                    and not sufijo.endswith(('.gz', '.tmp')):
+                self.cola.put((ruta_log, os.path.join(directorio, nombre)))
+
+    def close(self):
+        """Espera a que terminen las compresiones pendientes."""
+        self.cola.put(None)
+        self.hilo.join()
+
+    def _run(self):
+        while True:
+            elemento = self.cola.get()
+            if elemento is None:
+                return
+            try:
+                self._comprimir(*elemento)
+            except OSError:
+                pass  # El segmento sin comprimir se reintenta en el siguiente arranque
+
+    def _comprimir(self, ruta_log, segmento):
+        if not os.path.exists(segmento):
+            return  # Lo comprimio otra shell que lo encontro al arrancar
+        desde, hasta = primera_fecha(segmento), ultima_fecha(segmento)
+        tamano = os.path.getsize(segmento)
+        destino = segmento + '.gz'
+        temporal = f"{destino}.{os.getpid()}.tmp"
+        try:
+            with open(segmento, 'rb') as entrada, gzip.open(temporal, 'wb', compresslevel=self.nivel) as salida:
+                shutil.copyfileobj(entrada, salida, 1024 * 1024)
+        except BaseException:
+            _borrar(temporal)
+            raise
+
+        with bloqueo(ruta_log):
+            if not os.path.exists(segmento):
+                _borrar(temporal)  # Otra shell termino antes con el mismo segmento
+                return
+            os.replace(temporal, destino)
+            segmentos = [s for s in leer_manifiesto(ruta_log) if s['archivo'] != os.path.basename(destino)]
+            segmentos.append({'archivo': os.path.basename(destino), 'desde': desde, 'hasta': hasta,
+                              'bytes': tamano, 'comprimido': os.path.getsize(destino)})
+            segmentos.sort(key=lambda s: (s['desde'] or datetime.min, s['archivo']))
+            segmentos = self._aplicar_retencion(ruta_log, segmentos)
+            _guardar_manifiesto(ruta_log, segmentos)
+            os.remove(segmento)  # Solo cuando el comprimido y el manifiesto ya estan en disco
+
+    def _aplicar_retencion(self, ruta_log, segmentos):
+        """Borra los segmentos que exceden el numero o la antigüedad permitidos."""
+        limite = datetime.now() - timedelta(days=self.retener_dias) if self.retener_dias else None
+        conservar = []
+        sobrantes = len(segmentos) - self.retener_segmentos if self.retener_segmentos else 0
+        for indice, segmento in enumerate(segmentos):
+            caducado = limite is not None and segmento['hasta'] is not None and segmento['hasta'] < limite
+            if indice < sobrantes or caducado:
+                try:
+                    os.remove(os.path.join(os.path.dirname(ruta_log), segmento['archivo']))
+                except OSError:
+                    pass
+            else:
+                conservar.append(segmento)
+        return conservar
+
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
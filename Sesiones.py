@@ -0,0 +1,216 @@
+import getpass
+import re
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+HORARIO_POR_DEFECTO = '08:00-18:00'  # Para usuarios sin registrar o con un horario ilegible
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS dias (
+    username TEXT NOT NULL,
+    dia      TEXT NOT NULL,
+    segundos REAL NOT NULL DEFAULT 0,
+    sesiones INTEGER NOT NULL DEFAULT 0,
+    fuera    INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (username, dia)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS abiertas (
+    username TEXT PRIMARY KEY,
+    inicio   TEXT NOT NULL
+);
+"""
+
+_SUMAR_DIA = """
+INSERT INTO dias (username, dia, segundos, sesiones, fuera) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (username, dia) DO UPDATE SET segundos = segundos + excluded.segundos,
+    sesiones = sesiones + excluded.sesiones, fuera = fuera + excluded.fuera
+"""
+
+_VERSION_IMPORTADA = 1  # PRAGMA user_version tras importar el log de horarios
+
+_LINEA_SESION = re.compile(r'Usuario: (\S+) - Acción: (\w+)( - Fuera de rango)?')
+
+
+@lru_cache(maxsize=None)
+def parsear_horario(texto):
+    """Convierte '8:00-17:00' (o '22:00-06:00', que cruza la medianoche) en segundos desde las 00:00.
+
+    Devuelve None si el texto no tiene ese formato.
+    """
+    try:
+        inicio, fin = texto.split('-')
+        return _segundos(inicio), _segundos(fin)
+    except ValueError:
+        return None
+
+
+def _segundos(hora):
+    partes = [int(p) for p in hora.strip().split(':')]
+    if not 1 <= len(partes) <= 3 or not 0 <= partes[0] <= 24:
+        raise ValueError(hora)
+    partes += [0] * (3 - len(partes))
+    return partes[0] * 3600 + partes[1] * 60 + partes[2]
+
+
+def dentro_de_horario(rango, momento):
+    inicio, fin = rango
+    segundo = momento.hour * 3600 + momento.minute * 60 + momento.second
+    if inicio <= fin:
+        return inicio <= segundo <= fin
+    return segundo >= inicio or segundo <= fin  # Turno que cruza la medianoche
+
+
+def usuario_del_sistema():
+    try:
+        return getpass.getuser()
+    except (KeyError, OSError):
+        return 'actual'
+
+
+class TablaHorarios:
+    """Horarios ya convertidos por usuario, leidos del registro de usuarios.
+
+    Se revalida con el texto del horario guardado, asi que un usuario
+    reimportado con otro horario se tiene en cuenta sin recargar nada.
+    """
+
+    def __init__(self, registro):
+        self.registro = registro
+        self._tabla = {}  # username -> (texto del horario, (inicio, fin))
+
+    def rango(self, username):
+        usuario = self.registro.obtener(username) if self.registro is not None else None
+        texto = usuario['horario'] if usuario else HORARIO_POR_DEFECTO
+        guardado = self._tabla.get(username)
+        if guardado is None or guardado[0] != texto:
+            rango = parsear_horario(texto) or parsear_horario(HORARIO_POR_DEFECTO)
+            guardado = self._tabla[username] = (texto, rango)
+        return guardado[1]
+
+
+class Sesiones:
+    """Empareja iniciar/cerrar en memoria y mantiene totales diarios por usuario en SQLite.
+
+    Cada evento actualiza solo la fila (usuario, dia) afectada, de modo que los
+    informes leen unas pocas filas en lugar de recorrer el log de horarios.
+    """
+
+    def __init__(self, ruta_db, horarios, ruta_log=None):
+        self.horarios = horarios
+        self._lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(_ESQUEMA)
+        self.abiertas = {username: datetime.fromisoformat(inicio)
+                         for username, inicio in self.conexion.execute("SELECT username, inicio FROM abiertas")}
+        if ruta_log and self._importacion_pendiente():
+            # Totales del historico, una unica vez; si falla se reintenta en el siguiente arranque
+            try:
+                self.importar_log(ruta_log)
+            except (OSError, ValueError, EOFError, zlib.error, sqlite3.Error) as e:
+                self.conexion.close()
+                raise RuntimeError(f"No se pudo importar el log de horarios {ruta_log} ({type(e).__name__}: {e}); "
+                                   f"se reintentará la próxima vez.") from e
+
+    def _importacion_pendiente(self):
+        """La base esta vacia y no se ha marcado como importada."""
+        version = self.conexion.execute("PRAGMA user_version").fetchone()[0]
+        return version < _VERSION_IMPORTADA and not self.abiertas and \
+            self.conexion.execute("SELECT 1 FROM dias LIMIT 1").fetchone() is None
+
+    def iniciar(self, username, momento):
+        """Abre una sesion. Devuelve (fuera de rango, inicio de la sesion que ya estaba abierta o None)."""
+        fuera = not dentro_de_horario(self.horarios.rango(username), momento)
+        with self._lock, self.conexion:
+            anterior = self._iniciar(username, momento, fuera)
+        return fuera, anterior
+
+    def cerrar(self, username, momento):
+        """Cierra la sesion abierta. Devuelve (fuera de rango, duracion o None si no habia sesion)."""
+        fuera = not dentro_de_horario(self.horarios.rango(username), momento)
+        with self._lock, self.conexion:
+            duracion = self._cerrar(username, momento)
+        return fuera, duracion
+
+    def _iniciar(self, username, momento, fuera):
+        anterior = self.abiertas.get(username)
+        if anterior is None:
+            self.abiertas[username] = momento
+            self.conexion.execute("INSERT OR REPLACE INTO abiertas (username, inicio) VALUES (?, ?)",
+                                  (username, momento.isoformat(sep=' ')))
+        self.conexion.execute(_SUMAR_DIA, (username, momento.strftime("%Y-%m-%d"), 0,
+                                           int(anterior is None), int(fuera)))
+        return anterior
+
+    def _cerrar(self, username, momento):
+        inicio = self.abiertas.pop(username, None)
+        if inicio is None:
+            return None
+        self.conexion.execute("DELETE FROM abiertas WHERE username = ?", (username,))
+        # Reparte la duracion entre los dias que abarca la sesion
+        tramo = inicio
+        while tramo < momento:
+            medianoche = datetime.combine(tramo.date() + timedelta(days=1), datetime.min.time())
+            fin_tramo = min(medianoche, momento)
+            self.conexion.execute(_SUMAR_DIA, (username, tramo.strftime("%Y-%m-%d"),
+                                               (fin_tramo - tramo).total_seconds(), 0, 0))
+            tramo = fin_tramo
+        return momento - inicio
+
+    def importar_log(self, ruta_log):
+        """Reconstruye los totales a partir del log de horarios (formato antiguo y actual).
+
+        Los totales y la marca de importado se escriben en la misma transaccion:
+        si algo falla no queda nada escrito.
+        """
+        from ConsultaLogs import registros_de_log
+        with self._lock:
+            abiertas = dict(self.abiertas)
+            try:
+                with self.conexion:
+                    for registro in registros_de_log(ruta_log):
+                        m = _LINEA_SESION.search(registro.texto)
+                        if m is None or registro.fecha is None:
+                            continue
+                        username, accion, fuera = m.groups()
+                        if accion == 'iniciar':
+                            self._iniciar(username, registro.fecha, fuera is not None)
+                        elif accion == 'cerrar':
+                            self._cerrar(username, registro.fecha)
+                    self.conexion.execute(f"PRAGMA user_version = {_VERSION_IMPORTADA}")
+            except BaseException:
+                self.abiertas = abiertas  # Como la base tras el ROLLBACK
+                raise
+
+    def reporte(self, desde, hasta, username=None):
+        """Totales por usuario entre dos dias (incluidos): (usuario, dias, sesiones, segundos, fuera)."""
+        consulta = ("SELECT username, COUNT(*), SUM(sesiones), SUM(segundos), SUM(fuera) FROM dias "
+                    "WHERE dia BETWEEN ? AND ?")
+        parametros = [desde.strftime("%Y-%m-%d"), hasta.strftime("%Y-%m-%d")]
+        if username:
+            consulta += " AND username = ?"
+            parametros.append(username)
+        with self._lock:
+            return self.conexion.execute(consulta + " GROUP BY username ORDER BY username", parametros).fetchall()
+
+    def por_dia(self, desde, hasta, username=None):
+        """Filas (usuario, dia, sesiones, segundos, fuera) entre dos dias (incluidos)."""
+        consulta = "SELECT username, dia, sesiones, segundos, fuera FROM dias WHERE dia BETWEEN ? AND ?"
+        parametros = [desde.strftime("%Y-%m-%d"), hasta.strftime("%Y-%m-%d")]
+        if username:
+            consulta += " AND username = ?"
+            parametros.append(username)
+        with self._lock:
+            return self.conexion.execute(consulta + " ORDER BY username, dia", parametros).fetchall()
+
+    def close(self):
+        self.conexion.close()
+
+
+def formatear_duracion(segundos):
+    segundos = int(segundos)
+    return f"{segundos // 3600}h {segundos % 3600 // 60:02d}m"
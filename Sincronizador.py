@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from Copiador import Copiador, formatear_bytes
+
+MANIFIESTO = '.sincronizar.json'  # En la raiz del destino; nunca se copia ni se borra
+BLOQUE_HASH = 1024 * 1024
+
+
+def escanear(raiz, hilos=8, errores=None):
+    """Recorre un arbol en paralelo y devuelve (archivos, directorios).
+
+    archivos es {ruta relativa: (tamaño, mtime_ns)} para todo lo que no es un
+    directorio (los enlaces simbolicos no se siguen); directorios, el set de
+    rutas relativas de los subdirectorios. Con errores (una lista), un
+    subdirectorio que no se puede leer se anota en ella como (ruta, mensaje) y
+    el recorrido sigue; sin ella, o si falla la raiz, se lanza el OSError.
+    """
+    archivos = {}
+    directorios = set()
+
+    def leer(relativa):
+        ficheros = []
+        subdirectorios = []
+        with os.scandir(os.path.join(raiz, relativa) if relativa else raiz) as it:
+            for entrada in it:
+                ruta = os.path.join(relativa, entrada.name) if relativa else entrada.name
+                if entrada.is_dir(follow_symlinks=False):
+                    subdirectorios.append(ruta)
+                elif ruta != MANIFIESTO:
+                    try:
+                        st = entrada.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue  # Borrado mientras se leia el directorio
+                    ficheros.append((ruta, (st.st_size, st.st_mtime_ns)))
+        return ficheros, subdirectorios
+
+    with ThreadPoolExecutor(max_workers=max(1, hilos)) as pool:
+        pendientes = {pool.submit(leer, ''): ''}
+        while pendientes:
+            hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                relativa = pendientes.pop(futuro)
+                try:
+                    ficheros, subdirectorios = futuro.result()
+                except OSError as e:
+                    if errores is None or not relativa:
+                        raise
+                    errores.append((os.path.join(raiz, relativa), str(e)))
+                    continue
+                archivos.update(ficheros)
+                for sub in subdirectorios:
+                    directorios.add(sub)
+                    pendientes[pool.submit(leer, sub)] = sub
+    return archivos, directorios
+
+
+def calcular_hash(ruta):
+    """BLAKE2b del contenido (o del destino, si es un enlace simbolico)."""
+    h = hashlib.blake2b(digest_size=16)
+    if os.path.islink(ruta):
+        h.update(os.readlink(ruta).encode(errors='surrogateescape'))
+        return h.hexdigest()
+    with open(ruta, 'rb') as f:
+        while True:
+            datos = f.read(BLOQUE_HASH)
+            if not datos:
+                return h.hexdigest()
+            h.update(datos)
+
+
+def leer_manifiesto(destino, origen):
+    """Estado de la ultima sincronizacion desde origen, o None si no hay (o era de otro origen)."""
+    try:
+        with open(os.path.join(destino, MANIFIESTO), 'r') as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if datos.get('origen') != origen:
+        return None
+    return datos
+
+
+def guardar_manifiesto(destino, origen, archivos, directorios):
+    ruta = os.path.join(destino, MANIFIESTO)
+    with open(ruta + '.tmp', 'w') as f:
+        json.dump({'origen': origen, 'archivos': archivos, 'directorios': sorted(directorios)}, f,
+                  separators=(',', ':'))
+    os.replace(ruta + '.tmp', ruta)
+
+
+class ResultadoSincronizacion:
+    """Delta calculado y lo que se hizo con el."""
+
+    def __init__(self):
+        self.nuevos = []       # Rutas relativas copiadas por primera vez
+        self.modificados = []  # Rutas relativas que cambiaron de contenido
+        self.tocados = []      # Solo cambio la fecha (con --hash): se actualiza sin copiar
+        self.borrados = []     # Archivos y directorios que ya no estan en el origen
+        self.directorios = []  # Directorios a crear en el destino
+        self.iguales = 0
+        self.bytes = 0
+        self.segundos = 0.0
+        self.errores = []  # Lista de (ruta, mensaje)
+
+    def resumen(self, simulacion=False):
+        verbo = "se copiarían" if simulacion else "copiados"
+        texto = (f"{len(self.nuevos)} nuevos y {len(self.modificados)} modificados {verbo} "
+                 f"({formatear_bytes(self.bytes)}), {len(self.tocados)} solo con fecha distinta, "
+                 f"{len(self.borrados)} borrados, {self.iguales} sin cambios")
+        if not simulacion:
+            texto += f", {len(self.errores)} errores"
+        return texto + f" en {self.segundos:.2f} s."
+
+
+class Sincronizador:
+    """Copia en el destino solo lo nuevo o modificado en el origen.
+
+    La deteccion usa tamaño y mtime comparados con el manifiesto de la ultima
+    sincronizacion (guardado en el destino), asi que el destino no se recorre.
+    Con hash, los archivos cuyo tamaño coincide pero cuya fecha cambio se
+    comparan por contenido en un pool de hilos antes de copiarlos; los hashes
+    se guardan en el manifiesto y no se recalculan mientras no cambie el archivo.
+    """
+
+    def __init__(self, hilos=8, hash=False, borrar=False, verificar=False, progreso=None):
+        self.hilos = max(1, hilos)
+        self.hash = hash
+        self.borrar = borrar
+        self.verificar = verificar  # Recorre el destino en lugar de fiarse del manifiesto
+        self.progreso = progreso
+
+    def sincronizar(self, origen, destino, simulacion=False):
+        resultado = ResultadoSincronizacion()
+        inicio = time.monotonic()
+        origen, destino = os.path.abspath(origen), os.path.abspath(destino)
+        if not os.path.isdir(origen):
+            raise NotADirectoryError(f"{origen} no es un directorio")
+        if destino == origen or destino.startswith(origen + os.sep):
+            raise ValueError("El destino no puede estar dentro del origen")
+
+        ilegibles = []
+        actuales, dirs_origen = escanear(origen, self.hilos, ilegibles)
+        resultado.errores.extend(ilegibles)
+        # Lo que hay bajo un directorio del origen que no se pudo leer no se borra ni se olvida
+        sin_leer = tuple(os.path.relpath(ruta, origen) + os.sep for ruta, _ in ilegibles)
+        anteriores, dirs_destino = self._estado_destino(origen, destino, resultado)
+
+        con_fecha_distinta = []
+        manifiesto = {}
+        for ruta, (tamano, mtime) in actuales.items():
+            previo = anteriores.get(ruta)
+            if previo is None:
+                resultado.nuevos.append(ruta)
+            elif previo[0] == tamano and previo[1] == mtime:
+                resultado.iguales += 1
+                manifiesto[ruta] = previo
+            elif self.hash and previo[0] == tamano:
+                con_fecha_distinta.append(ruta)
+            else:
+                resultado.modificados.append(ruta)
+
+        if self.hash:
+            # Lo que se va a copiar tambien se hashea, para guardarlo en el manifiesto
+            por_hashear = con_fecha_distinta if simulacion else \
+                con_fecha_distinta + resultado.nuevos + resultado.modificados
+            hashes = self._hashes(origen, destino, por_hashear, anteriores, resultado)
+            for ruta in con_fecha_distinta:
+                if ruta in hashes and hashes[ruta] == self._hash_destino(destino, ruta, anteriores, hashes):
+                    resultado.tocados.append(ruta)
+                else:
+                    resultado.modificados.append(ruta)
+        else:
+            hashes = {}
+
+        if self.borrar:
+            resultado.borrados = sorted(r for r in set(anteriores) - set(actuales) if not r.startswith(sin_leer)) + \
+                sorted((d for d in dirs_destino - dirs_origen if not d.startswith(sin_leer)),
+                       key=lambda d: d.count(os.sep), reverse=True)
+        resultado.directorios = sorted(dirs_origen - dirs_destino)
+        resultado.bytes = sum(actuales[r][0] for r in resultado.nuevos + resultado.modificados)
+        resultado.nuevos.sort()
+        resultado.modificados.sort()
+
+        if simulacion:
+            resultado.segundos = time.monotonic() - inicio
+            return resultado
+
+        self._aplicar(origen, destino, actuales, resultado)
+        fallidos = {os.path.relpath(r, origen) for r, _ in resultado.errores}
+        for ruta in resultado.nuevos + resultado.modificados + resultado.tocados:
+            if ruta not in fallidos:
+                manifiesto[ruta] = [*actuales[ruta], hashes.get(ruta)]
+        # Lo que ya no esta en el origen (o no se pudo leer) sigue en el destino y en el manifiesto
+        for ruta in set(anteriores) - set(actuales):
+            if not self.borrar or ruta.startswith(sin_leer):
+                manifiesto[ruta] = anteriores[ruta]
+        dirs_origen = dirs_origen | {d for d in dirs_destino if not self.borrar or d.startswith(sin_leer)}
+        guardar_manifiesto(destino, origen, manifiesto, dirs_origen)
+        resultado.segundos = time.monotonic() - inicio
+        return resultado
+
+    def _estado_destino(self, origen, destino, resultado):
+        """({ruta: [tamaño, mtime_ns, hash]}, directorios) segun el manifiesto o recorriendo el destino."""
+        datos = None if self.verificar else leer_manifiesto(destino, origen)
+        if datos is not None:
+            return datos['archivos'], set(datos['directorios'])
+        if not os.path.isdir(destino):
+            return {}, set()
+        archivos, directorios = escanear(destino, self.hilos, resultado.errores)
+        # Con --verificar se conservan los hashes guardados de los archivos que no cambiaron
+        guardados = (leer_manifiesto(destino, origen) or {}).get('archivos', {})
+        estado = {}
+        for ruta, (tamano, mtime) in archivos.items():
+            previo = guardados.get(ruta)
+            estado[ruta] = [tamano, mtime, previo[2] if previo and previo[:2] == [tamano, mtime] else None]
+        return estado, directorios
+
+    def _hashes(self, origen, destino, rutas, anteriores, resultado):
+        """Calcula en paralelo el hash de las rutas del origen (y del destino si no se conoce)."""
+        hashes = {}  # ruta -> hash en el origen; (ruta, 'destino') -> hash en el destino
+        with ThreadPoolExecutor(max_workers=self.hilos) as pool:
+            futuros = {pool.submit(calcular_hash, os.path.join(origen, r)): (r, os.path.join(origen, r))
+                       for r in rutas}
+            for ruta in rutas:
+                previo = anteriores.get(ruta)
+                if previo is not None and previo[2] is None:
+                    completa = os.path.join(destino, ruta)
+                    futuros[pool.submit(calcular_hash, completa)] = ((ruta, 'destino'), completa)
+            for futuro, (clave, completa) in futuros.items():
+                try:
+                    hashes[clave] = futuro.result()
+                except OSError as e:
+                    resultado.errores.append((completa, str(e)))
+        return hashes
+
+    @staticmethod
+    def _hash_destino(destino, ruta, anteriores, hashes):
+        return anteriores[ruta][2] or hashes.get((ruta, 'destino'))
+
+    def _aplicar(self, origen, destino, actuales, resultado):
+        for ruta in resultado.borrados:
+            completa = os.path.join(destino, ruta)
+            try:
+                if os.path.isdir(completa) and not os.path.islink(completa):
+                    shutil.rmtree(completa)
+                elif os.path.lexists(completa):
+                    os.unlink(completa)
+            except OSError as e:
+                resultado.errores.append((completa, str(e)))
+
+        os.makedirs(destino, exist_ok=True)
+        for ruta in resultado.directorios:
+            try:
+                os.makedirs(os.path.join(destino, ruta), exist_ok=True)
+            except OSError as e:
+                resultado.errores.append((os.path.join(origen, ruta), str(e)))
+
+        tareas = []
+        for ruta in resultado.nuevos + resultado.modificados:
+            completa = os.path.join(origen, ruta)
+            try:
+                tareas.append((completa, os.path.join(destino, ruta), os.lstat(completa)))
+            except OSError as e:
+                resultado.errores.append((completa, str(e)))
+        # preservar: el mtime copiado es el que se compara en la proxima sincronizacion
+        copia = Copiador(self.hilos, preservar=True, progreso=self.progreso).copiar_archivos(tareas)
+        resultado.errores.extend(copia.errores)
+
+        for ruta in resultado.tocados:
+            try:
+                mtime = actuales[ruta][1]
+                os.utime(os.path.join(destino, ruta), ns=(mtime, mtime), follow_symlinks=False)
+            except OSError as e:
+                resultado.errores.append((os.path.join(origen, ruta), str(e)))
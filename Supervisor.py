@@ -0,0 +1,292 @@
+import heapq
+import itertools
+import os
+import selectors
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+LINEAS_LOG = 1000  # Lineas de salida que se guardan por demonio
+MAX_LINEA = 64 * 1024  # Una linea sin salto mas larga que esto se corta
+BACKOFF_INICIAL = 1.0  # Segundos antes del primer rearranque
+BACKOFF_MAXIMO = 60.0
+TIEMPO_ESTABLE = 30.0  # Un proceso que dura esto vuelve a empezar el backoff desde BACKOFF_INICIAL
+ESPERA_TERMINAR = 5.0  # Segundos entre SIGTERM y SIGKILL al parar un demonio
+
+_TICKS_POR_SEGUNDO = os.sysconf('SC_CLK_TCK')
+_PAGINA = os.sysconf('SC_PAGE_SIZE')
+
+
+class DemonioProceso:
+    """Demonio que ejecuta un comando como proceso hijo supervisado."""
+
+    def __init__(self, name, comando, directorio=None):
+        self.name = name
+        self.comando = comando
+        self.directorio = directorio
+        self.running = False  # Debe estar en marcha: se rearranca cuando termina
+        self.proceso = None
+        self.inicio = None  # time.monotonic() del ultimo arranque
+        self.reinicios = 0
+        self.fallos_seguidos = 0
+        self.ultimo_codigo = None
+        self.proximo_arranque = None
+        self.logs = deque(maxlen=LINEAS_LOG)  # (instante, flujo, texto)
+        self._pendiente = {}  # flujo -> bytes de la ultima linea incompleta
+        self._muestra = None  # (pid, instante, ticks de CPU) del ultimo top
+
+    def registrar(self, flujo, texto):
+        self.logs.append((time.time(), flujo, texto))
+
+
+def leer_proc(pid):
+    """Ticks de CPU, RSS en bytes, hilos y descriptores abiertos de un proceso segun /proc."""
+    with open(f'/proc/{pid}/stat', 'rb') as f:
+        campos = f.read().rsplit(b')', 1)[1].split()  # El nombre del proceso puede tener espacios
+    try:
+        descriptores = len(os.listdir(f'/proc/{pid}/fd'))
+    except OSError:
+        descriptores = None  # Proceso de otro usuario
+    return {
+        'ticks': int(campos[11]) + int(campos[12]),  # utime + stime
+        'hilos': int(campos[17]),
+        'rss': int(campos[21]) * _PAGINA,
+        'descriptores': descriptores,
+    }
+
+
+class Supervisor:
+    """Lanza los demonios como procesos hijos y los vigila desde un unico hilo.
+
+    El hilo espera con un selector sobre las tuberias de salida de todos los
+    procesos y un pidfd por proceso, que se vuelve legible cuando el proceso
+    termina, asi que no hay sondeos periodicos. Los rearranques con backoff y
+    los SIGKILL pendientes se guardan en un monticulo de tiempos, como en
+    Planificador.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.RLock()
+        self.temporizadores = []  # (cuando, secuencia, accion, demonio, proceso)
+        self._secuencia = itertools.count()
+        self._vigilados = {}  # proceso -> (demonio, pidfd o None si se espera con un hilo)
+        self._despertar_r, self._despertar_w = os.pipe()
+        os.set_blocking(self._despertar_r, False)
+        os.set_blocking(self._despertar_w, False)
+        self.selector.register(self._despertar_r, selectors.EVENT_READ, ('despertar', None))
+        self.hilo = None
+
+    def arrancar(self, demonio):
+        """Lanza el proceso del demonio; devuelve el error si no se pudo lanzar."""
+        with self.lock:
+            demonio.running = True
+            if demonio.proceso is not None:
+                return None
+            demonio.fallos_seguidos = 0
+            try:
+                self._lanzar(demonio)
+            except (OSError, ValueError) as e:
+                demonio.running = False
+                demonio.registrar('supervisor', f"no se pudo lanzar: {e}")
+                return str(e)
+            if self.hilo is None:
+                self.hilo = threading.Thread(target=self._run, name='supervisor-demonios', daemon=True)
+                self.hilo.start()
+        self._despertar()
+        return None
+
+    def detener(self, demonio):
+        """Envia SIGTERM al grupo del proceso y SIGKILL si sigue vivo tras ESPERA_TERMINAR."""
+        with self.lock:
+            demonio.running = False
+            demonio.proximo_arranque = None
+            proceso, demonio.proceso = demonio.proceso, None
+            if proceso is None or proceso.returncode is not None:
+                return
+            demonio.registrar('supervisor', "parando (SIGTERM)")
+            _senal(proceso, signal.SIGTERM)
+            self._programar(time.monotonic() + ESPERA_TERMINAR, 'matar', demonio, proceso)
+        self._despertar()
+
+    def close(self):
+        """Para todos los procesos vigilados y espera a que terminen."""
+        with self.lock:
+            procesos = list(self._vigilados)
+            for proceso, (demonio, _) in self._vigilados.items():
+                demonio.running = False  # Que el hilo no los rearranque
+                if proceso.returncode is None:
+                    _senal(proceso, signal.SIGTERM)
+        limite = time.monotonic() + ESPERA_TERMINAR
+        for proceso in procesos:
+            try:
+                proceso.wait(max(0.0, limite - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                _senal(proceso, signal.SIGKILL)
+                proceso.wait()
+
+    def muestrear(self, demonio):
+        """Consumo actual del proceso del demonio (None si no esta en marcha).
+
+        La CPU es el porcentaje desde la muestra anterior (o desde el arranque).
+        """
+        proceso = demonio.proceso
+        if proceso is None or proceso.returncode is not None:
+            return None
+        try:
+            datos = leer_proc(proceso.pid)
+        except (OSError, IndexError, ValueError):
+            return None
+        ahora = time.monotonic()
+        pid, antes, ticks = demonio._muestra if demonio._muestra and demonio._muestra[0] == proceso.pid \
+            else (proceso.pid, demonio.inicio, 0)
+        demonio._muestra = (pid, ahora, datos['ticks'])
+        transcurrido = ahora - antes
+        datos['cpu'] = 100.0 * (datos['ticks'] - ticks) / _TICKS_POR_SEGUNDO / transcurrido if transcurrido > 0 else 0.0
+        datos['pid'] = proceso.pid
+        datos['activo_desde'] = ahora - demonio.inicio
+        return datos
+
+    def _lanzar(self, demonio):
+        proceso = subprocess.Popen(shlex.split(demonio.comando), cwd=demonio.directorio, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   start_new_session=True)  # Ctrl-C en la shell no le llega
+        demonio.proceso = proceso
+        demonio.inicio = time.monotonic()
+        demonio.proximo_arranque = None
+        demonio.registrar('supervisor', f"iniciado con pid {proceso.pid}")
+        for flujo, tuberia in (('out', proceso.stdout), ('err', proceso.stderr)):
+            os.set_blocking(tuberia.fileno(), False)
+            self.selector.register(tuberia, selectors.EVENT_READ, ('salida', (demonio, flujo)))
+        try:
+            pidfd = os.pidfd_open(proceso.pid)
+            self.selector.register(pidfd, selectors.EVENT_READ, ('fin', (demonio, proceso)))
+        except (AttributeError, OSError):
+            # Sin pidfd (Linux < 5.3): un hilo bloqueado en wait() avisa al terminar
+            pidfd = None
+            threading.Thread(target=self._esperar, args=(proceso,), daemon=True).start()
+        self._vigilados[proceso] = (demonio, pidfd)
+
+    def _esperar(self, proceso):
+        proceso.wait()
+        self._despertar()
+
+    def _despertar(self):
+        try:
+            os.write(self._despertar_w, b'x')
+        except BlockingIOError:
+            pass  # Ya hay un aviso pendiente
+
+    def _programar(self, cuando, accion, demonio, proceso):
+        heapq.heappush(self.temporizadores, (cuando, next(self._secuencia), accion, demonio, proceso))
+
+    def _run(self):
+        while True:
+            with self.lock:
+                espera = max(0.0, self.temporizadores[0][0] - time.monotonic()) if self.temporizadores else None
+            eventos = self.selector.select(espera)
+            with self.lock:
+                for clave, _ in eventos:
+                    tipo, datos = clave.data
+                    if tipo == 'salida':
+                        self._leer(clave.fileobj, *datos)
+                    elif tipo == 'fin':
+                        self._terminado(*datos)
+                    else:
+                        while True:
+                            try:
+                                if not os.read(self._despertar_r, 4096):
+                                    break
+                            except BlockingIOError:
+                                break
+                # Procesos vigilados con un hilo en lugar de pidfd
+                for proceso, (demonio, pidfd) in list(self._vigilados.items()):
+                    if pidfd is None and proceso.poll() is not None:
+                        self._terminado(demonio, proceso)
+                ahora = time.monotonic()
+                while self.temporizadores and self.temporizadores[0][0] <= ahora:
+                    _, _, accion, demonio, proceso = heapq.heappop(self.temporizadores)
+                    if accion == 'matar' and proceso.returncode is None:
+                        demonio.registrar('supervisor', "no terminó a tiempo (SIGKILL)")
+                        _senal(proceso, signal.SIGKILL)
+                    elif accion == 'arrancar' and demonio.running and demonio.proceso is None:
+                        self._rearrancar(demonio)
+
+    def _leer(self, tuberia, demonio, flujo):
+        try:
+            datos = os.read(tuberia.fileno(), 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            datos = b''
+        if not datos:
+            self.selector.unregister(tuberia)
+            tuberia.close()
+            resto = demonio._pendiente.pop(flujo, b'')
+            if resto:
+                demonio.registrar(flujo, resto.decode(errors='replace'))
+            return
+        lineas = (demonio._pendiente.pop(flujo, b'') + datos).split(b'\n')
+        resto = lineas.pop()
+        if len(resto) > MAX_LINEA:
+            lineas.append(resto)
+            resto = b''
+        if resto:
+            demonio._pendiente[flujo] = resto
+        for linea in lineas:
+            demonio.registrar(flujo, linea.decode(errors='replace'))
+
+    def _terminado(self, demonio, proceso):
+        _, pidfd = self._vigilados.pop(proceso, (None, None))
+        if pidfd is not None:
+            self.selector.unregister(pidfd)
+            os.close(pidfd)
+        # Lo que quede en las tuberias; si un nieto las mantiene abiertas se cierran igualmente
+        for flujo, tuberia in (('out', proceso.stdout), ('err', proceso.stderr)):
+            if not tuberia.closed:
+                self._leer(tuberia, demonio, flujo)
+                if not tuberia.closed:
+                    self.selector.unregister(tuberia)
+                    tuberia.close()
+        codigo = proceso.wait()
+        demonio.ultimo_codigo = codigo
+        demonio.registrar('supervisor', f"terminó con código {codigo}")
+        if demonio.proceso is not proceso:
+            return  # Se paro o se reinicio a mano
+        demonio.proceso = None
+        if demonio.running:
+            self._programar_rearranque(demonio)
+
+    def _programar_rearranque(self, demonio):
+        ahora = time.monotonic()
+        if demonio.inicio is not None and ahora - demonio.inicio >= TIEMPO_ESTABLE:
+            demonio.fallos_seguidos = 0
+        demonio.fallos_seguidos += 1
+        espera = min(BACKOFF_INICIAL * 2 ** (demonio.fallos_seguidos - 1), BACKOFF_MAXIMO)
+        demonio.proximo_arranque = ahora + espera
+        demonio.registrar('supervisor', f"se rearranca en {espera:g} s")
+        self._programar(demonio.proximo_arranque, 'arrancar', demonio, None)
+
+    def _rearrancar(self, demonio):
+        demonio.reinicios += 1
+        try:
+            self._lanzar(demonio)
+        except (OSError, ValueError) as e:
+            demonio.registrar('supervisor', f"no se pudo lanzar: {e}")
+            demonio.inicio = time.monotonic()
+            self._programar_rearranque(demonio)
+
+
+def _senal(proceso, senal):
+    try:
+        os.killpg(proceso.pid, senal)  # Todo el grupo: el comando puede haber lanzado hijos
+    except ProcessLookupError:
+        pass
+
+
+def formatear_log(instante, flujo, texto):
+    return f"{datetime.fromtimestamp(instante).strftime('%Y-%m-%d %H:%M:%S')} {flujo}: {texto}"
@@ -0,0 +1,309 @@
+import ftplib
+import glob
+import os
+import posixpath
+import shlex
+import stat
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BLOQUE_FTP = 64 * 1024          # Tamaño de bloque por defecto para STOR
+CONEXIONES_POR_DEFECTO = 4      # Conexiones FTP en paralelo por transferencia
+MAX_INACTIVAS = 8               # Conexiones libres que se guardan por servidor
+SCP_CONTROL = '%C'              # Socket de ssh para reutilizar la conexion (%C: hash de usuario, host y puerto)
+SCP_PERSISTENCIA = '120'        # Segundos que ssh mantiene abierta la conexion maestra
+
+
+class ResultadoArchivo:
+    """Resultado de la transferencia de un archivo."""
+
+    def __init__(self, origen, destino):
+        self.origen = origen
+        self.destino = destino
+        self.bytes = 0
+        self.segundos = 0.0
+        self.reanudado_desde = 0
+        self.error = None
+
+    def velocidad(self):
+        return self.bytes / self.segundos if self.segundos > 0 else 0
+
+
+class PoolFTP:
+    """Conexiones FTP abiertas y autenticadas, reutilizables entre transferencias.
+
+    Se agrupan por (host, puerto, usuario). Antes de reutilizar una conexion se
+    comprueba con NOOP que el servidor no la haya cerrado.
+    """
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self._libres = {}  # clave -> lista de conexiones FTP libres
+        self._lock = threading.Lock()
+
+    def obtener(self, host, puerto, usuario, password):
+        clave = (host, puerto, usuario)
+        while True:
+            with self._lock:
+                libres = self._libres.get(clave)
+                ftp = libres.pop() if libres else None
+            if ftp is None:
+                break
+            try:
+                ftp.voidcmd('NOOP')
+                return ftp
+            except ftplib.all_errors:
+                self._cerrar(ftp)
+
+        ftp = ftplib.FTP(timeout=self.timeout)
+        ftp.connect(host, puerto)
+        try:
+            ftp.login(usuario, password or '')
+            ftp.voidcmd('TYPE I')
+        except ftplib.all_errors:
+            self._cerrar(ftp)
+            raise
+        return ftp
+
+    def devolver(self, host, puerto, usuario, ftp, valida=True):
+        """Devuelve una conexion al pool (o la cierra si fallo o sobran)."""
+        if valida:
+            with self._lock:
+                libres = self._libres.setdefault((host, puerto, usuario), [])
+                if len(libres) < MAX_INACTIVAS:
+                    libres.append(ftp)
+                    return
+        self._cerrar(ftp)
+
+    def cerrar_todas(self):
+        with self._lock:
+            conexiones = [ftp for libres in self._libres.values() for ftp in libres]
+            self._libres.clear()
+        for ftp in conexiones:
+            self._cerrar(ftp)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(libres) for libres in self._libres.values())
+
+    @staticmethod
+    def _cerrar(ftp):
+        try:
+            ftp.quit()
+        except ftplib.all_errors:
+            ftp.close()
+
+
+def expandir_fuentes(fuentes, destino, manifiesto=None, base=None):
+    """Convierte globs, directorios y un manifiesto en pares (archivo local, ruta remota).
+
+    Con un unico archivo sin manifiesto, destino es la ruta remota final; en los
+    demas casos es un directorio remoto y se conserva la estructura relativa.
+    Las lineas del manifiesto son 'origen' u 'origen destino_remoto', con la
+    sintaxis del shell: las rutas con espacios van entre comillas (o con '\ ')
+    y '#' empieza un comentario. Los origenes relativos se resuelven desde base
+    (el directorio actual de la shell). Una linea mal formada lanza ValueError.
+    """
+    pares = []
+    explicitos = []
+    if manifiesto:
+        with open(manifiesto, 'r') as f:
+            for numero, linea in enumerate(f, 1):
+                try:
+                    partes = shlex.split(linea, comments=True)
+                except ValueError as e:
+                    raise ValueError(f"{manifiesto}:{numero}: {e}")
+                if len(partes) > 2:
+                    raise ValueError(f"{manifiesto}:{numero}: se esperaba 'origen [destino]' y hay {len(partes)} "
+                                     f"rutas (usa comillas para las que tienen espacios)")
+                if not partes:
+                    continue
+                origen = os.path.join(base, partes[0]) if base else partes[0]
+                if len(partes) > 1:
+                    explicitos.append((origen, partes[1]))
+                else:
+                    fuentes = list(fuentes) + [origen]
+
+    rutas = []
+    for fuente in fuentes:
+        coincidencias = glob.glob(fuente) if glob.has_magic(fuente) else [fuente]
+        if not coincidencias:
+            raise FileNotFoundError(fuente)
+        rutas.extend(coincidencias)
+
+    if len(rutas) == 1 and not explicitos and os.path.isfile(rutas[0]):
+        return [(rutas[0], destino)]
+
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            base = os.path.dirname(os.path.normpath(ruta))
+            for raiz, _, archivos in os.walk(ruta):
+                for nombre in archivos:
+                    local = os.path.join(raiz, nombre)
+                    relativa = os.path.relpath(local, base).replace(os.sep, '/')
+                    pares.append((local, posixpath.join(destino, relativa)))
+        elif os.path.isfile(ruta):
+            pares.append((ruta, posixpath.join(destino, os.path.basename(ruta))))
+        else:
+            raise FileNotFoundError(ruta)
+    return pares + explicitos
+
+
+class TransferenciaFTP:
+    """Sube varios archivos en paralelo sobre conexiones del pool, con reanudacion."""
+
+    def __init__(self, pool, host, puerto, usuario, password, conexiones=CONEXIONES_POR_DEFECTO,
+                 bloque=BLOQUE_FTP, reanudar=False):
+        self.pool = pool
+        self.host = host
+        self.puerto = puerto
+        self.usuario = usuario
+        self.password = password
+        self.conexiones = max(1, conexiones)
+        self.bloque = bloque
+        self.reanudar = reanudar  # Continuar con REST los archivos remotos mas cortos que el local
+        self._directorios = set()  # Directorios remotos ya creados
+        self._lock = threading.Lock()
+
+    def subir(self, pares, al_terminar=None):
+        """Sube cada par (local, remoto) y devuelve la lista de ResultadoArchivo."""
+        def uno(par):
+            resultado = self._subir_archivo(*par)
+            if al_terminar:
+                al_terminar(resultado)
+            return resultado
+
+        with ThreadPoolExecutor(max_workers=min(self.conexiones, max(1, len(pares)))) as pool:
+            return list(pool.map(uno, pares))
+
+    def _subir_archivo(self, local, remoto):
+        resultado = ResultadoArchivo(local, remoto)
+        inicio = time.monotonic()
+        try:
+            ftp = self.pool.obtener(self.host, self.puerto, self.usuario, self.password)
+        except (OSError, ftplib.Error, EOFError) as e:
+            resultado.error = str(e)
+            return resultado
+        valida = True
+        try:
+            self._crear_directorios(ftp, posixpath.dirname(remoto))
+            tamano = os.path.getsize(local)
+            # Solo si se pide: un archivo remoto mas corto puede ser otro archivo, no una subida a medias
+            offset = (self._tamano_remoto(ftp, remoto) or 0) if self.reanudar else 0
+            if offset >= tamano:
+                offset = 0
+            with open(local, 'rb') as f:
+                f.seek(offset)
+                ftp.storbinary(f'STOR {remoto}', f, self.bloque, rest=offset or None)
+            resultado.bytes = tamano - offset
+            resultado.reanudado_desde = offset
+        except ftplib.error_perm as e:
+            resultado.error = str(e)
+        except (OSError, ftplib.Error, EOFError) as e:
+            resultado.error = str(e)
+            valida = False  # La conexion puede haber quedado en mal estado
+        finally:
+            self.pool.devolver(self.host, self.puerto, self.usuario, ftp, valida)
+        resultado.segundos = time.monotonic() - inicio
+        return resultado
+
+    @staticmethod
+    def _tamano_remoto(ftp, remoto):
+        try:
+            return ftp.size(remoto)
+        except ftplib.error_perm:
+            return None  # No existe todavia
+
+    def _crear_directorios(self, ftp, directorio):
+        if directorio in ('', '/', '.'):
+            return
+        with self._lock:
+            if directorio in self._directorios:
+                return
+        self._crear_directorios(ftp, posixpath.dirname(directorio))
+        try:
+            ftp.mkd(directorio)
+        except ftplib.error_perm:
+            pass  # Ya existe
+        with self._lock:
+            self._directorios.add(directorio)
+
+
+def _directorio_control():
+    """Directorio privado (0700) para el socket de ssh.
+
+    En /tmp otro usuario podria crear el socket antes o suplantarlo; se usa
+    $XDG_RUNTIME_DIR o, si no existe, ~/.ssh.
+    """
+    base = os.environ.get('XDG_RUNTIME_DIR') or os.path.expanduser('~/.ssh')
+    directorio = os.path.join(base, 'shell-scp')
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    st = os.lstat(directorio)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"{directorio} no es un directorio propio")
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        os.chmod(directorio, 0o700)
+    return directorio
+
+
+def transferir_scp(pares, usuario, host, puerto=None):
+    """Copia todos los archivos con scp reutilizando una conexion ssh maestra.
+
+    Los archivos que van al mismo directorio remoto con su mismo nombre se
+    envian en una sola invocacion; los que cambian de nombre (manifiesto
+    'origen destino_remoto') se envian uno a uno. Devuelve la lista de ResultadoArchivo.
+    """
+    try:
+        control = os.path.join(_directorio_control(), SCP_CONTROL)
+        opciones = ['-o', 'ControlMaster=auto', '-o', f'ControlPath={control}',
+                    '-o', f'ControlPersist={SCP_PERSISTENCIA}']
+    except OSError:
+        opciones = ['-o', 'ControlMaster=no', '-o', 'ControlPath=none', '-o', 'ControlPersist=no']  # Sin reutilizar
+    if puerto:
+        opciones += ['-P', str(puerto)]
+
+    grupos = {}  # destino -> locales; un destino acabado en '/' es un directorio
+    for local, remoto in pares:
+        if len(pares) == 1 or posixpath.basename(remoto) != os.path.basename(local):
+            grupos[remoto] = [local]  # Conserva el nombre remoto indicado
+        else:
+            grupos.setdefault(posixpath.dirname(remoto) + '/', []).append(local)
+
+    error_previo = None
+    if len(pares) > 1:
+        # scp no crea directorios: se crean todos antes con una sola llamada a ssh
+        ssh = ['ssh'] + opciones[:6] + (['-p', str(puerto)] if puerto else [])
+        directorios = sorted({posixpath.dirname(d) for d in grupos} - {'', '/'})
+        if directorios:
+            # ssh pasa los argumentos al shell remoto, que los volveria a partir e interpretar
+            try:
+                subprocess.run(ssh + [f"{usuario}@{host}", 'mkdir', '-p', '--'] + [shlex.quote(d) for d in directorios],
+                               check=True, capture_output=True, text=True)
+            except subprocess.CalledProcessError as e:
+                error_previo = f"No se pudieron crear los directorios remotos: {(e.stderr or str(e)).strip()}"
+            except FileNotFoundError:
+                error_previo = "El comando 'ssh' no está disponible en este sistema."
+
+    resultados = []
+    for destino, locales in grupos.items():
+        inicio = time.monotonic()
+        error = error_previo
+        try:
+            if error is None:
+                subprocess.run(['scp', '-q'] + opciones + locales + [f"{usuario}@{host}:{destino}"],
+                               check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            error = (e.stderr or str(e)).strip()
+        except FileNotFoundError:
+            error = "El comando 'scp' no está disponible en este sistema."
+        segundos = (time.monotonic() - inicio) / len(locales)
+        for local in locales:
+            resultado = ResultadoArchivo(local, destino + os.path.basename(local) if destino.endswith('/') else destino)
+            resultado.segundos = segundos
+            resultado.error = error
+            if error is None:
+                resultado.bytes = os.path.getsize(local)
+            resultados.append(resultado)
+    return resultados
@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+"""Benchmarks de los comandos de FirstApp.
+
+Crea datos sinteticos (arboles de directorios, archivos grandes, usuarios y
+logs), sustituye useradd/systemctl/scp/passwd por programas falsos y ejecuta
+cada comando a traves de FirstApp.onecmd_plus_hooks, con los hooks de log
+incluidos. Guarda latencias (p50/p95/p99), throughput y pico de RSS en JSON.
+
+Uso:
+    python benchmark.py [-e pequena|mediana|grande] [-o resultados.json] [-s listar copiar ...]
+    python benchmark.py --comparar base.json nuevo.json [--umbral 10]
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr
+from datetime import datetime, timedelta
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+
+ESCALAS = {
+    #            archivos en dir ancho, profundidad, ramas, archivos por dir, MB archivo grande, usuarios, MB de log
+    'pequena': dict(ancho=2000, profundidad=4, ramas=3, por_dir=5, mb_grande=32, usuarios=10000, mb_log=16),
+    'mediana': dict(ancho=50000, profundidad=6, ramas=3, por_dir=10, mb_grande=512, usuarios=100000, mb_log=512),
+    'grande': dict(ancho=200000, profundidad=7, ramas=4, por_dir=10, mb_grande=2048, usuarios=100000, mb_log=4096),
+}
+
+# Programas falsos que sustituyen a los del sistema durante los benchmarks
+BINARIOS_FALSOS = {
+    'useradd': '#!/bin/sh\nexit 0\n',
+    'passwd': '#!/bin/sh\nexit 0\n',
+    'scp': '#!/bin/sh\nexit 0\n',
+    'ssh': '#!/bin/sh\nexit 0\n',
+    'systemctl': '''#!/bin/sh
+if [ "$1" = "list-units" ]; then
+    i=0; while [ $i -lt 50 ]; do echo "svc$i.service loaded active running Servicio $i"; i=$((i+1)); done
+    exit 0
+fi
+shift 4
+for s in "$@"; do
+    printf 'Id=%s\\nActiveState=active\\nSubState=running\\nMainPID=1\\nLoadState=loaded\\n\\n' "$s"
+done
+''',
+}
+
+
+#-----------------------------------------------------------------------------------------------------------------------
+# Datos sinteticos
+
+def crear_datos(raiz, escala):
+    """Crea los datos de prueba en raiz y devuelve un diccionario con sus rutas."""
+    p = ESCALAS[escala]
+    datos = {'raiz': raiz}
+
+    ancho = os.path.join(raiz, 'ancho')
+    os.makedirs(ancho)
+    for i in range(p['ancho']):
+        with open(os.path.join(ancho, f'archivo_{i:07d}.txt'), 'w') as f:
+            f.write('x' * (i % 512))
+    datos['ancho'] = ancho
+
+    profundo = os.path.join(raiz, 'profundo')
+    pendientes = [(profundo, 0)]
+    while pendientes:
+        directorio, nivel = pendientes.pop()
+        os.makedirs(directorio, exist_ok=True)
+        for i in range(p['por_dir']):
+            with open(os.path.join(directorio, f'f{i}.dat'), 'wb') as f:
+                f.write(os.urandom(4096))
+        if nivel < p['profundidad']:
+            pendientes.extend((os.path.join(directorio, f'd{r}'), nivel + 1) for r in range(p['ramas']))
+    datos['profundo'] = profundo
+
+    grande = os.path.join(raiz, 'grande.bin')
+    bloque = os.urandom(1024 * 1024)
+    with open(grande, 'wb') as f:
+        for _ in range(p['mb_grande']):
+            f.write(bloque)
+    datos['grande'] = grande
+    datos['bytes_grande'] = p['mb_grande'] * 1024 * 1024
+
+    # usuarios.json se migra a la base SQLite en el primer comando usuario
+    usuarios = {f'u{i}': {'username': f'u{i}', 'nombre': f'Usuario {i}', 'horario': '8:00-17:00',
+                          'lugares': [f'10.0.{i % 250}.1', 'localhost']} for i in range(p['usuarios'])}
+    with open(os.path.join(raiz, 'usuarios.json'), 'w') as f:
+        json.dump(usuarios, f)
+    importacion = os.path.join(raiz, 'importar.csv')
+    with open(importacion, 'w') as f:
+        f.write('username,nombre,horario,lugares\n')
+        for i in range(1000):
+            f.write(f'nuevo{i},Nuevo {i},9:00-18:00,192.168.1.{i % 250};localhost\n')
+    datos['importacion'] = importacion
+    open(os.path.join(raiz, 'renombrable.txt'), 'w').close()
+
+    # Logs ordenados por fecha con el formato de EscritorLogs
+    bytes_log = p['mb_log'] * 1024 * 1024
+    fecha = datetime(2025, 1, 1)
+    escritos = 0
+    with open(os.path.join(raiz, 'usuario_horarios_log'), 'w') as f:
+        lineas = []
+        i = 0
+        while escritos < bytes_log:
+            fecha += timedelta(seconds=7)
+            accion = 'iniciar' if i % 2 else 'cerrar'
+            fuera = ' - Fuera de rango' if fecha.hour >= 18 or fecha.hour < 8 else ''
+            linea = f"[{fecha:%Y-%m-%d %H:%M:%S}] SESION: Usuario: u{i % 97} - Acción: {accion}{fuera}\n"
+            lineas.append(linea)
+            escritos += len(linea.encode())
+            i += 1
+            if len(lineas) >= 10000:
+                f.writelines(lineas)
+                lineas = []
+        f.writelines(lineas)
+    datos['fecha_log_medio'] = (datetime(2025, 1, 1) + (fecha - datetime(2025, 1, 1)) / 2).strftime('%Y-%m-%d %H:%M')
+    datos['bytes_log'] = escritos
+
+    binarios = os.path.join(raiz, 'bin')
+    os.makedirs(binarios)
+    for nombre, contenido in BINARIOS_FALSOS.items():
+        ruta = os.path.join(binarios, nombre)
+        with open(ruta, 'w') as f:
+            f.write(contenido)
+        os.chmod(ruta, 0o755)
+    datos['bin'] = binarios
+    return datos
+
+
+#-----------------------------------------------------------------------------------------------------------------------
+# Definicion de los benchmarks
+
+def _borrar(ruta):
+    if os.path.isdir(ruta) and not os.path.islink(ruta):
+        shutil.rmtree(ruta)
+    elif os.path.lexists(ruta):
+        os.unlink(ruta)
+
+
+def definir_benchmarks(d):
+    """Devuelve la lista de benchmarks: nombre, comando(i), preparar(i), bytes por iteracion, iteraciones."""
+    uid, gid = os.getuid(), os.getgid()
+    copia = os.path.join(d['raiz'], 'copia')
+    renombrable = os.path.join(d['raiz'], 'renombrable.txt')
+    return [
+        dict(nombre='speak', comando=lambda i: 'speak hola', iteraciones=2000),
+        dict(nombre='creardir', comando=lambda i: f"creardir {d['raiz']}/nuevos/d{i}", iteraciones=1000),
+        dict(nombre='creararchivo', comando=lambda i: f"creararchivo {d['raiz']}/nuevo_{i}.txt", iteraciones=1000),
+        dict(nombre='renombrar', comando=lambda i: (f"renombrar {renombrable} {renombrable}.nuevo" if i % 2 == 0
+                                                    else f"renombrar {renombrable}.nuevo {renombrable}"),
+             iteraciones=1000),
+        dict(nombre='listar_ancho', comando=lambda i: f"listar {d['ancho']}", iteraciones=30),
+        dict(nombre='listar_largo', comando=lambda i: f"listar -l {d['ancho']}", iteraciones=30),
+        dict(nombre='listar_recursivo', comando=lambda i: f"listar -R {d['profundo']}", iteraciones=20),
+        dict(nombre='copiar_arbol', comando=lambda i: f"copiar -r {d['profundo']} {copia}",
+             preparar=lambda i: _borrar(copia), iteraciones=5),
+        dict(nombre='copiar_grande', comando=lambda i: f"copiar {d['grande']} {copia}",
+             preparar=lambda i: _borrar(copia), bytes=d['bytes_grande'], iteraciones=5),
+        dict(nombre='mover', comando=lambda i: (f"mover {d['grande']} {d['grande']}.movido" if i % 2 == 0
+                                                else f"mover {d['grande']}.movido {d['grande']}"), iteraciones=200),
+        dict(nombre='permisos_recursivo', comando=lambda i: f"permisos -R {'755' if i % 2 else '700'} {d['profundo']}",
+             iteraciones=10),
+        dict(nombre='propietario_recursivo', comando=lambda i: f"propietario -R {uid} {gid} {d['profundo']}",
+             iteraciones=10),
+        dict(nombre='usuario_buscar', comando=lambda i: f"usuario buscar u{i * 37 % 1000}", iteraciones=500),
+        dict(nombre='usuario_lugar', comando=lambda i: f"usuario buscar -l 10.0.{i % 250}.1", iteraciones=200),
+        dict(nombre='usuario_importar', comando=lambda i: f"usuario importar {d['importacion']}", iteraciones=3),
+        dict(nombre='contraseña', comando=lambda i: f"contraseña u{i % 1000}", iteraciones=100),
+        # Cada par iniciar/cerrar es del mismo usuario; la primera llamada importa el log de horarios
+        dict(nombre='sesion', comando=lambda i: f"sesion {'cerrar' if i % 2 else 'iniciar'} u{i // 2 % 97}",
+             iteraciones=1000),
+        dict(nombre='sesion_reporte', comando=lambda i: "sesion reporte --desde 2025-01-01", iteraciones=50),
+        dict(nombre='estado', comando=lambda i: 'estado -f ssh cron nginx', iteraciones=50),
+        dict(nombre='logs_rango', comando=lambda i: f"logs horarios --desde '{d['fecha_log_medio']}' -n 100",
+             iteraciones=30),
+        dict(nombre='logs_contar', comando=lambda i: f"logs horarios --desde '{d['fecha_log_medio']}' -c usuario",
+             iteraciones=3),
+        dict(nombre='transferir_scp', comando=lambda i: f"transferir scp {d['grande']} /tmp/x --host h --user u",
+             iteraciones=50),
+        dict(nombre='ejecutar', comando=lambda i: 'ejecutar true', iteraciones=100),
+    ]
+
+
+#-----------------------------------------------------------------------------------------------------------------------
+# Ejecucion y medidas
+
+def percentil(valores, p):
+    """Percentil por el metodo del rango mas cercano sobre valores ordenados."""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))
+    return valores[indice]
+
+
+def _ejecutar_benchmark(datos, nombre, cola):
+    """Ejecuta un benchmark en un proceso hijo para medir su pico de RSS por separado."""
+    os.chdir(datos['raiz'])
+    os.environ['PATH'] = datos['bin'] + os.pathsep + os.environ.get('PATH', '')
+    sys.path.insert(0, DIRECTORIO_APP)
+    sys.argv = [sys.argv[0]]
+    import first_app
+
+    bench = next(b for b in definir_benchmarks(datos) if b['nombre'] == nombre)
+    app = first_app.FirstApp()
+    app.stdout = io.StringIO()
+    latencias = []
+    with redirect_stderr(io.StringIO()):
+        for i in range(bench['iteraciones']):
+            if 'preparar' in bench:
+                bench['preparar'](i)
+            comando = bench['comando'](i)
+            inicio = time.perf_counter()
+            app.onecmd_plus_hooks(comando)
+            latencias.append(time.perf_counter() - inicio)
+            if app.stdout.tell() > 1024 * 1024:
+                app.stdout = io.StringIO()  # No acumular toda la salida en memoria
+        app.escritor_logs.flush()
+
+    total = sum(latencias)
+    latencias.sort()
+    resultado = {
+        'iteraciones': len(latencias),
+        'media_ms': total / len(latencias) * 1000,
+        'p50_ms': percentil(latencias, 50) * 1000,
+        'p95_ms': percentil(latencias, 95) * 1000,
+        'p99_ms': percentil(latencias, 99) * 1000,
+        'operaciones_s': len(latencias) / total if total else 0.0,
+        'rss_pico_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if 'bytes' in bench:
+        resultado['mb_s'] = bench['bytes'] * len(latencias) / total / (1024 * 1024) if total else 0.0
+    cola.put(resultado)
+
+
+def ejecutar_benchmarks(escala, solo=None, conservar=False):
+    raiz = tempfile.mkdtemp(prefix='bench-shell-')
+    print(f"Creando datos ({escala}) en {raiz}...", file=sys.stderr)
+    try:
+        datos = crear_datos(raiz, escala)
+        nombres = [b['nombre'] for b in definir_benchmarks(datos)]
+        if solo:
+            nombres = [n for n in nombres if any(n.startswith(s) for s in solo)]
+        contexto = multiprocessing.get_context('fork')
+        resultados = {}
+        for nombre in nombres:
+            cola = contexto.Queue()
+            proceso = contexto.Process(target=_ejecutar_benchmark, args=(datos, nombre, cola))
+            proceso.start()
+            proceso.join()
+            if proceso.exitcode != 0:
+                print(f"  {nombre:<24} FALLÓ (código {proceso.exitcode})", file=sys.stderr)
+                continue
+            resultados[nombre] = r = cola.get()
+            extra = f"  {r['mb_s']:.1f} MB/s" if 'mb_s' in r else ''
+            print(f"  {nombre:<24} p50 {r['p50_ms']:9.3f} ms  p95 {r['p95_ms']:9.3f} ms  p99 {r['p99_ms']:9.3f} ms"
+                  f"  RSS {r['rss_pico_kb'] / 1024:7.1f} MB{extra}", file=sys.stderr)
+    finally:
+        if conservar:
+            print(f"Datos conservados en {raiz}", file=sys.stderr)
+        else:
+            shutil.rmtree(raiz, ignore_errors=True)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'escala': escala,
+        'resultados': resultados,
+    }
+
+
+def comparar(base, nuevo, umbral):
+    """Compara dos ejecuciones y devuelve la lista de regresiones (p50 o p95 peores que umbral %)."""
+    regresiones = []
+    print(f"{'BENCHMARK':<24} {'p50 base':>10} {'p50 nuevo':>10} {'cambio':>8}   {'p95 base':>10} {'p95 nuevo':>10} {'cambio':>8}")
+    for nombre, r_nuevo in nuevo['resultados'].items():
+        r_base = base['resultados'].get(nombre)
+        if r_base is None:
+            print(f"{nombre:<24} (nuevo)")
+            continue
+        cambios = []
+        marca = ''
+        for metrica in ('p50_ms', 'p95_ms'):
+            cambio = (r_nuevo[metrica] - r_base[metrica]) / r_base[metrica] * 100 if r_base[metrica] else 0.0
+            cambios.append(cambio)
+            if cambio > umbral:
+                marca = '  REGRESIÓN'
+                regresiones.append((nombre, metrica, cambio))
+        print(f"{nombre:<24} {r_base['p50_ms']:>10.3f} {r_nuevo['p50_ms']:>10.3f} {cambios[0]:>+7.1f}%   "
+              f"{r_base['p95_ms']:>10.3f} {r_nuevo['p95_ms']:>10.3f} {cambios[1]:>+7.1f}%{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de los comandos de la shell.')
+    parser.add_argument('-e', '--escala', choices=list(ESCALAS), default='pequena', help='Tamaño de los datos sintéticos')
+    parser.add_argument('-o', '--salida', help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('-s', '--solo', nargs='+', help='Ejecuta solo los benchmarks cuyo nombre empieza así')
+    parser.add_argument('--conservar', action='store_true', help='No borra los datos sintéticos al terminar')
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'NUEVO'), help='Compara dos archivos de resultados')
+    parser.add_argument('--umbral', type=float, default=10.0, help='Porcentaje de empeoramiento considerado regresión')
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0]) as f:
+            base = json.load(f)
+        with open(args.comparar[1]) as f:
+            nuevo = json.load(f)
+        regresiones = comparar(base, nuevo, args.umbral)
+        if regresiones:
+            print(f"{len(regresiones)} regresión(es) por encima del {args.umbral:g} %.")
+            return 1
+        print("Sin regresiones.")
+        return 0
+
+    resultados = ejecutar_benchmarks(args.escala, args.solo, args.conservar)
+    texto = json.dumps(resultados, indent=4)
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
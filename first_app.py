@@ -1,56 +1,282 @@
 #!/usr/bin/env python
 """A simple cmd2 application."""
+import time
+_INICIO_IMPORTS = time.perf_counter()  # Para --perfil-arranque
 import cmd2
+_FIN_IMPORT_CMD2 = time.perf_counter()
 import argparse
+import glob
 import os
-import shutil
-import pwd
-import grp
-import subprocess
-import json
-from datetime import datetime
-from ftplib import FTP
-from DemonioManager import DemonioManager #Importa DemonioManager
+import sys
+import threading
+from datetime import datetime, timedelta
+# Los modulos de la shell (DemonioManager, RegistroUsuarios, Transferencias...) se importan
+# la primera vez que se usan para que arrancar la shell para un solo comando sea rapido.
 
 HORARIOS_LOG = 'usuario_horarios_log' # Archivo de logs de horarios
 TRANSFERENCIAS_LOG = 'Shell_transferencias' # Archivo de log de transferencias
-USERS_FILE = 'usuarios.json' # Archivo para almacenar la información de los usuarios
+USERS_FILE = 'usuarios.json' # Archivo antiguo de usuarios, se migra a USERS_DB la primera vez
+USERS_DB = 'usuarios.db' # Registro de usuarios (SQLite)
+SESIONES_DB = 'sesiones.db' # Totales diarios de sesiones por usuario (SQLite)
+MOVER_DIARIO = '.mover_diario.json' # Diario de los movimientos entre dispositivos en curso
+INDICE_DB = 'indice_archivos.db' # Indice de archivos para buscar (SQLite)
+DEMONIOS_JSON = 'demonios.json' # Definiciones de los demonios con comando
 HISTORIAL_LOG = 'historial_comandos.log'  # Archivo de log para comandos
 ERROR_LOG = 'errores.log'  # Archivo de log para errores
 
+# Politica de escritura de los logs: 'siempre', 'registros' (cada N) o 'intervalo' (cada T ms)
+LOG_POLITICA = 'registros'
+LOG_CADA_REGISTROS = 100
+LOG_CADA_MS = 200
+LOG_FSYNC = False  # fsync tras cada volcado (mas seguro, mas lento)
+LOG_ROTAR_MB = 64  # Se rota un log al alcanzar este tamaño (0: sin límite)
+LOG_ROTAR_DIAS = 7  # ... o cuando su primer registro tiene esta antigüedad (0: sin límite)
+LOG_RETENER_SEGMENTOS = 50  # Segmentos comprimidos que se conservan por log (0: todos)
+LOG_RETENER_DIAS = 0  # Se borran los segmentos más antiguos que esto (0: sin límite)
+LINEAS_POR_BLOQUE = 256  # Lineas que listar acumula antes de cada escritura
+ESTADO_TTL = 5.0  # Segundos que estado reutiliza el resultado de systemctl
+OBJETIVO_ARRANQUE_MS = 300  # Objetivo de arranque en frío hasta terminar el primer comando
+LOTE_HILOS = min(8, os.cpu_count() or 1)  # Hilos para las órdenes independientes de --lote
+METRICAS_INTERVALO = 15.0  # Segundos entre volcados de metricas --exportar
+SUBSISTEMAS_PEREZOSOS = ('escritor_logs', 'listador', 'registro_usuarios', 'pool_ftp',
+                         'estado_servicios', 'demonio_manager', 'metricas', 'sesiones',
+                         'indice_archivos')  # Ver FirstApp.__getattr__
+FORBIDDEN_COMMANDS = ['ir', 'usuario', 'contraseña', 'demonio']  # No se pueden lanzar con ejecutar
+LOGS = {  # Logs que se pueden consultar con el comando logs
+    'historial': HISTORIAL_LOG,
+    'errores': ERROR_LOG,
+    'horarios': HORARIOS_LOG,
+    'transferencias': TRANSFERENCIAS_LOG,
+}
+
+
+def leer_fecha(texto):
+    """Convierte 'AAAA-MM-DD', 'AAAA-MM-DD HH:MM' o 'AAAA-MM-DD HH:MM:SS' en datetime."""
+    for formato in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"fecha no válida: {texto}")
+
+
+def leer_duracion(texto):
+    """Convierte '30m', '12h' o '7d' en timedelta."""
+    unidades = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+    if len(texto) < 2 or texto[-1] not in unidades or not texto[:-1].isdigit():
+        raise argparse.ArgumentTypeError(f"duración no válida: {texto} (usa e.g. 30m, 12h, 7d)")
+    return timedelta(**{unidades[texto[-1]]: int(texto[:-1])})
+
+
+def leer_tamano(texto):
+    """Convierte '512', '10K', '5M' o '2G' en bytes."""
+    unidades = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    multiplicador = unidades.get(texto[-1:].upper(), 1)
+    numero = texto[:-1] if multiplicador > 1 else texto
+    try:
+        return int(float(numero) * multiplicador)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamaño no válido: {texto} (usa e.g. 512, 10K, 5M, 2G)")
+
 class FirstApp(cmd2.Cmd):
     """A simple cmd2 application."""
 
     def __init__(self):
         super().__init__()
         self.current_directory = os.getcwd()  # Ruta actual al iniciar la shell
-        self.demonio_manager = DemonioManager()
-        self.demonio_manager.add_demonio('virusreloco')  # Agrega un demonio de ejemplo
-        self.demonio_manager.add_demonio('leagueofleyends')  # Otro demonio de ejemplo
+        self.tiempos_arranque = {}  # Tiempo de creación de cada subsistema (ver --perfil-arranque)
+        self.trabajos = {}  # Trabajos de ejecutar --fondo por id
+        self.ultimo_trabajo = 0
+        self.lock_salida = threading.Lock()  # Evita mezclar lineas escritas desde varios hilos
 
         # Registrar hooks para comandos y errores
+        self.register_precmd_hook(self._medir_inicio)
+        self.register_postcmd_hook(self._medir_fin)  # Antes que _log_command para no medir el registro
         self.register_postcmd_hook(self._log_command)
+        self.register_postloop_hook(self._cerrar_subsistemas)  # Vuelca los logs y cierra conexiones al salir
 
         # Make maxrepeats settable at runtime
         self.maxrepeats = 3
         self.add_settable(cmd2.Settable('maxrepeats', int, 'max repetitions for speak command', self))
 
+        # Segundos que estado reutiliza el resultado de systemctl
+        self.estado_ttl = ESTADO_TTL
+        self.add_settable(cmd2.Settable('estado_ttl', float, 'segundos de cache del comando estado', self))
+
+    #--------------------------------------------------------------------------------------------------------------------
+    #Subsistemas: se crean la primera vez que un comando los necesita.
+    # No son propiedades porque cmd2 recorre los atributos de la instancia al iniciarse
+    # (inspect.getmembers) y las evaluaría todas; __getattr__ solo se llama si el atributo falta.
+
+    def __getattr__(self, nombre):
+        """Crea un subsistema perezoso con su método _crear_<nombre> la primera vez que se usa."""
+        if nombre not in SUBSISTEMAS_PEREZOSOS:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{nombre}'")
+        inicio = time.perf_counter()
+        valor = getattr(self, '_crear_' + nombre)()
+        self.__dict__[nombre] = valor
+        self.__dict__.setdefault('tiempos_arranque', {})[nombre] = time.perf_counter() - inicio
+        return valor
+
+    def _crear_escritor_logs(self):
+        """Escritor de logs en segundo plano."""
+        from EscritorLogs import EscritorLogs
+        from RotacionLogs import Rotador
+        rotador = Rotador(LOG_ROTAR_MB * 1024 * 1024, timedelta(days=LOG_ROTAR_DIAS) if LOG_ROTAR_DIAS else None,
+                          LOG_RETENER_SEGMENTOS, LOG_RETENER_DIAS)
+        return EscritorLogs(LOG_POLITICA, LOG_CADA_REGISTROS, LOG_CADA_MS, LOG_FSYNC, rotador=rotador)
+
+    def _crear_listador(self):
+        """Cache de metadatos por directorio para listar."""
+        from Listador import Listador
+        return Listador()
+
+    def _crear_registro_usuarios(self):
+        """Indice de usuarios en memoria, cargado desde la base SQLite."""
+        from RegistroUsuarios import RegistroUsuarios
+        return RegistroUsuarios(USERS_DB, USERS_FILE)
+
+    def _crear_pool_ftp(self):
+        """Conexiones FTP reutilizadas entre transferencias."""
+        from Transferencias import PoolFTP
+        return PoolFTP()
+
+    def _crear_estado_servicios(self):
+        """Cache de estados de systemctl."""
+        from EstadoServicios import EstadoServicios
+        return EstadoServicios(ttl=self.estado_ttl)
+
+    def _crear_demonio_manager(self):
+        """Gestor de demonios con los demonios guardados y los de ejemplo registrados."""
+        from DemonioManager import DemonioManager
+        demonio_manager = DemonioManager(DEMONIOS_JSON)
+        demonio_manager.add_demonio('virusreloco')  # Agrega un demonio de ejemplo
+        demonio_manager.add_demonio('leagueofleyends')  # Otro demonio de ejemplo
+        return demonio_manager
+
+    def _crear_metricas(self):
+        """Histogramas de latencia y consumo por comando."""
+        from Metricas import Metricas
+        return Metricas()
+
+    def _crear_sesiones(self):
+        """Sesiones abiertas y totales diarios; la primera vez se calculan desde el log de horarios."""
+        from Sesiones import Sesiones, TablaHorarios
+        return Sesiones(SESIONES_DB, TablaHorarios(self.registro_usuarios), HORARIOS_LOG)
+
+    def _crear_indice_archivos(self):
+        """Indice persistente de archivos para buscar."""
+        from IndiceArchivos import IndiceArchivos
+        return IndiceArchivos(INDICE_DB)
+
+    def _cerrar_subsistemas(self):
+        """Cierra solo los subsistemas que llegaron a crearse."""
+        if 'indice_archivos' in self.__dict__:
+            self.indice_archivos.close()
+        if 'sesiones' in self.__dict__:
+            self.sesiones.close()
+        if 'metricas' in self.__dict__:
+            ruta = self.metricas.detener_exportacion()
+            if ruta:
+                self.metricas.exportar(ruta)  # Último volcado con los comandos de esta sesión
+        if 'pool_ftp' in self.__dict__:
+            self.pool_ftp.cerrar_todas()
+        if 'demonio_manager' in self.__dict__:
+            self.demonio_manager.close()  # Los procesos supervisados no sobreviven a la shell
+        if 'registro_usuarios' in self.__dict__:
+            self.registro_usuarios.close()
+        if 'escritor_logs' in self.__dict__:
+            self.escritor_logs.close()
+
+    #--------------------------------------------------------------------------------------------------------------------
+    #Completado de rutas relativo a current_directory (path_complete de cmd2 usa el cwd del proceso)
+
+    def completar_rutas(self, text, line, begidx, endidx):
+        return self._completar_rutas(text, line, begidx, endidx, solo_directorios=False)
+
+    def completar_directorios(self, text, line, begidx, endidx):
+        return self._completar_rutas(text, line, begidx, endidx, solo_directorios=True)
+
+    def _completar_rutas(self, text, line, begidx, endidx, solo_directorios):
+        """Completa con los listados cacheados de Listador: cada tecla cuesta un stat del directorio."""
+        if '*' in text or '?' in text:
+            return []
+        if text.startswith('~') and os.sep not in text:
+            return self.path_complete(text, line, begidx, endidx)  # ~usuario
+        escrito, prefijo = text[:len(text) - len(os.path.basename(text))], os.path.basename(text)
+        directorio = os.path.abspath(os.path.join(self.current_directory, os.path.expanduser(escrito)))
+        try:
+            nombres = self.listador.nombres(directorio)
+        except OSError:
+            return []
+        ocultos = prefijo.startswith('.')  # Como glob: los ocultos solo si se empieza a escribir un punto
+        coincidencias = sorted((nombre, es_directorio) for nombre, es_directorio in nombres
+                               if nombre.startswith(prefijo) and (es_directorio or not solo_directorios)
+                               and (ocultos or not nombre.startswith('.')))
+        if not coincidencias:
+            return []
+
+        self.matches_delimited = True  # Comillas correctas en rutas con espacios
+        self.matches_sorted = True
+        if len(coincidencias) == 1 and coincidencias[0][1]:
+            self.allow_appended_space = False  # Se sigue escribiendo dentro del directorio
+            self.allow_closing_quote = False
+        separador = endidx == len(line) or line[endidx] != os.sep
+        resultado = []
+        for nombre, es_directorio in coincidencias:
+            self.display_matches.append(nombre)
+            resultado.append(escrito + nombre + (os.sep if es_directorio and separador else ''))
+        return resultado
+
+    #--------------------------------------------------------------------------------------------------------------------
+    #Metricas por comando
+
+    def _medir_inicio(self, data: cmd2.plugin.PrecommandData) -> cmd2.plugin.PrecommandData:
+        self.metricas.inicio()
+        return data
+
+    def _medir_fin(self, data: cmd2.plugin.PostcommandData) -> cmd2.plugin.PostcommandData:
+        self.metricas.fin(data.statement.command)
+        return data
+
+    #--------------------------------------------------------------------------------------------------------------------
+    #Modo lote (--lote archivo)
+
+    def ejecutar_lote(self, lineas, hilos=LOTE_HILOS):
+        """Analiza y ejecuta un script completo; devuelve el código de salida del proceso."""
+        from Lote import EjecutorLote, parsear_lote, resumen
+        ordenes, errores = parsear_lote(self, lineas)
+        if errores:
+            for numero, linea, mensaje in errores:
+                self.perror(f"línea {numero}: {linea}: {mensaje}")
+            self.perror(f"Lote no ejecutado: {len(errores)} errores de sintaxis.")
+            return 2
+
+        escritor = self.escritor_logs  # Se crea aquí, antes de lanzar los hilos
+
+        def registrar(orden):
+            escritor.escribir(HISTORIAL_LOG, 'COMANDO', orden.linea)
+
+        inicio = time.perf_counter()
+        ejecutadas = EjecutorLote(self, hilos, registrar).ejecutar(ordenes)
+        texto = resumen(ejecutadas, time.perf_counter() - inicio, hilos)
+        if all(orden.ok for orden in ejecutadas):
+            self.poutput(texto)
+            return 0
+        self.perror(texto)
+        return 1
+
     #--------------------------------------------------------------------------------------------------------------------
     #Historial de comandos y errores
 
     def _log_command(self, data: cmd2.plugin.PostcommandData) -> cmd2.plugin.PostcommandData:
         """Registra cada comando ejecutado."""
-        command = data.statement.raw
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(HISTORIAL_LOG, 'a') as log:
-            log.write(f"[{timestamp}] Comando ejecutado: {command}\n")
+        self.escritor_logs.escribir(HISTORIAL_LOG, 'COMANDO', data.statement.raw)
         return data
 
     def _log_error(self, message):
         """Registra errores en el archivo de errores."""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(ERROR_LOG, 'a') as log:
-            log.write(f"[{timestamp}] ERROR: {message}\n")
+        self.escritor_logs.escribir(ERROR_LOG, 'ERROR', message)
 
     def perror(self, msg, *, end='\n', apply_style=True):
         """Sobrescribe perror para registrar errores en el archivo de errores."""
@@ -58,54 +284,125 @@ class FirstApp(cmd2.Cmd):
         super().perror(msg, end=end, apply_style=apply_style)
 
         # Registra el error en el archivo de errores
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(ERROR_LOG, 'a') as log:
-            log.write(f"[{timestamp}] ERROR: {msg}\n")
+        self._log_error(msg)
 
 
     # Ejemplo de comandos:
 
     # Comando para listar directorios
-    list_parser = cmd2.Cmd2ArgumentParser()
-    list_parser.add_argument('directory', nargs='?', default='', help='Directorio a listar (por defecto: actual)')
+    @staticmethod
+    def list_parser():
+        from Listador import ORDENES
+        list_parser = cmd2.Cmd2ArgumentParser()
+        list_parser.add_argument('directory', nargs='?', default='', completer=FirstApp.completar_directorios, help='Directorio a listar (por defecto: actual)')
+        list_parser.add_argument('-l', '--largo', action='store_true', help='Formato largo: permisos, tamaño y fecha')
+        list_parser.add_argument('-o', '--orden', choices=ORDENES, default='nombre', help='Criterio de ordenación')
+        list_parser.add_argument('-U', '--sin-orden', action='store_true', help='No ordena: muestra las entradas según se leen')
+        list_parser.add_argument('-i', '--inverso', action='store_true', help='Invierte el orden')
+        list_parser.add_argument('-f', '--filtro', help='Patrón glob para filtrar nombres (e.g., "*.txt")')
+        list_parser.add_argument('-R', '--recursivo', action='store_true', help='Lista también los subdirectorios')
+        list_parser.add_argument('-d', '--profundidad', type=int, help='Profundidad máxima de recursión (implica -R)')
+        list_parser.add_argument('-P', '--pagina', type=int, default=0, help='Líneas por página (0: sin paginar)')
+        return list_parser
 
     @cmd2.with_argparser(list_parser)
     def do_listar(self, args):
         """Lista el contenido de un directorio."""
-        directory_to_list = os.path.abspath(args.directory or self.current_directory)
+        directory_to_list = os.path.abspath(os.path.join(self.current_directory, args.directory))
+        if not os.path.exists(directory_to_list):
+            self.perror("El directorio especificado no existe.")
+            return
+
+        recursivo = args.recursivo or args.profundidad is not None
+        entradas = self.listador.listar(directory_to_list, args.filtro, None if args.sin_orden else args.orden,
+                                        args.inverso, recursivo, args.profundidad)
+        paginar = args.pagina > 0 and sys.stdin.isatty()
+        bloque = args.pagina if paginar else LINEAS_POR_BLOQUE
+        lineas = []
+        directorio_actual = directory_to_list
         try:
-            entries = os.listdir(directory_to_list)
-            for entry in entries:
-                self.poutput(entry)
+            for directorio, entrada in entradas:
+                if isinstance(entrada, OSError):
+                    if directorio == directory_to_list:
+                        raise entrada
+                    self.perror(f"No se pudo leer {directorio}: {entrada.strerror}")
+                    continue
+                if recursivo and directorio != directorio_actual:
+                    directorio_actual = directorio
+                    lineas.append(f"\n{directorio}:")
+                lineas.append(entrada.formato_largo() if args.largo else entrada.nombre)
+
+                # La salida se emite por bloques a medida que se recorre el directorio
+                if len(lineas) >= bloque:
+                    self.poutput('\n'.join(lineas))
+                    lineas = []
+                    if paginar and self.read_input("-- Más (Enter para continuar, q para salir) --").strip().lower() == 'q':
+                        return
+            if lineas:
+                self.poutput('\n'.join(lineas))
         except PermissionError:
             self.perror("Acceso denegado al directorio especificado.")
-        except FileNotFoundError:
-            self.perror("El directorio especificado no existe.")
+        except NotADirectoryError:
+            self.perror("La ruta especificada no es un directorio.")
         except Exception as e:
             self.perror(f"Error inesperado: {e}")
 
     # Comando para copiar archivos
-    copy_parser = cmd2.Cmd2ArgumentParser()
-    copy_parser.add_argument('source', help='Archivo o directorio de origen')
-    copy_parser.add_argument('destination', help='Archivo o directorio de destino')
+    @staticmethod
+    def copy_parser():
+        copy_parser = cmd2.Cmd2ArgumentParser()
+        copy_parser.add_argument('source', completer=FirstApp.completar_rutas, help='Archivo o directorio de origen')
+        copy_parser.add_argument('destination', completer=FirstApp.completar_rutas, help='Archivo o directorio de destino')
+        copy_parser.add_argument('-r', '--recursivo', action='store_true', help='Copia directorios completos')
+        copy_parser.add_argument('-p', '--preservar', action='store_true', help='Conserva permisos y fechas')
+        copy_parser.add_argument('-j', '--hilos', type=int, default=min(8, os.cpu_count() or 1), help='Hilos de copia en paralelo')
+        return copy_parser
 
     @cmd2.with_argparser(copy_parser)
     def do_copiar(self, args):
         """Copia un archivo o directorio al destino especificado."""
+        from Copiador import Copiador
+        source_path = os.path.abspath(os.path.join(self.current_directory, args.source))
+        destination_path = os.path.abspath(os.path.join(self.current_directory, args.destination))
+        copiador = Copiador(args.hilos, args.preservar, progreso=self._mostrar_progreso)
         try:
-            shutil.copy(args.source, args.destination)
-            self.poutput(f"Archivo {args.source} copiado a {args.destination}.")
+            resultado = copiador.copiar(source_path, destination_path, args.recursivo)
         except FileNotFoundError:
             self.perror("El archivo de origen no existe.")
+            return
         except PermissionError:
             self.perror("No tienes permisos para copiar el archivo.")
+            return
         except Exception as e:
             self.perror(f"Error al copiar el archivo: {e}")
+            return
+        self._limpiar_progreso()
+
+        for ruta, error in resultado.errores:
+            self.perror(f"Error al copiar {ruta}: {error}")
+        self.poutput(resultado.resumen())
+
+    def _mostrar_progreso(self, copiados, archivos, segundos):
+        """Muestra una linea de progreso en la terminal (solo si es interactiva)."""
+        from Copiador import formatear_bytes
+        if sys.stderr.isatty():
+            velocidad = copiados / segundos if segundos > 0 else 0
+            sys.stderr.write(f"\r{archivos} archivos, {formatear_bytes(copiados)} "
+                             f"({formatear_bytes(velocidad)}/s)\033[K")
+            sys.stderr.flush()
+
+    def _limpiar_progreso(self):
+        if sys.stderr.isatty():
+            sys.stderr.write("\r\033[K")
+            sys.stderr.flush()
 
     # Comando para renombrar archivos
-    rename_parser = cmd2.Cmd2ArgumentParser()
-    rename_parser.add_argument('source', help='Archivo o directorio actual')
-    rename_parser.add_argument('new_name', help='Nuevo nombre del archivo o directorio')
+    @staticmethod
+    def rename_parser():
+        rename_parser = cmd2.Cmd2ArgumentParser()
+        rename_parser.add_argument('source', help='Archivo o directorio actual')
+        rename_parser.add_argument('new_name', help='Nuevo nombre del archivo o directorio')
+        return rename_parser
 
     @cmd2.with_argparser(rename_parser)
     def do_renombrar(self, args):
@@ -121,12 +418,16 @@ class FirstApp(cmd2.Cmd):
             self.perror(f"Error al renombrar: {e}")
 
     # Comando para cambiar la contraseña de un usuario
-    password_parser = cmd2.Cmd2ArgumentParser()
-    password_parser.add_argument('username', help='Nombre de usuario para cambiar la contraseña')
+    @staticmethod
+    def password_parser():
+        password_parser = cmd2.Cmd2ArgumentParser()
+        password_parser.add_argument('username', help='Nombre de usuario para cambiar la contraseña')
+        return password_parser
 
     @cmd2.with_argparser(password_parser)
     def do_contraseña(self, args):
         """Cambia la contraseña de un usuario."""
+        import subprocess
         try:
             result = subprocess.run(['passwd', args.username], check=True)
             if result.returncode == 0:
@@ -137,30 +438,65 @@ class FirstApp(cmd2.Cmd):
             self.perror(f"Error inesperado al cambiar contraseña: {e}")
 
     # Comando para verificar el estado de un servicio
-    service_parser = cmd2.Cmd2ArgumentParser()
-    service_parser.add_argument('service', help='Nombre del servicio a verificar')
+    @staticmethod
+    def service_parser():
+        service_parser = cmd2.Cmd2ArgumentParser()
+        service_parser.add_argument('service', nargs='+', help='Servicios a verificar (se admiten patrones, e.g., "ssh*")')
+        service_parser.add_argument('-f', '--forzar', action='store_true', help='Ignora la cache y consulta systemctl')
+        service_parser.add_argument('-v', '--vigilar', type=float, nargs='?', const=2.0, metavar='SEGUNDOS',
+                                    help='Vigila los servicios y muestra solo los cambios (Ctrl-C para salir)')
+        return service_parser
 
     @cmd2.with_argparser(service_parser)
     def do_estado(self, args):
-        """Verifica si un servicio está inicializado."""
+        """Verifica si uno o varios servicios están inicializados."""
+        self.estado_servicios.ttl = self.estado_ttl
         try:
-            result = subprocess.run(['systemctl', 'status', args.service], text=True, capture_output=True)
-            if "active (running)" in result.stdout:
-                self.poutput(f"El servicio {args.service} está en ejecución.")
-            else:
-                self.perror(f"El servicio {args.service} no está inicializado.")
+            servicios = self.estado_servicios.expandir(args.service)
+            if not servicios:
+                self.perror("Ningún servicio coincide con los patrones indicados.")
+                return
+            estados = self.estado_servicios.consultar(servicios, args.forzar)
+            for servicio in servicios:
+                estado = estados.get(servicio)
+                if estado is not None and estado.en_ejecucion():
+                    self.poutput(f"El servicio {servicio} está en ejecución.")
+                elif estado is not None and not estado.existe():
+                    self.perror(f"El servicio {servicio} no existe.")
+                else:
+                    self.perror(f"El servicio {servicio} no está inicializado.")
+            if args.vigilar:
+                self._vigilar_servicios(servicios, estados, args.vigilar)
         except FileNotFoundError:
             self.perror("El comando 'systemctl' no está disponible en este sistema.")
         except Exception as e:
             self.perror(f"Error al verificar el estado del servicio: {e}")
 
+    def _vigilar_servicios(self, servicios, estados, intervalo):
+        """Consulta los servicios cada intervalo y muestra solo los cambios de estado."""
+        self.poutput(f"Vigilando {len(servicios)} servicio(s) cada {intervalo:g} s (Ctrl-C para salir)...")
+        try:
+            while True:
+                time.sleep(intervalo)
+                nuevos = self.estado_servicios.consultar(servicios, forzar=True)
+                for servicio, estado in nuevos.items():
+                    anterior = estados.get(servicio)
+                    if anterior is None or anterior.clave() != estado.clave():
+                        self.poutput(f"[{datetime.now():%H:%M:%S}] {estado}")
+                estados = nuevos
+        except KeyboardInterrupt:
+            self.poutput("Vigilancia detenida.")
+
     # Comandos básicos de prueba:
     #--------------------------------------------------------------------------------------------------------------------
-    speak_parser = cmd2.Cmd2ArgumentParser()
-    speak_parser.add_argument('-p', '--piglatin', action='store_true', help='atinLay')
-    speak_parser.add_argument('-s', '--shout', action='store_true', help='N00B EMULATION MODE')
-    speak_parser.add_argument('-r', '--repeat', type=int, help='output [n] times')
-    speak_parser.add_argument('words', nargs='+', help='words to say')
+    @staticmethod
+    def speak_parser():
+        speak_parser = cmd2.Cmd2ArgumentParser()
+        speak_parser.add_argument('-p', '--piglatin', action='store_true', help='atinLay')
+        speak_parser.add_argument('-s', '--shout', action='store_true', help='N00B EMULATION MODE')
+        speak_parser.add_argument('-r', '--repeat', type=int, help='output [n] times')
+        speak_parser.add_argument('words', nargs='+', help='words to say')
+        return speak_parser
 
     @cmd2.with_argparser(speak_parser)
     def do_speak(self, args): #comando de prueba: speak
@@ -181,8 +517,11 @@ class FirstApp(cmd2.Cmd):
     #-------------------------------------------------------------------------------------------------------------------
 
     # Comando para crear archivos - extra
-    create_file_parser = cmd2.Cmd2ArgumentParser()
-    create_file_parser.add_argument('filename', help='Nombre del archivo a crear')
+    @staticmethod
+    def create_file_parser():
+        create_file_parser = cmd2.Cmd2ArgumentParser()
+        create_file_parser.add_argument('filename', help='Nombre del archivo a crear')
+        return create_file_parser
 
     @cmd2.with_argparser(create_file_parser)
     def do_creararchivo(self, args): #comando: creararchivo
@@ -195,8 +534,11 @@ class FirstApp(cmd2.Cmd):
             self.perror(f"Error al crear el archivo: {e}")
 
     # Comando para crear directorios - 5 solicitado
-    create_dir_parser = cmd2.Cmd2ArgumentParser()
-    create_dir_parser.add_argument('dirname', help='Nombre del directorio a crear')
+    @staticmethod
+    def create_dir_parser():
+        create_dir_parser = cmd2.Cmd2ArgumentParser()
+        create_dir_parser.add_argument('dirname', help='Nombre del directorio a crear')
+        return create_dir_parser
 
     @cmd2.with_argparser(create_dir_parser)
     def do_creardir(self, args): #comando: creardir
@@ -209,24 +551,192 @@ class FirstApp(cmd2.Cmd):
 
 
     # Comando para mover archivos - 2 solicitado
-    move_parser = cmd2.Cmd2ArgumentParser()
-    move_parser.add_argument('source', help='Archivo o directorio de origen')
-    move_parser.add_argument('destination', help='Archivo o directorio de destino')
+    @staticmethod
+    def move_parser():
+        move_parser = cmd2.Cmd2ArgumentParser()
+        move_parser.add_argument('rutas', nargs='*', completer=FirstApp.completar_rutas, help='Orígenes (admite globs) y, al final, el destino')
+        move_parser.add_argument('-j', '--hilos', type=int, default=min(8, os.cpu_count() or 1), help='Hilos de copia entre dispositivos')
+        move_parser.add_argument('--hash', action='store_true', help='Verifica también el contenido de las copias entre dispositivos')
+        move_parser.add_argument('--reanudar', action='store_true', help='Termina un movimiento entre dispositivos interrumpido')
+        move_parser.add_argument('--deshacer', action='store_true', help='Deshace un movimiento entre dispositivos interrumpido')
+        return move_parser
 
     @cmd2.with_argparser(move_parser)
     def do_mover(self, args): # comando: mover
-        """Mueve un archivo o directorio al destino especificado."""
-        source_path = os.path.abspath(os.path.join(self.current_directory, args.source))
-        destination_path = os.path.abspath(os.path.join(self.current_directory, args.destination))
-
+        """Mueve uno o varios archivos o directorios al destino especificado."""
+        from Movedor import Movedor, expandir
+        movedor = Movedor(MOVER_DIARIO, args.hilos, args.hash, progreso=self._mostrar_progreso)
         try:
-            if os.path.exists(source_path):
-                shutil.move(source_path, destination_path)
-                self.poutput(f"Movido {source_path} a {destination_path}.")
+            if args.reanudar or args.deshacer:
+                if not movedor.pendientes():
+                    self.poutput("No hay ningún movimiento interrumpido.")
+                    return
+                resultado = movedor.reanudar() if args.reanudar else movedor.deshacer()
             else:
-                self.perror(f"El archivo o directorio {args.source} no existe.")
+                if len(args.rutas) < 2:
+                    self.perror("Indica al menos un origen y el destino.")
+                    return
+                origenes, sin_coincidencias = expandir(args.rutas[:-1], self.current_directory)
+                for patron in sin_coincidencias:
+                    self.perror(f"El archivo o directorio {patron} no existe.")
+                if not origenes:
+                    return
+                destino = os.path.abspath(os.path.join(self.current_directory, args.rutas[-1]))
+                resultado = movedor.mover(origenes, destino)
         except Exception as e:
             self.perror(f"Error al mover: {e}")
+            return
+        finally:
+            self._limpiar_progreso()
+
+        for ruta, error in resultado.errores:
+            self.perror(f"Error al mover {ruta}: {error}")
+        if args.deshacer:
+            self.poutput(f"Deshechos {resultado.renombrados} movimientos.")
+        else:
+            self.poutput(resultado.resumen())
+        if movedor.pendientes():
+            self.perror(f"Quedan movimientos pendientes en {MOVER_DIARIO}: usa mover --reanudar o mover --deshacer.")
+
+
+    # Comando para sincronizar directorios (copia solo lo nuevo o modificado)
+    @staticmethod
+    def sincronizar_parser():
+        sincronizar_parser = cmd2.Cmd2ArgumentParser()
+        sincronizar_parser.add_argument('origen', completer=FirstApp.completar_directorios, help='Directorio de origen')
+        sincronizar_parser.add_argument('destino', completer=FirstApp.completar_directorios, help='Directorio de destino (se crea si no existe)')
+        sincronizar_parser.add_argument('-n', '--simulacion', action='store_true', help='Muestra los cambios sin aplicarlos')
+        sincronizar_parser.add_argument('--borrar', action='store_true', help='Borra del destino lo que ya no está en el origen')
+        sincronizar_parser.add_argument('--hash', action='store_true',
+                                        help='Compara por contenido los archivos con el mismo tamaño y distinta fecha')
+        sincronizar_parser.add_argument('--verificar', action='store_true',
+                                        help='Recorre el destino en lugar de fiarse del manifiesto de la última sincronización')
+        sincronizar_parser.add_argument('-v', '--detalle', action='store_true', help='Lista cada archivo nuevo, modificado o borrado')
+        sincronizar_parser.add_argument('-j', '--hilos', type=int, default=min(8, os.cpu_count() or 1), help='Hilos de recorrido, hash y copia')
+        return sincronizar_parser
+
+    @cmd2.with_argparser(sincronizar_parser)
+    def do_sincronizar(self, args):  # comando: sincronizar
+        """Copia al destino solo los archivos nuevos o modificados del origen."""
+        from Sincronizador import Sincronizador
+        origen = os.path.abspath(os.path.join(self.current_directory, args.origen))
+        destino = os.path.abspath(os.path.join(self.current_directory, args.destino))
+        sincronizador = Sincronizador(args.hilos, args.hash, args.borrar, args.verificar, progreso=self._mostrar_progreso)
+        try:
+            resultado = sincronizador.sincronizar(origen, destino, args.simulacion)
+        except (OSError, ValueError) as e:
+            self.perror(f"Error al sincronizar: {e}")
+            return
+        finally:
+            self._limpiar_progreso()
+
+        if args.simulacion or args.detalle:
+            lineas = [f"{marca} {ruta}" for marca, rutas in (('+', resultado.nuevos), ('~', resultado.modificados),
+                                                              ('=', resultado.tocados), ('-', resultado.borrados))
+                      for ruta in rutas]
+            for inicio in range(0, len(lineas), LINEAS_POR_BLOQUE):
+                self.poutput('\n'.join(lineas[inicio:inicio + LINEAS_POR_BLOQUE]))
+        for ruta, error in resultado.errores:
+            self.perror(f"Error en {ruta}: {error}")
+        self.poutput(resultado.resumen(args.simulacion))
+
+    # Comando para buscar archivos en el indice persistente
+    @staticmethod
+    def buscar_parser():
+        hilos = min(8, os.cpu_count() or 1)
+        buscar_parser = cmd2.Cmd2ArgumentParser()
+        buscar_subparsers = buscar_parser.add_subparsers(dest='accion', required=True, help='Acción sobre el índice')
+
+        buscar_index_parser = buscar_subparsers.add_parser('indexar', help='Indexa o actualiza directorios')
+        buscar_index_parser.add_argument('rutas', nargs='*', completer=FirstApp.completar_directorios, help='Directorios a indexar (por defecto: actual)')
+        buscar_index_parser.add_argument('-t', '--todas', action='store_true', help='Actualiza todas las raíces ya indexadas')
+        buscar_index_parser.add_argument('-j', '--hilos', type=int, default=hilos, help='Hilos de recorrido')
+
+        buscar_files_parser = buscar_subparsers.add_parser('archivos', help='Busca en el índice por nombre, tamaño y fecha')
+        buscar_files_parser.add_argument('patron', nargs='?',
+                                         help='Glob sobre el nombre (e.g., "*.log"); sin comodines busca el texto contenido')
+        buscar_files_parser.add_argument('-r', '--regex', help='Expresión regular sobre la ruta completa')
+        buscar_files_parser.add_argument('-t', '--tipo', choices=['f', 'd', 'l', 'o'], help='f: archivo, d: directorio, l: enlace, o: otro')
+        buscar_files_parser.add_argument('--mayor', type=leer_tamano, help='Tamaño mínimo (e.g., 10K, 5M, 2G)')
+        buscar_files_parser.add_argument('--menor', type=leer_tamano, help='Tamaño máximo')
+        buscar_files_parser.add_argument('--recientes', type=leer_duracion, help='Modificados en este periodo (e.g., 30m, 12h, 7d)')
+        buscar_files_parser.add_argument('--antiguos', type=leer_duracion, help='Sin modificar desde hace este periodo')
+        buscar_files_parser.add_argument('-e', '--en', default='', completer=FirstApp.completar_directorios, help='Directorio donde buscar (por defecto: actual)')
+        buscar_files_parser.add_argument('-n', '--limite', type=int, default=0, help='Máximo de resultados (0: todos)')
+        buscar_files_parser.add_argument('-l', '--largo', action='store_true', help='Muestra tipo, tamaño y fecha')
+        buscar_files_parser.add_argument('-a', '--actualizar', action='store_true', help='Actualiza el índice antes de buscar')
+
+        buscar_usage_parser = buscar_subparsers.add_parser('uso', help='Espacio ocupado por cada subdirectorio')
+        buscar_usage_parser.add_argument('ruta', nargs='?', default='', completer=FirstApp.completar_directorios,
+                                         help='Directorio (por defecto: actual)')
+        buscar_usage_parser.add_argument('-d', '--profundidad', type=int, default=1, help='Niveles de subdirectorios a desglosar')
+        buscar_usage_parser.add_argument('-n', '--limite', type=int, default=20, help='Máximo de subdirectorios (0: todos)')
+        buscar_usage_parser.add_argument('-a', '--actualizar', action='store_true', help='Actualiza el índice antes de calcular')
+        return buscar_parser
+
+    @cmd2.with_argparser(buscar_parser)
+    def do_buscar(self, args):  # comando: buscar
+        """Indexa directorios y busca archivos en el índice sin recorrer el disco."""
+        if args.accion == 'indexar':
+            if args.todas:
+                rutas = self.indice_archivos.raices()
+            else:
+                rutas = [os.path.abspath(os.path.join(self.current_directory, r)) for r in args.rutas or ['']]
+            for ruta in rutas:
+                self._indexar(ruta, args.hilos)
+            return
+
+        ruta = os.path.abspath(os.path.join(self.current_directory, args.en if args.accion == 'archivos' else args.ruta))
+        raiz = self.indice_archivos.raiz_de(ruta)
+        if raiz is None:
+            self.perror(f"{ruta} no está indexado: usa buscar indexar.")
+            return
+        if args.actualizar and not self._indexar(raiz, min(8, os.cpu_count() or 1), silencioso=True):
+            return
+
+        if args.accion == 'uso':
+            from Copiador import formatear_bytes
+            subarboles = self.indice_archivos.uso(ruta, max(1, args.profundidad))
+            total = sum(t for _, t, _ in subarboles)
+            lineas = [f"{formatear_bytes(t):>10} {n:>9} {os.path.relpath(r, ruta) if r != ruta else '.'}"
+                      for r, t, n in subarboles[:args.limite or None]]
+            lineas.append(f"{formatear_bytes(total):>10} {sum(n for _, _, n in subarboles):>9} total")
+            self.poutput('\n'.join(lineas))
+            return
+
+        from IndiceArchivos import formatear_entrada
+        patron = args.patron
+        if patron and not glob.has_magic(patron):
+            patron = f"*{patron}*"
+        ahora = time.time()
+        try:
+            resultados = self.indice_archivos.buscar(
+                ruta, patron, args.regex, args.tipo, args.mayor, args.menor,
+                int(ahora - args.recientes.total_seconds()) if args.recientes else None,
+                int(ahora - args.antiguos.total_seconds()) if args.antiguos else None, args.limite)
+            lineas = []
+            for entrada in resultados:
+                lineas.append(formatear_entrada(*entrada) if args.largo else entrada[0])
+                if len(lineas) >= LINEAS_POR_BLOQUE:
+                    self.poutput('\n'.join(lineas))
+                    lineas = []
+            if lineas:
+                self.poutput('\n'.join(lineas))
+        except ValueError as e:
+            self.perror(f"Error en la búsqueda: {e}")
+
+    def _indexar(self, ruta, hilos, silencioso=False):
+        """Indexa o actualiza ruta en el índice; devuelve False si no se pudo."""
+        try:
+            resultado = self.indice_archivos.indexar(ruta, hilos)
+        except OSError as e:
+            self.perror(f"No se pudo indexar {ruta}: {e}")
+            return False
+        for directorio, error in resultado.errores:
+            self.perror(f"No se pudo leer {directorio}: {error}")
+        if not silencioso:
+            self.poutput(f"{ruta}: {resultado.resumen()}")
+        return True
 
 
 
@@ -234,8 +744,11 @@ class FirstApp(cmd2.Cmd):
  
 
     # Comando para cambiar de directorio - 6 solicitado
-    change_dir_parser = cmd2.Cmd2ArgumentParser()
-    change_dir_parser.add_argument('directory', help='Ruta del directorio al que desea cambiar')
+    @staticmethod
+    def change_dir_parser():
+        change_dir_parser = cmd2.Cmd2ArgumentParser()
+        change_dir_parser.add_argument('directory', completer=FirstApp.completar_directorios, help='Ruta del directorio al que desea cambiar')
+        return change_dir_parser
 
     @cmd2.with_argparser(change_dir_parser)
     def do_ir(self, args): # comando: ir
@@ -251,15 +764,24 @@ class FirstApp(cmd2.Cmd):
 
     #---------------------------------------------------------------------------------------------------------------
     # Comando para cambiar permisos de archivos - 7 solicitado
-    permissions_parser = cmd2.Cmd2ArgumentParser()
-    permissions_parser.add_argument('mode', help='Permisos en formato octal (e.g., 755)')
-    permissions_parser.add_argument('files', nargs='+', help='Archivos o directorios a los que cambiar los permisos')
+    @staticmethod
+    def permissions_parser():
+        permissions_parser = cmd2.Cmd2ArgumentParser()
+        permissions_parser.add_argument('mode', help='Permisos en formato octal (e.g., 755)')
+        permissions_parser.add_argument('files', nargs='+', completer=FirstApp.completar_rutas, help='Archivos o directorios a los que cambiar los permisos')
+        permissions_parser.add_argument('-R', '--recursivo', action='store_true', help='Aplica a todo el árbol y muestra solo un resumen')
+        permissions_parser.add_argument('-j', '--hilos', type=int, default=1, help='Hilos para el modo recursivo')
+        return permissions_parser
 
     @cmd2.with_argparser(permissions_parser)
     def do_permisos(self, args):  # comando: permisos
         """Cambia los permisos de un archivo o conjunto de archivos."""
+        from Permisos import AplicadorRecursivo
         try:
             mode = int(args.mode, 8)  # Convierte los permisos octales a entero
+            if args.recursivo:
+                self._aplicar_recursivo(args.files, AplicadorRecursivo(mode=mode, hilos=args.hilos))
+                return
             for file in args.files:
                 file_path = os.path.abspath(os.path.join(self.current_directory, file))
                 if os.path.exists(file_path):
@@ -275,18 +797,27 @@ class FirstApp(cmd2.Cmd):
 
     #---------------------------------------------------------------------------------------------------------------
     # Comando para cambiar propietario y grupo de archivos - 8 solicitado
-    owner_parser = cmd2.Cmd2ArgumentParser()
-    owner_parser.add_argument('owner', help='Nuevo propietario (nombre de usuario o UID)')
-    owner_parser.add_argument('group', help='Nuevo grupo (nombre del grupo o GID)')
-    owner_parser.add_argument('files', nargs='+', help='Archivos o directorios a los que cambiar el propietario')
+    @staticmethod
+    def owner_parser():
+        owner_parser = cmd2.Cmd2ArgumentParser()
+        owner_parser.add_argument('owner', help='Nuevo propietario (nombre de usuario o UID)')
+        owner_parser.add_argument('group', help='Nuevo grupo (nombre del grupo o GID)')
+        owner_parser.add_argument('files', nargs='+', completer=FirstApp.completar_rutas, help='Archivos o directorios a los que cambiar el propietario')
+        owner_parser.add_argument('-R', '--recursivo', action='store_true', help='Aplica a todo el árbol y muestra solo un resumen')
+        owner_parser.add_argument('-j', '--hilos', type=int, default=1, help='Hilos para el modo recursivo')
+        return owner_parser
 
     @cmd2.with_argparser(owner_parser)
     def do_propietario(self, args):  # comando: propietario
         """Cambia el propietario y grupo de un archivo o conjunto de archivos."""
+        from Permisos import AplicadorRecursivo, resolver_uid, resolver_gid
         try:
-            # Obtiene UID y GID
-            uid = int(args.owner) if args.owner.isdigit() else pwd.getpwnam(args.owner).pw_uid
-            gid = int(args.group) if args.group.isdigit() else grp.getgrnam(args.group).gr_gid
+            # Obtiene UID y GID (cacheados entre invocaciones)
+            uid = resolver_uid(args.owner)
+            gid = resolver_gid(args.group)
+            if args.recursivo:
+                self._aplicar_recursivo(args.files, AplicadorRecursivo(uid=uid, gid=gid, hilos=args.hilos))
+                return
 
             for file in args.files:
                 file_path = os.path.abspath(os.path.join(self.current_directory, file))
@@ -300,6 +831,14 @@ class FirstApp(cmd2.Cmd):
         except Exception as e:
             self.perror(f"Error al cambiar propietario: {e}")
 
+    def _aplicar_recursivo(self, files, aplicador):
+        """Ejecuta un AplicadorRecursivo sobre las rutas dadas e imprime el resumen."""
+        rutas = [os.path.abspath(os.path.join(self.current_directory, f)) for f in files]
+        resultado = aplicador.aplicar(rutas)
+        for ruta, error in resultado.errores:
+            self.perror(f"{ruta}: {error}")
+        self.poutput(resultado.resumen())
+
 
     #---------------------------------------------------------------------------------------------------------------
 
@@ -307,61 +846,175 @@ class FirstApp(cmd2.Cmd):
 
     #---------------------------------------------------------------------------------------------------------------
     # Comando para agregar usuarios - 10 solicitado
-    user_parser = cmd2.Cmd2ArgumentParser()
-    user_parser.add_argument('username', help='Nombre del nuevo usuario')
-    user_parser.add_argument('-n', '--nombre', required=True, help='Nombre completo del usuario')
-    user_parser.add_argument('-H', '--horario', required=True, help='Horario de trabajo del usuario')  # Cambiado -h a -H
-    user_parser.add_argument('-l', '--lugares', nargs='+', default=['localhost'], help='Posibles lugares de conexión (IPs o localhost)')
+    @staticmethod
+    def user_parser():
+        user_parser = cmd2.Cmd2ArgumentParser()
+        user_subparsers = user_parser.add_subparsers(dest='accion', required=True, help='Acción sobre los usuarios')
+
+        user_add_parser = user_subparsers.add_parser('agregar', help='Agrega un usuario')
+        user_add_parser.add_argument('username', help='Nombre del nuevo usuario')
+        user_add_parser.add_argument('-n', '--nombre', required=True, help='Nombre completo del usuario')
+        user_add_parser.add_argument('-H', '--horario', required=True, help='Horario de trabajo del usuario')  # Cambiado -h a -H
+        user_add_parser.add_argument('-l', '--lugares', nargs='+', default=['localhost'], help='Posibles lugares de conexión (IPs o localhost)')
+
+        user_import_parser = user_subparsers.add_parser('importar', help='Agrega usuarios desde un archivo CSV o JSON')
+        user_import_parser.add_argument('archivo', help='Archivo CSV (username,nombre,horario,lugares) o JSON')
+        user_import_parser.add_argument('--sin-useradd', action='store_true', help='Solo los registra, sin crear cuentas del sistema')
+
+        user_list_parser = user_subparsers.add_parser('listar', help='Lista los usuarios registrados')
+        user_list_parser.add_argument('-l', '--lugar', help='Solo los usuarios que se conectan desde este lugar')
+
+        user_search_parser = user_subparsers.add_parser('buscar', help='Busca usuarios registrados')
+        user_search_parser.add_argument('username', nargs='?', help='Nombre de usuario exacto')
+        user_search_parser.add_argument('-l', '--lugar', help='Lugar de conexión')
+        user_search_parser.add_argument('-n', '--nombre', help='Texto contenido en el nombre completo')
+        return user_parser
 
     @cmd2.with_argparser(user_parser)
     def do_usuario(self, args):  # comando: usuario
-        """Agrega un nuevo usuario y registra sus datos personales."""
+        """Gestiona los usuarios y sus datos personales."""
+        if args.accion == 'agregar':
+            self._agregar_usuario(args)
+        elif args.accion == 'importar':
+            self._importar_usuarios(args)
+        elif args.accion == 'listar':
+            usuarios = self.registro_usuarios.por_lugar_de_conexion(args.lugar) if args.lugar else self.registro_usuarios.listar()
+            self._mostrar_usuarios(usuarios)
+        elif args.accion == 'buscar':
+            if args.username:
+                usuario = self.registro_usuarios.obtener(args.username)
+                usuarios = [usuario] if usuario else []
+            elif args.lugar:
+                usuarios = self.registro_usuarios.por_lugar_de_conexion(args.lugar)
+            elif args.nombre:
+                usuarios = self.registro_usuarios.buscar_nombre(args.nombre)
+            else:
+                self.perror("Indica un nombre de usuario, --lugar o --nombre.")
+                return
+            if args.nombre and (args.username or args.lugar):
+                usuarios = [u for u in usuarios if args.nombre.lower() in u['nombre'].lower()]
+            if not self._mostrar_usuarios(usuarios):
+                self.perror("No se encontraron usuarios.")
+
+    def _agregar_usuario(self, args):
+        """Crea la cuenta del sistema y registra los datos del usuario."""
+        import subprocess
+        from RegistroUsuarios import nuevo_usuario
         try:
             subprocess.run(['useradd', args.username], check=True)
-
-            user_data = {
-                'username': args.username,
-                'nombre': args.nombre,
-                'horario': args.horario,
-                'lugares': args.lugares
-            }
-
-            if os.path.exists(USERS_FILE):
-                with open(USERS_FILE, 'r') as f:
-                    users = json.load(f)
-            else:
-                users = {}
-
-            users[args.username] = user_data
-
-            with open(USERS_FILE, 'w') as f:
-                json.dump(users, f, indent=4)
-
+            self.registro_usuarios.guardar([nuevo_usuario(args.username, args.nombre, args.horario, args.lugares)])
             self.poutput(f"Usuario {args.username} agregado correctamente.")
         except subprocess.CalledProcessError as e:
             self.perror(f"Error al agregar el usuario {args.username}: {e}")
         except Exception as e:
             self.perror(f"Error inesperado: {e}")
 
+    def _importar_usuarios(self, args):
+        """Crea y registra en bloque los usuarios de un archivo CSV o JSON."""
+        import subprocess
+        from RegistroUsuarios import leer_usuarios
+        ruta = os.path.abspath(os.path.join(self.current_directory, args.archivo))
+        try:
+            usuarios = leer_usuarios(ruta)
+        except FileNotFoundError:
+            self.perror(f"El archivo {args.archivo} no existe.")
+            return
+        except (KeyError, ValueError) as e:
+            self.perror(f"Formato de archivo inválido: {e}")
+            return
+
+        creados = []
+        errores = 0
+        # Una sola pasada de useradd; solo se registran las cuentas creadas
+        for usuario in usuarios:
+            if args.sin_useradd:
+                creados.append(usuario)
+                continue
+            try:
+                subprocess.run(['useradd', usuario['username']], check=True, capture_output=True)
+                creados.append(usuario)
+            except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                errores += 1
+                self.perror(f"Error al agregar el usuario {usuario['username']}: {e}")
+
+        try:
+            self.registro_usuarios.guardar(creados)
+        except Exception as e:
+            self.perror(f"Error al registrar los usuarios (no se guardó ninguno): {e}")
+            return
+        self.poutput(f"{len(creados)} usuarios importados, {errores} errores.")
+
+    def _mostrar_usuarios(self, usuarios):
+        """Imprime los usuarios por bloques y devuelve cuántos se mostraron."""
+        lineas = []
+        total = 0
+        for u in usuarios:
+            lineas.append(f"{u['username']}: {u['nombre']} | Horario: {u['horario']} | Lugares: {', '.join(u['lugares'])}")
+            total += 1
+            if len(lineas) >= LINEAS_POR_BLOQUE:
+                self.poutput('\n'.join(lineas))
+                lineas = []
+        if lineas:
+            self.poutput('\n'.join(lineas))
+        return total
+
 
     #--------------------------------------------------------------------------------------------------------------- volver a revisar
 
     #Comando para manejar demonios
-    daemon_parser = cmd2.Cmd2ArgumentParser()
-    daemon_parser.add_argument('action', choices=['start', 'stop', 'restart', 'list'], help='Acción para el demonio')
-    daemon_parser.add_argument('name', nargs='?', default='', help='Nombre del demonio (opcional para listar)')
+    @staticmethod
+    def daemon_parser():
+        from DemonioManager import INTERVALO_POR_DEFECTO
+        daemon_parser = cmd2.Cmd2ArgumentParser()
+        daemon_parser.add_argument('action', choices=['add', 'remove', 'start', 'stop', 'restart', 'list', 'stats', 'logs', 'top'],
+                                   help='Acción para el demonio')
+        daemon_parser.add_argument('name', nargs='?', default='', help='Nombre del demonio (opcional para listar)')
+        daemon_parser.add_argument('-i', '--intervalo', type=float, default=INTERVALO_POR_DEFECTO, help='Segundos entre ejecuciones (para add)')
+        daemon_parser.add_argument('-c', '--comando',
+                                   help='Comando que se lanza como proceso supervisado (para add; se guarda entre sesiones)')
+        daemon_parser.add_argument('-n', '--lineas', type=int, default=50, help='Líneas de salida a mostrar (para logs, 0: todas)')
+        return daemon_parser
 
     @cmd2.with_argparser(daemon_parser)
     def do_demonio(self, args):
-        """Gestiona los demonios simulados."""
+        """Gestiona los demonios: tareas periódicas o comandos supervisados."""
         if args.action == 'list':
             demonios = self.demonio_manager.list_demonios()
             if demonios:
                 self.poutput("Demonios disponibles:")
                 for demonio in demonios:
-                    self.poutput(f" - {demonio}")
+                    comando = getattr(self.demonio_manager.demonios[demonio], 'comando', None)
+                    self.poutput(f" - {demonio}" + (f": {comando}" if comando else ""))
             else:
                 self.poutput("No hay demonios registrados.")
+        elif args.action == 'stats':
+            stats = [s for s in self.demonio_manager.stats_demonios() if not args.name or s['nombre'] == args.name]
+            if not stats:
+                self.poutput("No hay demonios registrados.")
+                return
+            lineas = [f"{'NOMBRE':<20} {'ESTADO':<8} {'INTERV.':>8} {'TICKS':>8} {'LATENCIA':>10} {'DERIVA':>10} {'DERIVA MAX':>10} {'ERRORES':>7}"]
+            for s in stats:
+                lineas.append(f"{s['nombre']:<20} {'activo' if s['activo'] else 'parado':<8} {s['intervalo']:>7g}s {s['ticks']:>8} "
+                              f"{s['latencia'] * 1000:>8.2f}ms {s['retraso'] * 1000:>8.2f}ms {s['retraso_max'] * 1000:>8.2f}ms {s['errores']:>7}")
+            self.poutput('\n'.join(lineas))
+        elif args.action == 'add':
+            if not args.name:
+                self.perror("Indica el nombre del demonio.")
+            elif args.intervalo <= 0:
+                self.perror("El intervalo debe ser mayor que 0.")
+            else:
+                self.poutput(self.demonio_manager.add_demonio(args.name, args.intervalo, comando=args.comando,
+                                                              directorio=self.current_directory))
+        elif args.action == 'remove':
+            self.poutput(self.demonio_manager.remove_demonio(args.name))
+        elif args.action == 'logs':
+            lineas = self.demonio_manager.logs_demonio(args.name, args.lineas)
+            if lineas is None:
+                self.perror(f"El demonio '{args.name}' no existe.")
+            elif lineas:
+                self.poutput('\n'.join(lineas))
+        elif args.action == 'top':
+            self._top_demonios()
         elif args.action == 'start':
             self.poutput(self.demonio_manager.start_demonio(args.name))
         elif args.action == 'stop':
@@ -369,120 +1022,451 @@ class FirstApp(cmd2.Cmd):
         elif args.action == 'restart':
             self.poutput(self.demonio_manager.restart_demonio(args.name))
 
+    def _top_demonios(self):
+        """Estado, CPU, memoria y descriptores de los demonios con comando."""
+        from Copiador import formatear_bytes
+        top = self.demonio_manager.top_demonios()
+        if not top:
+            self.poutput("No hay demonios con comando.")
+            return
+        lineas = [f"{'NOMBRE':<20} {'ESTADO':<7} {'PID':>7} {'CPU%':>6} {'RSS':>10} {'HILOS':>5} {'FDS':>5} "
+                  f"{'ACTIVO':>8} {'REINIC.':>7} {'SALIDA':>6}  COMANDO"]
+        for d in top:
+            m = d['muestra']
+            if m:
+                consumo = (f"{m['pid']:>7} {m['cpu']:>6.1f} {formatear_bytes(m['rss']):>10} {m['hilos']:>5} "
+                           f"{m['descriptores'] if m['descriptores'] is not None else '-':>5} "
+                           f"{int(m['activo_desde']):>7}s")
+            else:
+                consumo = f"{'-':>7} {'-':>6} {'-':>10} {'-':>5} {'-':>5} {'-':>8}"
+            codigo = d['codigo'] if d['codigo'] is not None else '-'
+            lineas.append(f"{d['nombre']:<20} {d['estado']:<7} {consumo} {d['reinicios']:>7} {codigo:>6}  {d['comando']}")
+        self.poutput('\n'.join(lineas))
+
 
     #--------------------------------------------------------------------------------------------------------------- 
 
 
     # Comando para ejecutar comandos arbitrarios del sistema - 12 solicitado
-    system_command_parser = cmd2.Cmd2ArgumentParser()
-    system_command_parser.add_argument('command', help='Comando del sistema a ejecutar')
-    system_command_parser.add_argument('args', nargs=argparse.REMAINDER, help='Argumentos del comando del sistema')
+    @staticmethod
+    def system_command_parser():
+        system_command_parser = cmd2.Cmd2ArgumentParser()
+        system_command_parser.add_argument('-t', '--timeout', type=float, help='Segundos máximos de ejecución')
+        system_command_parser.add_argument('-b', '--fondo', action='store_true', help='Ejecuta en segundo plano (ver comando trabajos)')
+        system_command_parser.add_argument('-P', '--paralelo', type=int, metavar='N',
+                                           help='Ejecuta cada argumento como un comando completo, N a la vez')
+        system_command_parser.add_argument('command', help='Comando del sistema a ejecutar')
+        system_command_parser.add_argument('args', nargs=argparse.REMAINDER, help='Argumentos del comando del sistema')
+        return system_command_parser
 
     @cmd2.with_argparser(system_command_parser)
     def do_ejecutar(self, args):  # comando: ejecutar
         """Ejecuta comandos arbitrarios del sistema."""
+        from Ejecutor import Trabajo, ejecutar
         try:
+            if args.paralelo:
+                self._ejecutar_paralelo([args.command] + args.args, args.paralelo, args.timeout)
+                return
+
             # Verifica que el comando no esté entre los comandos prohibidos
-            forbidden_commands = ['ir', 'usuario', 'contraseña', 'demonio']
-            if args.command in forbidden_commands:
+            if args.command in FORBIDDEN_COMMANDS:
                 self.perror(f"El comando {args.command} está prohibido.")
                 return
 
-            # Ejecuta el comando
-            result = subprocess.run([args.command] + args.args, text=True, capture_output=True)
-            if result.returncode == 0:
-                self.poutput(result.stdout)
-            else:
-                self.perror(result.stderr)
+            if args.fondo:
+                self.ultimo_trabajo += 1
+                self.trabajos[self.ultimo_trabajo] = Trabajo(self.ultimo_trabajo, [args.command] + args.args,
+                                                             args.timeout, self.current_directory)
+                self.poutput(f"[{self.ultimo_trabajo}] {args.command} en segundo plano.")
+                return
+
+            # Ejecuta el comando mostrando su salida a medida que se produce
+            resultado = ejecutar([args.command] + args.args, self._salida_sincronizada,
+                                 self._error_sincronizado, args.timeout, self.current_directory)
+            if resultado.error:
+                self.perror(f"Error al ejecutar el comando: {resultado.error}")
+            elif resultado.expirado:
+                self.perror(f"El comando {args.command} superó el tiempo límite de {args.timeout:g} s y fue detenido.")
+            elif resultado.codigo != 0:
+                self.perror(f"El comando {args.command} terminó con {resultado.estado()}.")
         except Exception as e:
             self.perror(f"Error al ejecutar el comando: {e}")
 
+    def _salida_sincronizada(self, linea):
+        with self.lock_salida:
+            self.poutput(linea)
+
+    def _error_sincronizado(self, linea):
+        with self.lock_salida:
+            self.perror(linea)
+
+    def _ejecutar_paralelo(self, comandos, hilos, timeout):
+        """Ejecuta una lista de comandos a la vez con la salida prefijada por comando."""
+        from Ejecutor import ejecutar_paralelo
+        for comando in comandos:
+            nombre = comando.split(maxsplit=1)[0] if comando.strip() else ''
+            if nombre in FORBIDDEN_COMMANDS:
+                self.perror(f"El comando {nombre} está prohibido.")
+                return
+
+        def al_linea(indice, es_error, linea):
+            (self._error_sincronizado if es_error else self._salida_sincronizada)(f"[{indice + 1}] {linea}")
+
+        inicio = time.monotonic()
+        resultados = ejecutar_paralelo(comandos, hilos, al_linea, timeout, self.current_directory)
+        self.poutput(f"{'#':>3} {'ESTADO':<20} {'TIEMPO':>9}  COMANDO")
+        for i, r in enumerate(resultados, 1):
+            self.poutput(f"{i:>3} {r.estado():<20} {r.segundos:>8.2f}s  {r.comando}")
+        fallidos = sum(1 for r in resultados if r.codigo != 0)
+        self.poutput(f"{len(resultados)} comandos, {fallidos} con errores, {time.monotonic() - inicio:.2f} s en total.")
+
+    # Comando para ver los trabajos en segundo plano
+    @staticmethod
+    def jobs_parser():
+        jobs_parser = cmd2.Cmd2ArgumentParser()
+        jobs_parser.add_argument('id', nargs='?', type=int, help='Muestra la salida guardada de este trabajo')
+        jobs_parser.add_argument('-k', '--matar', action='store_true', help='Detiene el trabajo indicado')
+        return jobs_parser
+
+    @cmd2.with_argparser(jobs_parser)
+    def do_trabajos(self, args):  # comando: trabajos
+        """Lista los comandos lanzados con ejecutar --fondo."""
+        if args.id is None:
+            if not self.trabajos:
+                self.poutput("No hay trabajos.")
+            for trabajo in self.trabajos.values():
+                self.poutput(f"[{trabajo.id}] {trabajo.estado():<40} {trabajo.comando}")
+            return
+
+        trabajo = self.trabajos.get(args.id)
+        if trabajo is None:
+            self.perror(f"El trabajo {args.id} no existe.")
+        elif args.matar:
+            trabajo.matar()
+            self.poutput(f"Trabajo {args.id} detenido.")
+        else:
+            self.poutput('\n'.join(trabajo.lineas()))
+            self.poutput(f"[{trabajo.id}] {trabajo.estado()}")
+
 
     #--------------------------------------------------------------------------------------------------------------- 
 
     #Registrar el inicio de sesión y la salida sesión del usuario. - 13 solicitado
     # Define el parser para el comando sesion
-    sesion_parser = cmd2.Cmd2ArgumentParser()
-    sesion_parser.add_argument('accion', choices=['iniciar', 'cerrar'], help='Acción de la sesión (iniciar o cerrar)')
-
-    def registrar_horario(self, usuario, accion, horario_permitido):
-        """Registra el horario de inicio o salida en un archivo de log."""
-        from datetime import datetime
-        ahora = datetime.now()
-        hora_actual = ahora.strftime("%H:%M:%S")
-        fecha_actual = ahora.strftime("%Y-%m-%d")
-        fuera_de_rango = not (horario_permitido[0] <= hora_actual <= horario_permitido[1])
-
-        mensaje = f"{fecha_actual} {hora_actual} - Usuario: {usuario} - Acción: {accion}"
+    @staticmethod
+    def sesion_parser():
+        sesion_parser = cmd2.Cmd2ArgumentParser()
+        sesion_parser.add_argument('accion', choices=['iniciar', 'cerrar', 'reporte'],
+                                   help='Acción de la sesión (iniciar, cerrar o reporte)')
+        sesion_parser.add_argument('usuario', nargs='?',
+                                   help='Usuario (por defecto, el del sistema; en reporte, todos)')
+        sesion_parser.add_argument('--desde', type=leer_fecha, help='reporte: primer día (por defecto, el 1 del mes actual)')
+        sesion_parser.add_argument('--hasta', type=leer_fecha, help='reporte: último día (por defecto, hoy)')
+        sesion_parser.add_argument('-d', '--por-dia', action='store_true', help='reporte: una línea por usuario y día')
+        return sesion_parser
+
+    def registrar_horario(self, usuario, accion):
+        """Registra el inicio o cierre de sesión en el log de horarios y en los totales diarios."""
+        ahora = datetime.now().replace(microsecond=0)
+        if accion == 'iniciar':
+            fuera_de_rango, anterior = self.sesiones.iniciar(usuario, ahora)
+            aviso = f" (ya tenía una sesión abierta desde {anterior})" if anterior else ""
+        else:
+            fuera_de_rango, duracion = self.sesiones.cerrar(usuario, ahora)
+            aviso = f" (duración {duracion})" if duracion is not None else " (no tenía una sesión abierta)"
+
+        registro = f"Usuario: {usuario} - Acción: {accion}"
         if fuera_de_rango:
-            mensaje += " - Fuera de rango"
-        
-        with open(HORARIOS_LOG, 'a') as log:
-            log.write(mensaje + '\n')
+            registro += " - Fuera de rango"
 
-        return mensaje
+        self.escritor_logs.escribir(HORARIOS_LOG, 'SESION', registro, ahora)
+
+        return f"{ahora:%Y-%m-%d %H:%M:%S} - {registro}{aviso}"
 
     @cmd2.with_argparser(sesion_parser)
     def do_sesion(self, args):  # comando: sesion
-        """Inicia o cierra sesión de un usuario."""
-        usuario = "actual"  # Aquí puedes obtener el usuario del sistema
-        accion = args.accion.lower()
-        horario_permitido = ("08:00:00", "18:00:00")  # Horario permitido
-
-        mensaje = self.registrar_horario(usuario, accion, horario_permitido)
-        self.poutput(mensaje)
+        """Inicia o cierra sesión de un usuario, o muestra horas trabajadas e inicios fuera de horario."""
+        if args.accion == 'reporte':
+            self._reporte_sesiones(args)
+            return
+        from Sesiones import usuario_del_sistema
+        usuario = args.usuario or usuario_del_sistema()
+        try:
+            self.poutput(self.registrar_horario(usuario, args.accion))
+        except Exception as e:
+            self.perror(f"Error al registrar la sesión: {e}")
+
+    def _reporte_sesiones(self, args):
+        from Sesiones import formatear_duracion
+        hoy = datetime.now()
+        desde = args.desde or hoy.replace(day=1)
+        hasta = args.hasta or hoy
+        if args.por_dia:
+            filas = [f"{u} {dia}: {sesiones} sesiones, {formatear_duracion(segundos)}, {fuera} inicios fuera de horario"
+                     for u, dia, sesiones, segundos, fuera in self.sesiones.por_dia(desde, hasta, args.usuario)]
+        else:
+            filas = [f"{u}: {dias} días, {sesiones} sesiones, {formatear_duracion(segundos)}, "
+                     f"{fuera} inicios fuera de horario"
+                     for u, dias, sesiones, segundos, fuera in self.sesiones.reporte(desde, hasta, args.usuario)]
+        for usuario, inicio in sorted(self.sesiones.abiertas.items()):
+            if not args.usuario or usuario == args.usuario:
+                filas.append(f"{usuario}: sesión abierta desde {inicio}")
+        self.poutput('\n'.join(filas) or f"No hay sesiones entre {desde:%Y-%m-%d} y {hasta:%Y-%m-%d}.")
 
 
     #--------------------------------------------------------------------------------------------------------------- 
 
     #Ejecutar una transferencia por ftp o scp. - 14 solicitado
-    transfer_parser = cmd2.Cmd2ArgumentParser()
-    transfer_parser.add_argument('method', choices=['ftp', 'scp'], help='Método de transferencia (ftp o scp)')
-    transfer_parser.add_argument('source', help='Archivo fuente')
-    transfer_parser.add_argument('destination', help='Destino del archivo')
-    transfer_parser.add_argument('--host', help='Host del servidor FTP o SCP', required=True)
-    transfer_parser.add_argument('--user', help='Usuario para autenticar', required=True)
-    transfer_parser.add_argument('--password', help='Contraseña para FTP (no necesaria para SCP)', default=None)
+    @staticmethod
+    def transfer_parser():
+        from Transferencias import BLOQUE_FTP, CONEXIONES_POR_DEFECTO
+        transfer_parser = cmd2.Cmd2ArgumentParser()
+        transfer_parser.add_argument('method', choices=['ftp', 'scp'], help='Método de transferencia (ftp o scp)')
+        transfer_parser.add_argument('source', nargs='*', help='Archivos fuente, globs o directorios')
+        transfer_parser.add_argument('destination', help='Destino del archivo (directorio remoto si hay varios)')
+        transfer_parser.add_argument('--host', help='Host del servidor FTP o SCP', required=True)
+        transfer_parser.add_argument('--user', help='Usuario para autenticar', required=True)
+        transfer_parser.add_argument('--password', help='Contraseña para FTP (no necesaria para SCP)', default=None)
+        transfer_parser.add_argument('--puerto', type=int, help='Puerto del servidor (por defecto 21 para FTP, 22 para SCP)')
+        transfer_parser.add_argument('-m', '--manifiesto', help='Archivo con una fuente por línea (opcionalmente "origen destino"; comillas para rutas con espacios)')
+        transfer_parser.add_argument('-c', '--conexiones', type=int, default=CONEXIONES_POR_DEFECTO, help='Conexiones FTP en paralelo')
+        transfer_parser.add_argument('--bloque', type=int, default=BLOQUE_FTP, help='Tamaño de bloque FTP en bytes')
+        transfer_parser.add_argument('--reanudar', action='store_true',
+                                     help='FTP: continúa los archivos remotos más cortos que el local (subidas interrumpidas)')
+        return transfer_parser
 
     @cmd2.with_argparser(transfer_parser)
     def do_transferir(self, args):  # comando: transferir
-        """Ejecuta una transferencia por FTP o SCP y la registra."""
+        """Ejecuta transferencias por FTP o SCP y las registra."""
+        from Copiador import formatear_bytes
+        from Transferencias import TransferenciaFTP, expandir_fuentes, transferir_scp
+        try:
+            fuentes = [os.path.join(self.current_directory, f) for f in args.source]
+            manifiesto = os.path.join(self.current_directory, args.manifiesto) if args.manifiesto else None
+            pares = expandir_fuentes(fuentes, args.destination, manifiesto, self.current_directory)
+        except FileNotFoundError as e:
+            self.perror(f"El archivo {e} no existe.")
+            return
+        except ValueError as e:
+            self.perror(f"Manifiesto no válido: {e}")
+            return
+        if not pares:
+            self.perror("No hay archivos que transferir.")
+            return
+
+        metodo = args.method.upper()
+        self.poutput(f"Transfiriendo {len(pares)} archivo(s) a {args.host}:{args.destination} vía {metodo}...")
+        inicio = time.monotonic()
         try:
             if args.method == 'ftp':
-                self.poutput(f"Transfiriendo {args.source} a {args.destination} vía FTP...")
-                try:
-                    with FTP(args.host) as ftp:
-                        ftp.login(args.user, args.password)
-                        with open(args.source, 'rb') as file:
-                            ftp.storbinary(f'STOR {args.destination}', file)
-                    self.registrar_transferencia('FTP', args.source, args.destination, 'Éxito')
-                    self.poutput(f"Transferencia FTP completada: {args.source} -> {args.host}/{args.destination}")
-                except Exception as e:
-                    self.registrar_transferencia('FTP', args.source, args.destination, f'Error: {e}')
-                    self.perror(f"Error en la transferencia FTP: {e}")
-
-            elif args.method == 'scp':
-                self.poutput(f"Transfiriendo {args.source} a {args.destination} vía SCP...")
-                try:
-                    subprocess.run(['scp', args.source, f"{args.user}@{args.host}:{args.destination}"], check=True)
-                    self.registrar_transferencia('SCP', args.source, args.destination, 'Éxito')
-                    self.poutput(f"Transferencia SCP completada: {args.source} -> {args.user}@{args.host}:{args.destination}")
-                except subprocess.CalledProcessError as e:
-                    self.registrar_transferencia('SCP', args.source, args.destination, f'Error: {e}')
-                    self.perror(f"Error en la transferencia SCP: {e}")
+                transferencia = TransferenciaFTP(self.pool_ftp, args.host, args.puerto or 21, args.user,
+                                                 args.password, args.conexiones, args.bloque, args.reanudar)
+                resultados = transferencia.subir(pares, lambda r: self._registrar_resultado('FTP', r, args.user, args.host))
+            else:
+                resultados = transferir_scp(pares, args.user, args.host, args.puerto)
+                for resultado in resultados:
+                    self._registrar_resultado('SCP', resultado, args.user, args.host)
         except Exception as e:
             self.perror(f"Error en la transferencia: {e}")
+            return
+
+        segundos = time.monotonic() - inicio
+        total = sum(r.bytes for r in resultados)
+        errores = [r for r in resultados if r.error]
+        for r in errores:
+            self.perror(f"Error en la transferencia {metodo} de {r.origen}: {r.error}")
+        self.poutput(f"Transferencia {metodo} completada: {len(resultados) - len(errores)} de {len(resultados)} archivos, "
+                     f"{formatear_bytes(total)} en {segundos:.2f} s ({formatear_bytes(total / segundos if segundos else 0)}/s).")
+
+    def _registrar_resultado(self, metodo, resultado, usuario, host):
+        """Registra una transferencia individual con sus bytes, duración y velocidad."""
+        from Copiador import formatear_bytes
+        estado = f'Error: {resultado.error}' if resultado.error else 'Éxito'
+        detalle = f"{resultado.bytes} bytes en {resultado.segundos:.3f} s ({formatear_bytes(resultado.velocidad())}/s)"
+        if resultado.reanudado_desde:
+            detalle += f", reanudado desde {resultado.reanudado_desde}"
+        self.registrar_transferencia(metodo, resultado.origen, f"{usuario}@{host}:{resultado.destino}", f"{estado} | {detalle}")
 
     def registrar_transferencia(self, metodo, source, destination, resultado):
         """Registra la transferencia en el archivo de log."""
-        from datetime import datetime
-        with open(TRANSFERENCIAS_LOG, 'a') as log:
-            log.write(f"[{datetime.now()}] {metodo}: {source} -> {destination} | Resultado: {resultado}\n")
+        self.escritor_logs.escribir(TRANSFERENCIAS_LOG, metodo, f"{source} -> {destination} | Resultado: {resultado}")
 
     #--------------------------------------------------------------------------------------------------------------- 
 
 
+    #Consultar los archivos de log por fecha, usuario, acción o estado
+    @staticmethod
+    def logs_parser():
+        from ConsultaLogs import CAMPOS_AGRUPACION
+        logs_parser = cmd2.Cmd2ArgumentParser()
+        logs_parser.add_argument('archivo', nargs='?', choices=list(LOGS), default='historial', help='Log a consultar')
+        logs_parser.add_argument('--desde', type=leer_fecha, help='Fecha inicial (AAAA-MM-DD [HH:MM[:SS]])')
+        logs_parser.add_argument('--hasta', type=leer_fecha, help='Fecha final, no incluida (AAAA-MM-DD [HH:MM[:SS]])')
+        logs_parser.add_argument('--ultimos', type=leer_duracion, help='Periodo hasta ahora (e.g., 30m, 12h, 7d)')
+        logs_parser.add_argument('-u', '--usuario', help='Usuario de la sesión')
+        logs_parser.add_argument('-t', '--tipo', help='Tipo de registro (COMANDO, ERROR, SESION, FTP, SCP)')
+        logs_parser.add_argument('-e', '--estado', help='Estado (Éxito, Error, "Fuera de rango")')
+        logs_parser.add_argument('--host', help='Host de la transferencia')
+        logs_parser.add_argument('-b', '--buscar', help='Texto contenido en la línea')
+        logs_parser.add_argument('-c', '--contar', nargs='+', choices=CAMPOS_AGRUPACION, help='Cuenta los registros agrupando por estos campos')
+        logs_parser.add_argument('-n', '--limite', type=int, default=0, help='Máximo de líneas a mostrar (0: todas)')
+        return logs_parser
+
+    @cmd2.with_argparser(logs_parser)
+    def do_logs(self, args):  # comando: logs
+        """Consulta los logs de la shell por rango de fechas y otros filtros."""
+        from ConsultaLogs import agrupar, filtrar, registros_de_log
+        from RotacionLogs import ruta_manifiesto
+        desde = datetime.now() - args.ultimos if args.ultimos else args.desde
+        ruta = LOGS[args.archivo]
+        if not os.path.exists(ruta) and not os.path.exists(ruta_manifiesto(ruta)):
+            self.perror(f"El log {ruta} no existe todavía.")
+            return
+        self.escritor_logs.flush()  # Incluye lo que aún esté en la cola del escritor
+        try:
+            registros = filtrar(registros_de_log(ruta, desde, args.hasta), args.usuario, args.tipo,
+                                args.estado, args.host, args.buscar)
+            if args.contar:
+                conteo = agrupar(registros, args.contar)
+                for clave, total in sorted(conteo.items()):
+                    self.poutput(f"{' | '.join(clave)}: {total}")
+                self.poutput(f"Total: {sum(conteo.values())}")
+                return
+
+            lineas = []
+            mostradas = 0
+            for registro in registros:
+                lineas.append(registro.texto)
+                mostradas += 1
+                if len(lineas) >= LINEAS_POR_BLOQUE:
+                    self.poutput('\n'.join(lineas))
+                    lineas = []
+                if mostradas == args.limite:
+                    break
+            if lineas:
+                self.poutput('\n'.join(lineas))
+        except Exception as e:
+            self.perror(f"Error al consultar el log: {e}")
+
+    @staticmethod
+    def metricas_parser():
+        metricas_parser = cmd2.Cmd2ArgumentParser()
+        metricas_parser.add_argument('comandos', nargs='*', help='Comandos a mostrar (por defecto: todos)')
+        metricas_parser.add_argument('--exportar', metavar='ARCHIVO',
+                                     help='Vuelca periódicamente las métricas en formato Prometheus a ARCHIVO')
+        metricas_parser.add_argument('-i', '--intervalo', type=float, default=METRICAS_INTERVALO,
+                                     help='Segundos entre volcados de --exportar')
+        metricas_parser.add_argument('--parar', action='store_true', help='Detiene la exportación periódica')
+        metricas_parser.add_argument('--reiniciar', action='store_true', help='Borra las métricas acumuladas')
+        return metricas_parser
+
+    @cmd2.with_argparser(metricas_parser)
+    def do_metricas(self, args):  # comando: metricas
+        """Muestra latencia (p50/p95/p99), CPU, E/S y procesos lanzados por comando."""
+        from Copiador import formatear_bytes
+        if args.parar:
+            ruta = self.metricas.detener_exportacion()
+            self.poutput(f"Exportación a {ruta} detenida." if ruta else "No había exportación activa.")
+            return
+        if args.exportar:
+            ruta = os.path.join(self.current_directory, args.exportar)
+            self.metricas.iniciar_exportacion(ruta, args.intervalo)
+            self.poutput(f"Exportando métricas a {ruta} cada {args.intervalo:g} s.")
+            return
+        if args.reiniciar:
+            self.metricas.reiniciar()
+            self.poutput("Métricas reiniciadas.")
+            return
+
+        lineas = [f"{'comando':<14} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'cpu':>9} "
+                  f"{'leídos':>10} {'escritos':>10} {'procesos':>8}"]
+        for nombre, m in sorted(self.metricas.comandos.items()):
+            if args.comandos and nombre not in args.comandos:
+                continue
+            t = m.tiempo
+            lineas.append(f"{nombre:<14} {t.total:>6} {_ms(t.percentil(50)):>9} {_ms(t.percentil(95)):>9} "
+                          f"{_ms(t.percentil(99)):>9} {_ms(m.cpu / t.total):>9} "
+                          f"{formatear_bytes(m.bytes_leidos):>10} {formatear_bytes(m.bytes_escritos):>10} "
+                          f"{m.procesos:>8}")
+        lineas.append(f"Sobrecoste de la medición: {self.metricas.sobrecoste_medio() * 1e6:.1f} µs por comando "
+                      f"({self.metricas.mediciones} comandos)")
+        self.poutput('\n'.join(lineas))
+
+    #--------------------------------------------------------------------------------------------------------------- 
+
+
+def _ms(segundos):
+    return f"{segundos * 1000:.2f} ms"
+
+
+def _segundos_desde_inicio_proceso():
+    """Segundos desde que el sistema creó el proceso (Linux, vía /proc), o None."""
+    try:
+        with open('/proc/self/stat') as f:
+            inicio_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - inicio_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class PerfilArranque:
+    """Mide las fases del arranque en frío hasta que termina el primer comando."""
+
+    def __init__(self, app, fin_import, fin_init):
+        self.app = app
+        ahora = time.perf_counter()
+        antes_de_python = _segundos_desde_inicio_proceso()
+        # Instante (en reloj perf_counter) en que se creó el proceso
+        self.origen = ahora - antes_de_python if antes_de_python is not None else _INICIO_IMPORTS
+        self.fases = [
+            ('intérprete de Python', _INICIO_IMPORTS - self.origen),
+            ('import cmd2', _FIN_IMPORT_CMD2 - _INICIO_IMPORTS),
+            ('import first_app (resto)', fin_import - _FIN_IMPORT_CMD2),
+            ('FirstApp.__init__', fin_init - fin_import),
+        ]
+        self.primer_comando = None
+        app.register_postcmd_hook(self._al_terminar_comando)
+        app.register_postloop_hook(self.informe)
+
+    def _al_terminar_comando(self, data: cmd2.plugin.PostcommandData) -> cmd2.plugin.PostcommandData:
+        if self.primer_comando is None:
+            self.primer_comando = time.perf_counter()
+        return data
+
+    def informe(self):
+        lineas = ["Perfil de arranque:"]
+        for nombre, segundos in self.fases:
+            lineas.append(f"  {nombre:<32} {segundos * 1000:8.1f} ms")
+        for nombre, segundos in self.app.tiempos_arranque.items():
+            lineas.append(f"  {'  (primer uso) ' + nombre:<32} {segundos * 1000:8.1f} ms")
+        if self.primer_comando is not None:
+            total = (self.primer_comando - self.origen) * 1000
+            estado = "cumplido" if total <= OBJETIVO_ARRANQUE_MS else "superado"
+            lineas.append(f"  {'total hasta el primer comando':<32} {total:8.1f} ms "
+                          f"(objetivo {OBJETIVO_ARRANQUE_MS} ms: {estado})")
+        sys.stderr.write('\n'.join(lineas) + '\n')
+
+
 if __name__ == '__main__':
-    import sys
+    fin_import = time.perf_counter()
+    perfil = '--perfil-arranque' in sys.argv
+    if perfil:
+        sys.argv.remove('--perfil-arranque')
+    lote = None
+    if '--lote' in sys.argv:
+        posicion = sys.argv.index('--lote')
+        lote = sys.argv[posicion + 1] if posicion + 1 < len(sys.argv) else '-'
+        del sys.argv[posicion:posicion + 2]
     c = FirstApp()
+    if perfil:
+        PerfilArranque(c, fin_import, time.perf_counter())
+    if lote is not None:
+        from Lote import leer_lote
+        try:
+            codigo = c.ejecutar_lote(leer_lote(lote))
+        finally:
+            c._cerrar_subsistemas()
+        sys.exit(codigo)
     sys.exit(c.cmdloop())